@@ -5,6 +5,7 @@ import numpy as np
 from pycountry_convert import country_alpha2_to_continent_code, \
     country_alpha2_to_country_name, map_countries
 # Own modules
+from .id_tables import load_ids
 from utilities.genutils import convert_list_to_str, dump_json, dump_pickle, \
     load_json, load_pickle
 from utilities.logging_boilerplate import LoggingBoilerplate
@@ -12,12 +13,16 @@ from utilities.logging_boilerplate import LoggingBoilerplate
 
 class Analyzer:
     # `stats_names` must be a list of names of stats to compute
+    # `db_snapshot` is the in-memory snapshot of the db (see `DBSnapshot`): if
+    # given, the data is read from it instead of the db
     def __init__(self, analysis_type, conn, db_session, main_cfg, logging_cfg,
-                 stats_names, report, module_name, module_file, cwd):
+                 stats_names, report, module_name, module_file, cwd,
+                 db_snapshot=None):
         self.analysis_type = analysis_type
         # Connection to SQLite db
         self.conn = conn
         self.db_session = db_session
+        self.db_snapshot = db_snapshot
         self.main_cfg = main_cfg
         self.logging_cfg = logging_cfg
         # Stats to compute
@@ -112,6 +117,8 @@ class Analyzer:
     # tuple[1] is the item's short name
     # `converter` is a method that converts the item's short name to its full
     # name
+    # NOTE: the job_post_ids of each item are kept in a set so that checking
+    # for a duplicate item doesn't scan all the job posts of the item
     def _count_items(self, list_items, converter=None, ignore_none=False,
                      ignore_duplicates=False):
         items_data = {}
@@ -150,7 +157,7 @@ class Analyzer:
                     self.logger.debug(
                         "Converted '{}' to '{}'".format(item, item_fullname))
                     item = item_fullname
-            items_data.setdefault(item, [0, []])
+            items_data.setdefault(item, [0, set()])
             if not ignore_duplicates and job_post_id in items_data[item][1]:
                 self.logger.warning(
                     "Found duplicate item '{}' for job_post_id '{}'".format(
@@ -171,7 +178,7 @@ class Analyzer:
                             item, job_post_id))
                     duplicates.append((job_post_id, item))
                 items_data[item][0] += 1
-                items_data[item][1].append(job_post_id)
+                items_data[item][1].add(job_post_id)
                 set_ids.add(job_post_id)
                 counts += 1
                 self.logger.debug("Item '{}' added".format(item))
@@ -180,6 +187,59 @@ class Analyzer:
                          reverse=True)
         return results, list(set_ids), duplicates, skipped
 
+    # Count the items (the column `name`) of the table `table_name` in the
+    # database instead of loading all its rows, i.e. the same as
+    # `_count_items()` on the rows "SELECT job_post_id, name FROM table_name"
+    # with no converter. The results are identical: the items with the same
+    # count are in the order of their first occurrence in the table (lowest
+    # id) and the job_post_ids are added to the set in the same order.
+    # With a db snapshot, the items are counted in the snapshot instead.
+    # Returns: tuple (results, list_ids, duplicates, skipped) as returned by
+    #          `_count_items()`
+    def _count_items_in_db(self, table_name):
+        if self.db_snapshot is not None:
+            self.logger.debug("Counting the items of the table '{}' in the db "
+                              "snapshot".format(table_name))
+            results, list_ids, duplicates = self.db_snapshot.count_items(
+                table_name)
+        else:
+            self.logger.debug("Counting the items of the table '{}' in the "
+                              "database".format(table_name))
+            results, list_ids, duplicates = self._query_items_counts(
+                table_name)
+        for job_post_id, item in duplicates:
+            self.logger.warning(
+                "Duplicate item '{}' will not be counted since it was already "
+                "counted once for job_post_id '{}'".format(item, job_post_id))
+        return results, list_ids, duplicates, []
+
+    # NOTE: the GROUP BYs are done on the covering indexes of the table (see
+    # `database/tables.py`), created at startup by `JobDataAnalyzer` if the db
+    # doesn't have them. The duplicates are only searched for (a much slower
+    # query) if there are more rows than counted items.
+    # Returns: tuple (results, list_ids, duplicates), see `_count_items_in_db()`
+    def _query_items_counts(self, table_name):
+        sql = "SELECT name, COUNT(DISTINCT job_post_id) AS count, MIN(id) AS " \
+              "first_id FROM {} GROUP BY name ORDER BY count DESC, " \
+              "first_id".format(table_name)
+        results = [(item, count)
+                   for item, count, _ in self.db_session.execute(sql)]
+        sql = "SELECT job_post_id FROM {} GROUP BY job_post_id ORDER BY " \
+              "MIN(id)".format(table_name)
+        set_ids = set(job_post_id
+                      for job_post_id, in self.db_session.execute(sql))
+        duplicates = []
+        sql = "SELECT COUNT(*) FROM {}".format(table_name)
+        if self.db_session.execute(sql).scalar() > sum(count
+                                                       for _, count in results):
+            # The same item found again for a job post is a duplicate
+            sql = "SELECT job_post_id, name FROM {0} WHERE id NOT IN (SELECT " \
+                  "MIN(id) FROM {0} GROUP BY job_post_id, name) ORDER BY " \
+                  "id".format(table_name)
+            duplicates = [(job_post_id, item) for job_post_id, item
+                          in self.db_session.execute(sql)]
+        return results, list(set_ids), duplicates
+
     # Generate HORIZONTAL bar
     # `sorted_topic_count` is a numpy array and has two columns: labels and counts
     # Each row of the input array tells how many counts they are of the given
@@ -228,8 +288,8 @@ class Analyzer:
             raise KeyError(e)
         return country_name
 
-    # Useful inside SQL expressions
-    def _get_european_countries_as_str(self):
+    # Returns: set of the alpha-2 codes of the European countries
+    def _get_european_countries(self):
         european_countries = set()
         for _, values in map_countries().items():
             try:
@@ -243,15 +303,28 @@ class Analyzer:
                 self.logger.debug(
                     "No continent code for '{}'".format(values['alpha_2']))
                 continue
-        return convert_list_to_str(european_countries)
+        return european_countries
+
+    # Useful inside SQL expressions
+    def _get_european_countries_as_str(self):
+        return convert_list_to_str(self._get_european_countries())
 
     # `job_post_ids` is a list of ids
+    # NOTE: the ids are joined with the job posts through a temporary table
+    # (see `id_tables.py`) instead of an `IN (...)` expression. The min date is
+    # None if a job post has no date, as the first date in ascending order.
     def _get_min_max_published_dates(self, job_post_ids):
-        job_post_ids = convert_list_to_str(job_post_ids)
-        sql = "SELECT date_posted FROM job_posts WHERE id in ({}) ORDER BY " \
-              "date_posted ASC".format(job_post_ids)
-        results = self.db_session.execute(sql).fetchall()
-        return results[0][0], results[-1][0]
+        if self.db_snapshot is not None:
+            return self.db_snapshot.get_min_max_published_dates(job_post_ids)
+        ids_table = load_ids(self.db_session, job_post_ids)
+        sql = "SELECT MIN(job_posts.date_posted), " \
+              "MAX(job_posts.date_posted), COUNT(*) - " \
+              "COUNT(job_posts.date_posted) FROM {} AS ids CROSS JOIN " \
+              "job_posts ON job_posts.id = ids.id".format(ids_table)
+        min_date, max_date, n_no_dates = self.db_session.execute(sql).first()
+        if n_no_dates:
+            min_date = None
+        return min_date, max_date
 
     def _load_json(self, filepath, encoding='utf8'):
         try:
@@ -0,0 +1,172 @@
+"""
+In-memory snapshot of the tables of the job data db read by the analyzers,
+loaded once per analysis run so that the analyzers (and repeated analyses over
+the same db) don't query the db again.
+
+Each table is loaded as columns (in the order of the table's ids, as the
+db returns them):
+- integer columns: int64 arrays
+- numeric columns with NULLs (e.g. salaries): float64 arrays with NaN
+- the other columns (e.g. names, countries, dates): categorical columns, i.e.
+  int32 codes into an array of the distinct values (interned strings, in the
+  order of their first occurrence, NULL being None)
+
+Usage:
+    db_snapshot = DBSnapshot(db_session)
+    countries = db_snapshot.column('job_locations', 'country')
+    rows = db_snapshot.select('job_locations', ['job_post_id', 'country'],
+                              countries == 'US')
+"""
+import time
+# Third-party modules
+import numpy as np
+# Own modules
+from .topic_aggregator import count_job_posts, factorize
+
+
+# Tables (and their columns) read by the analyzers
+SNAPSHOT_TABLES = {
+    'industries': ['id', 'job_post_id', 'name'],
+    'job_benefits': ['id', 'job_post_id', 'name'],
+    'job_locations': ['id', 'job_post_id', 'city', 'region', 'country'],
+    'job_posts': ['id', 'date_posted'],
+    'job_salaries': ['id', 'job_post_id', 'min_salary', 'max_salary',
+                     'currency'],
+    'roles': ['id', 'job_post_id', 'name'],
+    'skills': ['id', 'job_post_id', 'name'],
+}
+
+
+class CategoricalColumn:
+    __slots__ = ('codes', 'categories')
+
+    def __init__(self, values):
+        """
+        Column of (mostly repeated) values stored as codes into the array of
+        its distinct values.
+
+        :param values: sequence of hashable values, e.g. strings and None
+        """
+        self.codes, self.categories = factorize(values)
+
+    # Returns: object array of the values
+    def decode(self, mask=None):
+        codes = self.codes if mask is None else self.codes[mask]
+        return self.categories[codes]
+
+    def __len__(self):
+        return len(self.codes)
+
+
+class DBSnapshot:
+    def __init__(self, db_session, tables=None, logger=None):
+        """
+        Loads the tables of the job data db read by the analyzers (see
+        `SNAPSHOT_TABLES`) into memory as columns.
+
+        :param db_session: SQLAlchemy session of the job data db
+        :param tables: dict with the tables' names as keys and the lists of
+                       their columns as values, `SNAPSHOT_TABLES` by default
+        :param logger: logger reporting the loading of each table
+        """
+        self.tables = {}
+        tables = SNAPSHOT_TABLES if tables is None else tables
+        for table_name, column_names in tables.items():
+            start = time.perf_counter()
+            self.tables[table_name] = self._load_table(db_session, table_name,
+                                                       column_names)
+            if logger:
+                logger.info("Table '{}' loaded in the db snapshot: {} rows in "
+                            "{:.2f} s".format(table_name,
+                                              self.number_of_rows(table_name),
+                                              time.perf_counter() - start))
+
+    @staticmethod
+    def _load_table(db_session, table_name, column_names):
+        sql = "SELECT {} FROM {} ORDER BY id".format(", ".join(column_names),
+                                                   table_name)
+        # NOTE: the rows are fetched with the DBAPI cursor of the session's
+        # connection since its rows are plain tuples, which are much faster to
+        # split into columns than SQLAlchemy's rows
+        cursor = db_session.connection().connection.cursor()
+        try:
+            cursor.execute(sql)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        columns_values = list(zip(*rows)) if rows else [()] * len(column_names)
+        columns = {}
+        for column_name, values in zip(column_names, columns_values):
+            if all(isinstance(value, int) for value in values):
+                columns[column_name] = np.array(values, dtype=np.int64)
+            elif any(isinstance(value, (int, float)) for value in values) and \
+                    all(value is None or isinstance(value, (int, float))
+                        for value in values):
+                columns[column_name] = np.array(
+                    [np.nan if value is None else value for value in values],
+                    dtype=np.float64)
+            else:
+                columns[column_name] = CategoricalColumn(values)
+        return columns
+
+    # Returns: array of the column's values (an object array for a
+    #          categorical column), restricted to `mask` if given
+    def column(self, table_name, column_name, mask=None):
+        column = self.tables[table_name][column_name]
+        if isinstance(column, CategoricalColumn):
+            return column.decode(mask)
+        return column if mask is None else column[mask]
+
+    def number_of_rows(self, table_name):
+        columns = self.tables[table_name]
+        return len(next(iter(columns.values()))) if columns else 0
+
+    # Returns: list of tuples with the values of `column_names` of the rows
+    #          selected by `mask` (all the rows by default), as returned by
+    #          "SELECT <column_names> FROM <table_name> WHERE ..."
+    def select(self, table_name, column_names, mask=None):
+        columns = [self.column(table_name, column_name, mask).tolist()
+                   for column_name in column_names]
+        return list(zip(*columns))
+
+    # Count the distinct job posts of each value of the column `column_name`
+    # with `topic_aggregator.count_job_posts()`, as done in the db by
+    # `Analyzer._count_items_in_db()`
+    # Returns: tuple (results, list_ids, duplicates) where `results` are the
+    #          tuples (value, count) in decreasing order of count (the values
+    #          with the same count in the order of their first occurrence),
+    #          `list_ids` are the job_post_ids (added to a set in the order of
+    #          their first occurrence) and `duplicates` are the tuples
+    #          (job_post_id, value) of the rows whose value was already found
+    #          for the same job post
+    def count_items(self, table_name, column_name='name'):
+        job_post_ids = self.tables[table_name]['job_post_id']
+        column = self.tables[table_name][column_name]
+        results, distinct_ids, is_duplicate = count_job_posts(
+            job_post_ids, column.codes, column.categories)
+        duplicates_idx = np.flatnonzero(is_duplicate)
+        duplicates = list(zip(job_post_ids[duplicates_idx].tolist(),
+                              column.decode(duplicates_idx).tolist()))
+        return results, list(set(distinct_ids.tolist())), duplicates
+
+    # Returns: tuple (min_date, max_date) of the job posts with the given ids
+    #          (min_date is None if one of them has no date), as done in the db
+    #          by `Analyzer._get_min_max_published_dates()`
+    def get_min_max_published_dates(self, job_post_ids):
+        ids = self.tables['job_posts']['id']
+        job_post_ids = np.asarray(job_post_ids, dtype=np.int64)
+        # The rows of the job posts (the ids are sorted), the ids not found
+        # are ignored as in a join
+        idx = np.searchsorted(ids, job_post_ids)
+        found = idx < len(ids)
+        idx = idx[found][ids[idx[found]] == job_post_ids[found]]
+        if not len(idx):
+            return None, None
+        dates = self.tables['job_posts']['date_posted']
+        codes = np.unique(dates.codes[idx])
+        values = [value for value in dates.categories[codes].tolist()
+                  if value is not None]
+        if not values:
+            return None, None
+        min_date = None if len(values) < len(codes) else min(values)
+        return min_date, max(values)
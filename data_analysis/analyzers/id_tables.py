@@ -0,0 +1,55 @@
+"""
+Filtering of the SQL queries on large sets of ids (e.g. the job_post_ids of
+all the job posts with a salary) with a join on a temporary table of the ids,
+instead of pasting thousands of ids into an `IN (...)` expression (which must
+be parsed again for each query and can hit SQLite's limit on the length of a
+SQL statement).
+
+Usage:
+    ids_table = load_ids(db_session, job_post_ids)
+    sql = "SELECT job_posts.date_posted FROM {} AS ids CROSS JOIN " \
+          "job_posts ON job_posts.id = ids.id".format(ids_table)
+
+The CROSS JOIN makes SQLite look up the job posts of the ids (by primary key)
+instead of scanning all the job posts, i.e. the query time depends on the
+number of ids.
+
+NOTE: a temporary table only exists in the connection that created it, thus
+the query must be executed with the same `db_session` (and within the same
+transaction, since the session's connection is released on commit).
+"""
+import json
+# Third-party modules
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+DEFAULT_IDS_TABLE = 'filter_ids'
+
+
+# Load the ids into the temporary table `table_name` (created if it doesn't
+# exist and emptied otherwise). The ids are the table's primary key, i.e.
+# indexed, and the duplicate ids are ignored.
+# NOTE: the ids are sent as a single JSON array and inserted in ascending
+# order by SQLite (`json_each()`), which is much faster than inserting them
+# one by one. If SQLite is built without the JSON1 extension, they are
+# inserted with `executemany()`.
+# Returns: str, the name of the temporary table
+def load_ids(db_session, ids, table_name=DEFAULT_IDS_TABLE):
+    db_session.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS {} (id INTEGER PRIMARY KEY)".format(
+            table_name))
+    db_session.execute("DELETE FROM {}".format(table_name))
+    ids = sorted(set(int(id_) for id_ in ids))
+    if not ids:
+        return table_name
+    try:
+        sql = "INSERT INTO {} (id) SELECT value FROM json_each(:ids)".format(
+            table_name)
+        db_session.execute(text(sql), {'ids': json.dumps(ids)})
+    except OperationalError:
+        # No JSON1 extension: no such function json_each
+        db_session.execute(
+            text("INSERT INTO {} (id) VALUES (:id)".format(table_name)),
+            [{'id': id_} for id_ in ids])
+    return table_name
@@ -7,7 +7,8 @@ from .analyzer import Analyzer
 
 
 class IndustriesAnalyzer(Analyzer):
-    def __init__(self, analysis_type, conn, db_session, main_cfg, logging_cfg):
+    def __init__(self, analysis_type, conn, db_session, main_cfg, logging_cfg,
+                 db_snapshot=None):
         # Industries stats to compute
         self.stats_names = ["sorted_industries_count"]
         self.report = {
@@ -32,7 +33,8 @@ class IndustriesAnalyzer(Analyzer):
                          self.report,
                          __name__,
                          __file__,
-                         os.getcwd())
+                         os.getcwd(),
+                         db_snapshot)
 
     def run_analysis(self):
         # Reset all industries stats to be computed
@@ -70,9 +72,8 @@ class IndustriesAnalyzer(Analyzer):
         return self.db_session.execute(sql).fetchall()
         """
         self.logger.debug("Counting all industries")
-        sql = "SELECT job_post_id, name FROM industries"
-        results = self.db_session.execute(sql).fetchall()
-        results, list_ids, duplicates, skipped = self._count_items(results)
+        results, list_ids, duplicates, skipped = self._count_items_in_db(
+            'industries')
         # Update report for industries
         self._update_graph_report(
             graph_report=self.report['barh'],
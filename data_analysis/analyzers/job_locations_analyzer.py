@@ -11,7 +11,8 @@ from utilities.genutils import add_plural
 
 
 class JobLocationsAnalyzer(Analyzer):
-    def __init__(self, analysis_type, conn, db_session, main_cfg, logging_cfg):
+    def __init__(self, analysis_type, conn, db_session, main_cfg, logging_cfg,
+                 db_snapshot=None):
         # Locations stats to compute
         # TODO: store numpy arrays instead and check other modules also
         # so you won't have to convert list as a numpy array when generating the
@@ -131,7 +132,8 @@ class JobLocationsAnalyzer(Analyzer):
                          self.report,
                          __name__,
                          __file__,
-                         os.getcwd())
+                         os.getcwd(),
+                         db_snapshot)
         # Load data from pickle and JSON files
         # IMPORTANT: if the pickle is not found, an empty dict is used instead
         self.addresses_geo_coords = self._load_dict_from_pickle(
@@ -251,8 +253,12 @@ class JobLocationsAnalyzer(Analyzer):
         """
         # IMPORTANT: 'No office location' is not ignored if `use_fullnames=False`
         self.logger.debug("Counting all countries")
-        sql = "SELECT job_post_id, country FROM job_locations"
-        results = self.db_session.execute(sql).fetchall()
+        if self.db_snapshot is not None:
+            results = self.db_snapshot.select('job_locations',
+                                              ['job_post_id', 'country'])
+        else:
+            sql = "SELECT job_post_id, country FROM job_locations"
+            results = self.db_session.execute(sql).fetchall()
         if use_fullnames:
             converter = self._get_country_name
         else:
@@ -281,9 +287,17 @@ class JobLocationsAnalyzer(Analyzer):
         :return: list of tuples of the form (country, count)
         """
         self.logger.debug("Counting european countries")
-        sql = "SELECT job_post_id, country FROM job_locations WHERE country in " \
-              "({})".format(self._get_european_countries_as_str())
-        results = self.db_session.execute(sql).fetchall()
+        if self.db_snapshot is not None:
+            countries = self.db_snapshot.column('job_locations', 'country')
+            results = self.db_snapshot.select(
+                'job_locations', ['job_post_id', 'country'],
+                np.isin(countries.astype(str),
+                        sorted(self._get_european_countries())))
+        else:
+            sql = "SELECT job_post_id, country FROM job_locations WHERE " \
+                  "country in ({})".format(
+                    self._get_european_countries_as_str())
+            results = self.db_session.execute(sql).fetchall()
         if use_fullnames:
             converter = self._get_country_name
         else:
@@ -314,8 +328,14 @@ class JobLocationsAnalyzer(Analyzer):
         :return: list of tuples of the form (us_state, count)
         """
         self.logger.debug("Counting US states")
-        sql = "SELECT job_post_id, region FROM job_locations WHERE country='US'"
-        results = self.db_session.execute(sql).fetchall()
+        if self.db_snapshot is not None:
+            countries = self.db_snapshot.column('job_locations', 'country')
+            results = self.db_snapshot.select(
+                'job_locations', ['job_post_id', 'region'], countries == 'US')
+        else:
+            sql = "SELECT job_post_id, region FROM job_locations WHERE " \
+                  "country='US'"
+            results = self.db_session.execute(sql).fetchall()
         if use_fullnames:
             converter = self.us_states.get
         else:
@@ -436,6 +456,12 @@ class JobLocationsAnalyzer(Analyzer):
                 "All locations with 'No office location' will be ignored")
         else:
             where = ""
+        if self.db_snapshot is not None:
+            countries = self.db_snapshot.column('job_locations', 'country')
+            mask = countries != 'No office location' if where else None
+            return self.db_snapshot.select(
+                'job_locations', ['job_post_id', 'city', 'region', 'country'],
+                mask)
         sql = "SELECT job_post_id, city, region, country FROM " \
               "job_locations{}".format(where)
         return self.db_session.execute(sql).fetchall()
@@ -461,6 +487,11 @@ class JobLocationsAnalyzer(Analyzer):
         else:
             where = ""
         """
+        if self.db_snapshot is not None:
+            countries = self.db_snapshot.column('job_locations', 'country')
+            return self.db_snapshot.select(
+                'job_locations', ['job_post_id', 'city', 'region', 'country'],
+                countries == 'US')
         sql = "SELECT job_post_id, city, region, country FROM job_locations " \
               "WHERE country='US'"
         return self.db_session.execute(sql).fetchall()
@@ -4,11 +4,12 @@ import ipdb
 import numpy as np
 # Own modules
 from .analyzer import Analyzer
-from utilities.genutils import convert_list_to_str
+from .topic_aggregator import group_by, join_on_job_post_ids, load_columns
 
 
 class JobSalariesAnalyzer(Analyzer):
-    def __init__(self, analysis_type, conn, db_session, main_cfg, logging_cfg):
+    def __init__(self, analysis_type, conn, db_session, main_cfg, logging_cfg,
+                 db_snapshot=None):
         # Salaries stats to compute
         # NOTE: not all fields are numpy arrays
         # e.g. `job_id_to_mid_range_salary` is a dict
@@ -16,6 +17,7 @@ class JobSalariesAnalyzer(Analyzer):
             "salaries",  # np.array: job_post_id, min_salary, max_salary
             "job_ids_with_salary",  # np.array; IMPORTANT: all job ids UNSORTED
             "job_id_to_mid_range_salary",  # dict; IMPORTANT: all job ids
+            "mid_range_salaries",  # np.array; same order as job_ids_with_salary
             "mid_range_salaries_asc",  # ASC order
             "min_mid_range_salary",
             "max_mid_range_salary",
@@ -27,6 +29,10 @@ class JobSalariesAnalyzer(Analyzer):
             "avg_mid_range_salaries_in_skills",  # np.array
             "avg_mid_range_salaries_in_usa",  # np.array
             "avg_mid_range_salaries_in_world",  # np.array
+            # dict: topic --> dict of np.arrays with the count, mean, median
+            # and percentiles of the mid-range salaries of each topic's name
+            # (see `topic_aggregator.group_by()`)
+            "mid_range_salaries_by_topic",
         ]
         self.report = {
             "currency": None,
@@ -126,9 +132,14 @@ class JobSalariesAnalyzer(Analyzer):
                          self.report,
                          __name__,
                          __file__,
-                         os.getcwd())
+                         os.getcwd(),
+                         db_snapshot)
         # List of topics against which to compute salary stats/graphs
         self.salary_topics = self._get_salary_topics()
+        # Columns of the topics' tables, each table is loaded only once per
+        # analysis (e.g. 'job_locations' for the topics 'europe', 'usa' and
+        # 'world')
+        self.topic_columns = {}
         # If the JSON is not found, an exception is triggered
         self.us_states = self._load_json(os.path.expanduser(
             self.main_cfg['data_filepaths']['us_states']))
@@ -150,6 +161,8 @@ class JobSalariesAnalyzer(Analyzer):
         self._compute_mid_range_salaries()
         # Compute global stats on salaries, e.g. global max/min mid-range salaries
         self._compute_global_stats()
+        self.stats['mid_range_salaries_by_topic'] = {}
+        self.topic_columns = {}
         # =====================================================================
         #                          Analysis by topic
         # =====================================================================
@@ -179,6 +192,8 @@ class JobSalariesAnalyzer(Analyzer):
                     scatter_cfg=scatter_cfg,
                     append_xlabel_title="({})".format(
                         self.main_cfg['job_salaries']['salary_currency']))
+        # Free the topics' tables
+        self.topic_columns = {}
         # =====================================================================
         #                            Histogram
         # =====================================================================
@@ -209,50 +224,26 @@ class JobSalariesAnalyzer(Analyzer):
         if self.main_cfg['job_salaries']['save_report']:
             self._save_report(self.main_cfg['job_salaries']['report_filename'])
 
-    def _add_salary(self, dict_, topic_name, job_id):
-        dict_.setdefault(topic_name, {"average_mid_range_salary": 0,
-                                      "cumulative_sum": 0,
-                                      "count": 0})
-        mid_range_salary = self.stats["job_id_to_mid_range_salary"][job_id]
-        # Update count
-        dict_[topic_name]["count"] += 1
-        cum_sum = dict_[topic_name]["cumulative_sum"]
-        # Update average
-        dict_[topic_name]["average_mid_range_salary"] \
-            = (cum_sum + mid_range_salary) / dict_[topic_name]["count"]
-        # Update cumulative sum
-        dict_[topic_name]["cumulative_sum"] += mid_range_salary
-
     def _analyze_salary_by_topic(self, topic, use_fullnames=False):
         try:
             select_method = self.__getattribute__("_select_{}".format(topic))
         except AttributeError as e:
             raise AttributeError(e)
-        # Get topic's records in the db that have a salary associated with
-        job_post_ids = self.stats['job_ids_with_salary']
-        # Convert the list of `job_post_id` as a string to be used inside SQL
-        # expression
-        str_job_post_ids = convert_list_to_str(job_post_ids)
-        # Two columns selected: job_post_id and name
+        # Get topic's rows that have a salary associated with
+        job_post_ids = np.asarray(self.stats['job_ids_with_salary'])
+        # Two arrays: the job_post_ids and the names of the topic's rows
         # e.g. name of an industry or a skill
-        results = select_method(str_job_post_ids, use_fullnames)
-        # Sanity check on `job_post_id`s
-        # `set1`: all `job_post_id`s
-        set1 = set(job_post_ids)
-        # `set2`: `job_post_id`s only for the topic
-        set2 = set(np.array(results)[:, 0].astype(np.int).tolist())
-        assert len(set2) == len(set1.intersection(set2)), \
-            "set1 (all `job_post_id`s) should be a superset of set2 " \
-            "(`job_post_id`s for the given topic only '{}'".format(topic)
-        # Process results to extract average mid-range salaries for each
-        # topic's rows
-        struct_arr = self._process_topic_with_salaries(results, topic)
+        topic_job_post_ids, names = select_method(job_post_ids, use_fullnames)
+        # Process the rows to extract average mid-range salaries for each
+        # topic's name
+        struct_arr = self._process_topic_with_salaries(topic_job_post_ids,
+                                                       names, topic)
         # Update report for the given topic (e.g. industries, skills)
         # NOTE: `items` are sorted by the `average_mid_range_salary`
         self._update_graph_report(
             graph_report=self.report['scatter_{}'.format(topic)],
             items=struct_arr.tolist(),
-            job_post_ids=list(set2))
+            job_post_ids=list(set(topic_job_post_ids.tolist())))
         return struct_arr
 
     def _compute_global_stats(self):
@@ -276,6 +267,7 @@ class JobSalariesAnalyzer(Analyzer):
         mid_range_salaries = salary_ranges.mean(axis=1)
         self.stats['job_id_to_mid_range_salary'] = \
             dict(zip(self.stats['salaries'][:, 0], mid_range_salaries))
+        self.stats['mid_range_salaries'] = mid_range_salaries
         # Sort the mid range salaries in ascending order
         self.stats['mid_range_salaries_asc'] = np.sort(mid_range_salaries)
 
@@ -366,6 +358,22 @@ class JobSalariesAnalyzer(Analyzer):
 
         :return: list of tuples of the form (job_post_id, min_salary, max_salary)
         """
+        if self.db_snapshot is not None:
+            salaries_cfg = self.main_cfg['job_salaries']
+            thresholds = salaries_cfg['salary_thresholds']
+            snapshot = self.db_snapshot
+            min_salaries = snapshot.column('job_salaries', 'min_salary')
+            max_salaries = snapshot.column('job_salaries', 'max_salary')
+            # NOTE: the salaries with a NULL bound (NaN) are excluded by the
+            # comparisons as in SQL
+            mask = (snapshot.column('job_salaries', 'currency') ==
+                    salaries_cfg['salary_currency']) & \
+                (min_salaries >= thresholds['min_salary']) & \
+                (max_salaries <= thresholds['max_salary'])
+            return list(zip(
+                snapshot.column('job_salaries', 'job_post_id', mask).tolist(),
+                min_salaries[mask].astype(np.int64).tolist(),
+                max_salaries[mask].astype(np.int64).tolist()))
         # TODO: use parameterized SQL expressions
         sql = "SELECT job_post_id, min_salary, max_salary FROM job_salaries " \
               "WHERE currency='{0}' and min_salary >= {1} and max_salary <= " \
@@ -379,15 +387,61 @@ class JobSalariesAnalyzer(Analyzer):
         return [k for k, v in self.main_cfg['job_salaries']["topics"].items()
                 if v]
 
-    def _process_topic_with_salaries(self, topic_names, topic):
-        topic_name_to_salary = {}
-        # TODO: simplify with pandas (group by)
-        for job_id, topic_name in topic_names:
-            self._add_salary(topic_name_to_salary, topic_name, job_id)
-        # Keep every fields, except "cumulative_sum" and build a structured array
-        # out of the dict
-        topic_name_salary_list = [(k, v["average_mid_range_salary"], v["count"])
-                                  for k, v in topic_name_to_salary.items()]
+    # Returns: tuple of arrays (job_post_ids, names) of the rows of the topic's
+    #          table whose job_post_id is in `job_post_ids` and that satisfy
+    #          `mask` (if given)
+    def _get_topic_rows(self, table_name, name_column, job_post_ids, mask=None):
+        columns = self._get_topic_columns(table_name)
+        selected = np.isin(columns['job_post_id'], job_post_ids)
+        if mask is not None:
+            selected &= mask
+        return columns['job_post_id'][selected], columns[name_column][selected]
+
+    # Returns: dict of the columns (as arrays) of the topic's table
+    def _get_topic_columns(self, table_name):
+        if table_name not in self.topic_columns and \
+                self.db_snapshot is not None:
+            column_names = ['job_post_id', 'country', 'region'] \
+                if table_name == 'job_locations' else ['job_post_id', 'name']
+            self.topic_columns[table_name] = {
+                column_name: self.db_snapshot.column(table_name, column_name)
+                for column_name in column_names}
+        elif table_name not in self.topic_columns:
+            if table_name == 'job_locations':
+                sql = "SELECT job_post_id, country, region FROM job_locations"
+            else:
+                sql = "SELECT job_post_id, name FROM {}".format(table_name)
+            self.logger.debug("Loading the table '{}'".format(table_name))
+            self.topic_columns[table_name] = load_columns(self.db_session, sql)
+        return self.topic_columns[table_name]
+
+    # Convert the names of the topic's rows to their full names (e.g. 'US' to
+    # 'United States'). Each distinct name is converted only once and the rows
+    # whose name can't be converted are skipped.
+    # Returns: tuple of arrays (job_post_ids, names)
+    def _convert_topic_names(self, job_post_ids, names, converter):
+        if not len(names):
+            return job_post_ids, names
+        unique_names, inverse = np.unique(names.astype(str),
+                                          return_inverse=True)
+        # NOTE: the names are given as the "job_post_ids" of the rows so that
+        # the converted names can be mapped back to them
+        fullnames = dict(self._convert_countries_names(
+            list_countries=[(name, name) for name in unique_names.tolist()],
+            converter=converter))
+        converted = np.array([fullnames.get(name)
+                              for name in unique_names.tolist()],
+                             dtype=object)[inverse.ravel()]
+        mask = np.not_equal(converted, None)
+        return job_post_ids[mask], converted[mask]
+
+    def _process_topic_with_salaries(self, job_post_ids, names, topic):
+        # Mid-range salary of each topic's row
+        mask, mid_range_salaries = join_on_job_post_ids(
+            job_post_ids, self.stats['salaries'][:, 0],
+            self.stats['mid_range_salaries'])
+        aggregation = group_by(names[mask], mid_range_salaries)
+        self.stats['mid_range_salaries_by_topic'][topic] = aggregation
         # Fields (+ data types) for the structured array
         # TODO: adjust precision of float numbers
         # TODO: the length of the string field should be set in a config (for
@@ -401,7 +455,10 @@ class JobSalariesAnalyzer(Analyzer):
         dtype = [(topic, "U30"),
                  ("average_mid_range_salary", float),
                  ("count", int)]
-        struct_arr = np.array(topic_name_salary_list, dtype=dtype)
+        struct_arr = np.zeros(len(aggregation['topic']), dtype=dtype)
+        struct_arr[topic] = aggregation['topic']
+        struct_arr["average_mid_range_salary"] = aggregation['mean']
+        struct_arr["count"] = aggregation['count']
         # Sort the array based on the field 'average_mid_range_salary' and in
         # descending order of the given field
         struct_arr.sort(order="average_mid_range_salary")
@@ -410,84 +467,77 @@ class JobSalariesAnalyzer(Analyzer):
 
     def _select_europe(self, job_post_ids, use_fullnames=False):
         """
-        Returns all European countries with the specified `job_post_ids`. A list
-        of tuples is returned where a tuple is of the form (job_post_id, country).
+        Returns all European countries with the specified `job_post_ids`. A
+        tuple of arrays is returned: the job_post_ids and the countries.
 
-        :return: list of tuples of the form (job_post_id, country)
+        :return: tuple of arrays (job_post_ids, countries)
         """
-        sql = "SELECT job_post_id, country FROM job_locations WHERE" \
-              " job_post_id in ({}) and country in ({})".format(
-                job_post_ids, self._get_european_countries_as_str())
-        results = self.db_session.execute(sql).fetchall()
+        locations = self._get_topic_columns('job_locations')
+        is_european = np.isin(locations['country'].astype(str),
+                              sorted(self._get_european_countries()))
+        results = self._get_topic_rows('job_locations', 'country',
+                                       job_post_ids, is_european)
         if use_fullnames:
-            results = self._convert_countries_names(
-                list_countries=results,
-                converter=self._get_country_name)
+            results = self._convert_topic_names(
+                *results, converter=self._get_country_name)
         return results
 
     def _select_industries(self, job_post_ids, *args):
         """
-        Returns all industries with the specified `job_post_id`s. A list of
-        tuples is returned where a tuple is of the form (job_post_id, name).
+        Returns all industries with the specified `job_post_id`s. A tuple of
+        arrays is returned: the job_post_ids and the names.
 
-        :return: list of tuples of the form (job_post_id, name)
+        :return: tuple of arrays (job_post_ids, names)
         """
-        sql = "SELECT job_post_id, name FROM industries WHERE job_post_id in " \
-              "({})".format(job_post_ids)
-        return self.db_session.execute(sql).fetchall()
+        return self._get_topic_rows('industries', 'name', job_post_ids)
 
     def _select_roles(self, job_post_ids, *args):
         """
-        Returns all roles with the specified `job_post_id`s. A list of
-        tuples is returned where a tuple is of the form (job_post_id, name).
+        Returns all roles with the specified `job_post_id`s. A tuple of
+        arrays is returned: the job_post_ids and the names.
 
-        :return: list of tuples of the form (job_post_id, name)
+        :return: tuple of arrays (job_post_ids, names)
         """
-        sql = "SELECT job_post_id, name FROM roles WHERE job_post_id in " \
-              "({})".format(job_post_ids)
-        return self.db_session.execute(sql).fetchall()
+        return self._get_topic_rows('roles', 'name', job_post_ids)
 
     def _select_skills(self, job_post_ids, *args):
         """
-        Returns all skills with the specified `job_post_id`s. A list of
-        tuples is returned where a tuple is of the form (job_post_id, name).
+        Returns all skills with the specified `job_post_id`s. A tuple of
+        arrays is returned: the job_post_ids and the names.
 
-        :return: list of tuples of the form (job_post_id, name)
+        :return: tuple of arrays (job_post_ids, names)
         """
-        sql = "SELECT job_post_id, name FROM skills WHERE job_post_id in " \
-              "({})".format(job_post_ids)
-        return self.db_session.execute(sql).fetchall()
+        return self._get_topic_rows('skills', 'name', job_post_ids)
 
     def _select_usa(self, job_post_ids, use_fullnames=False):
         """
-        Returns all US states with the specified `job_post_id`s. A list of
-        tuples is returned where a tuple is of the form (job_post_id, country).
-        US locations where region is 'NULL' are ignored.
+        Returns all US states with the specified `job_post_id`s. A tuple of
+        arrays is returned: the job_post_ids and the regions. US locations
+        where region is 'NULL' are ignored.
 
-        :return: list of tuples of the form (job_post_id, region)
+        :return: tuple of arrays (job_post_ids, regions)
         """
-        sql = "SELECT job_post_id, region FROM job_locations WHERE job_post_id " \
-              "in ({}) and country='US' and region!='NULL'".format(job_post_ids)
-        results = self.db_session.execute(sql).fetchall()
+        locations = self._get_topic_columns('job_locations')
+        regions = locations['region']
+        is_us_state = (locations['country'] == 'US') & \
+            np.not_equal(regions, None) & (regions != 'NULL')
+        results = self._get_topic_rows('job_locations', 'region',
+                                       job_post_ids, is_us_state)
         if use_fullnames:
-            results = self._convert_countries_names(
-                list_countries=results,
-                converter=self.us_states.get)
+            results = self._convert_topic_names(
+                *results, converter=self.us_states.get)
         return results
 
     def _select_world(self, job_post_ids, use_fullnames=False):
         """
-        Returns all countries with the specified `job_post_id`s. A list of
-        tuples is returned where a tuple is of the form (job_post_id, country).
+        Returns all countries with the specified `job_post_id`s. A tuple of
+        arrays is returned: the job_post_ids and the countries.
 
-        :return: list of tuples of the form (job_post_id, country)
+        :return: tuple of arrays (job_post_ids, countries)
         """
-        sql = "SELECT job_post_id, country FROM job_locations WHERE job_post_id " \
-              "in ({})".format(job_post_ids)
-        results = self.db_session.execute(sql).fetchall()
+        results = self._get_topic_rows('job_locations', 'country',
+                                       job_post_ids)
         if use_fullnames:
-            results = self._convert_countries_names(
-                list_countries=results,
-                converter=self._get_country_name)
+            results = self._convert_topic_names(
+                *results, converter=self._get_country_name)
         return results
-
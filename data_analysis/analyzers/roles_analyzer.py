@@ -7,7 +7,8 @@ from .analyzer import Analyzer
 
 
 class RolesAnalyzer(Analyzer):
-    def __init__(self, analysis_type, conn, db_session, main_cfg, logging_cfg):
+    def __init__(self, analysis_type, conn, db_session, main_cfg, logging_cfg,
+                 db_snapshot=None):
         # Roles stats to compute
         self.stats_names = ["sorted_roles_count"]
         self.report = {
@@ -32,7 +33,8 @@ class RolesAnalyzer(Analyzer):
                          self.report,
                          __name__,
                          __file__,
-                         os.getcwd())
+                         os.getcwd(),
+                         db_snapshot)
 
     def run_analysis(self):
         # Reset all roles stats to be computed
@@ -69,9 +71,8 @@ class RolesAnalyzer(Analyzer):
         return self.db_session.execute(sql).fetchall()
         """
         self.logger.debug("Counting all roles")
-        sql = "SELECT job_post_id, name FROM roles"
-        results = self.db_session.execute(sql).fetchall()
-        results, list_ids, duplicates, skipped = self._count_items(results)
+        results, list_ids, duplicates, skipped = self._count_items_in_db(
+            'roles')
         # Update report for roles
         self._update_graph_report(
             graph_report=self.report['barh'],
@@ -7,7 +7,8 @@ from .analyzer import Analyzer
 
 
 class SkillsAnalyzer(Analyzer):
-    def __init__(self, analysis_type, conn, db_session, main_cfg, logging_cfg):
+    def __init__(self, analysis_type, conn, db_session, main_cfg, logging_cfg,
+                 db_snapshot=None):
         # Skills stats to compute
         self.stats_names = ["sorted_skills_count"]
         self.report = {
@@ -32,7 +33,8 @@ class SkillsAnalyzer(Analyzer):
                          self.report,
                          __name__,
                          __file__,
-                         os.getcwd())
+                         os.getcwd(),
+                         db_snapshot)
 
     def run_analysis(self):
         # Reset all skills stats to be computed
@@ -70,9 +72,8 @@ class SkillsAnalyzer(Analyzer):
         return self.db_session.execute(sql).fetchall()
         """
         self.logger.debug("Counting all skills")
-        sql = "SELECT job_post_id, name FROM skills"
-        results = self.db_session.execute(sql).fetchall()
-        results, list_ids, duplicates, skipped = self._count_items(results)
+        results, list_ids, duplicates, skipped = self._count_items_in_db(
+            'skills')
         # Update report for skills
         self._update_graph_report(
             graph_report=self.report['barh'],
@@ -0,0 +1,172 @@
+"""
+Vectorized aggregation of the topics of the analyses (e.g. skills, roles,
+industries, locations), i.e. group-bys done with NumPy on columns instead of
+updating dicts one row at a time.
+
+A topic table (e.g. 'skills') is loaded once as columns (one NumPy array per
+column of the SQL query) with `load_columns()`. The rows of a topic are then
+given as two aligned arrays: `job_post_ids` and `names` (e.g. the name of the
+skill of each row).
+
+Usage:
+    columns = load_columns(db_session, "SELECT job_post_id, name FROM skills")
+    mask, mid_range_salaries = join_on_job_post_ids(
+        columns['job_post_id'], salaries_job_post_ids, salaries)
+    aggregation = group_by(columns['name'][mask], mid_range_salaries)
+
+The distinct job posts of each topic (e.g. the counts of the skills, roles,
+industries and job benefits in the db snapshot) are counted with
+`count_job_posts()` on the topic's names factorized with `factorize()`:
+    codes, categories = factorize(columns['name'])
+    results, job_post_ids, is_duplicate = count_job_posts(
+        columns['job_post_id'], codes, categories)
+"""
+# Third-party modules
+import numpy as np
+
+
+# Percentiles computed (besides the median) for each topic by `group_by()`
+DEFAULT_PERCENTILES = [25, 75]
+
+
+# Returns: dict with the columns' names of the SQL query as keys and NumPy
+#          arrays as values, e.g. {'job_post_id': array([...]),
+#          'name': array([...], dtype=object)}
+# NOTE: the integer columns are int64 arrays, the other columns (e.g. strings
+# which can be NULL) are object arrays
+def load_columns(db_session, sql):
+    result = db_session.execute(sql)
+    keys = list(result.keys())
+    rows = result.fetchall()
+    if not rows:
+        return {key: np.array([], dtype=object) for key in keys}
+    columns = {}
+    for key, column in zip(keys, zip(*rows)):
+        if all(isinstance(value, int) for value in column):
+            columns[key] = np.array(column, dtype=np.int64)
+        else:
+            columns[key] = np.array(column, dtype=object)
+    return columns
+
+
+# Join the rows of a topic with the values (e.g. the mid-range salaries) of
+# the job posts, i.e. an inner join on the job_post_ids
+# `values_job_post_ids` must be unique
+# Returns: tuple (mask, joined_values) where `mask` selects the rows of the
+#          topic whose job post has a value and `joined_values` are these values
+#          (aligned with the selected rows)
+def join_on_job_post_ids(job_post_ids, values_job_post_ids, values):
+    job_post_ids = np.asarray(job_post_ids, dtype=np.int64)
+    values_job_post_ids = np.asarray(values_job_post_ids, dtype=np.int64)
+    values = np.asarray(values)
+    if not len(values_job_post_ids):
+        return np.zeros(len(job_post_ids), dtype=bool), values[:0]
+    sorter = np.argsort(values_job_post_ids, kind='stable')
+    sorted_ids = values_job_post_ids[sorter]
+    idx = np.searchsorted(sorted_ids, job_post_ids)
+    idx[idx == len(sorted_ids)] = 0
+    mask = sorted_ids[idx] == job_post_ids
+    return mask, values[sorter[idx[mask]]]
+
+
+# Group the rows by topic's name and aggregate their values (if any)
+# `names` are converted to strings (e.g. None becomes 'None')
+# Returns: dict of arrays aligned by topic:
+#          - 'topic': names of the topics in the order of their first occurrence
+#          - 'count': number of rows of each topic
+#          and if `values` is given:
+#          - 'sum', 'mean', 'median', 'p<q>' for each percentile q (linear
+#            interpolation as `np.percentile()`)
+def group_by(names, values=None, percentiles=None):
+    names = np.asarray(names).astype(str)
+    percentiles = DEFAULT_PERCENTILES if percentiles is None else percentiles
+    if not len(names):
+        aggregation = {'topic': names, 'count': np.array([], dtype=np.int64)}
+        if values is not None:
+            for key in ['sum', 'mean', 'median'] + \
+                       ['p{}'.format(q) for q in percentiles]:
+                aggregation[key] = np.array([], dtype=float)
+        return aggregation
+    unique_names, first_idx, inverse = np.unique(
+        names, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    # Renumber the groups in order of first occurrence (as a dict would keep
+    # them) instead of the sorted order of `np.unique()`
+    order = np.argsort(first_idx, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    groups = rank[inverse]
+    counts = np.bincount(groups)
+    aggregation = {'topic': unique_names[order], 'count': counts}
+    if values is None:
+        return aggregation
+    values = np.asarray(values, dtype=float)
+    # NOTE: `np.bincount()` adds the values in the order of the rows, i.e. the
+    # sums are the same as the ones of a running sum
+    sums = np.bincount(groups, weights=values)
+    aggregation['sum'] = sums
+    aggregation['mean'] = sums / counts
+    # Sort the values within each group: the groups are then contiguous slices
+    # starting at `starts`
+    sorted_values = values[np.lexsort((values, groups))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    aggregation['median'] = _percentiles(sorted_values, starts, counts, 50)
+    for q in percentiles:
+        aggregation['p{}'.format(q)] = _percentiles(sorted_values, starts,
+                                                    counts, q)
+    return aggregation
+
+
+# Returns: tuple (codes, categories) where `categories` is an object array of
+#          the distinct values in the order of their first occurrence (None
+#          included) and `codes` is an int32 array of the index of each value
+#          in `categories`
+def factorize(values):
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index))
+                         for value in values),
+                        dtype=np.int32, count=len(values))
+    categories = np.empty(len(index), dtype=object)
+    categories[:] = list(index)
+    return codes, categories
+
+
+# Count the distinct job posts of each name, as `Analyzer._count_items()`
+# without converter (and as `Analyzer._query_items_counts()` in the db)
+# `codes` and `categories` are the names as returned by `factorize()`, i.e. the
+# codes are numbered in order of first occurrence
+# Returns: tuple (results, job_post_ids, is_duplicate) where `results` are the
+#          tuples (name, count) in decreasing order of count (the names with
+#          the same count in the order of their first occurrence),
+#          `job_post_ids` are the distinct job_post_ids in the order of their
+#          first occurrence and `is_duplicate` is a boolean array selecting the
+#          rows whose name was already found for the same job post
+def count_job_posts(job_post_ids, codes, categories):
+    job_post_ids = np.asarray(job_post_ids, dtype=np.int64)
+    codes = np.asarray(codes)
+    if not len(codes):
+        return [], job_post_ids, np.zeros(0, dtype=bool)
+    # Keep the first occurrence of each (job_post_id, name), i.e. drop the
+    # duplicates
+    pairs = np.stack([job_post_ids, codes], axis=1)
+    _, first_idx = np.unique(pairs, axis=0, return_index=True)
+    is_duplicate = np.ones(len(codes), dtype=bool)
+    is_duplicate[first_idx] = False
+    # NOTE: the codes are numbered in order of first occurrence, thus the ties
+    # are sorted by code
+    counts = np.bincount(codes[~is_duplicate], minlength=len(categories))
+    order = np.lexsort((np.arange(len(counts)), -counts))
+    results = list(zip(categories[order].tolist(), counts[order].tolist()))
+    _, first_idx = np.unique(job_post_ids, return_index=True)
+    return results, job_post_ids[np.sort(first_idx)], is_duplicate
+
+
+# Returns: array of the q-th percentile of each group of `sorted_values`
+def _percentiles(sorted_values, starts, counts, q):
+    positions = (counts - 1) * (q / 100)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    fraction = positions - lower
+    lower_values = sorted_values[starts + lower]
+    upper_values = sorted_values[starts + upper]
+    return lower_values + (upper_values - lower_values) * fraction
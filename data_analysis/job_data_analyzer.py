@@ -1,10 +1,14 @@
+import concurrent.futures
 import os
+import time
 # Third-party modules
 import ipdb
 from sqlalchemy import create_engine
 from sqlalchemy.engine.url import URL
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker
 # Own modules
+from analyzers.db_snapshot import DBSnapshot
 # from analyzers.companies_analyzer import CompaniesAnalyzer
 from analyzers.industries_analyzer import IndustriesAnalyzer
 from analyzers.job_benefits_analyzer import JobBenefitsAnalyzer
@@ -13,13 +17,29 @@ from analyzers.job_locations_analyzer import JobLocationsAnalyzer
 from analyzers.job_salaries_analyzer import JobSalariesAnalyzer
 from analyzers.roles_analyzer import RolesAnalyzer
 from analyzers.skills_analyzer import SkillsAnalyzer
-from tables import Base
+from tables import Base, create_item_indexes
 from utilities.genutils import create_timestamped_directory, read_yaml_config
 from utilities.script_boilerplate import LoggingBoilerplate
 
 
+# Snapshot of the db loaded by the main process before starting the processes
+# of `analysis_workers`, which inherit it when they are forked (otherwise each
+# process loads its own)
+_db_snapshot = None
+
 class JobDataAnalyzer:
-    def __init__(self, main_cfg_path, logging_cfg):
+    def __init__(self, main_cfg_path, logging_cfg, report_dirpath=None):
+        """
+        Runs the analyses enabled in the main config (e.g. skills, job
+        salaries) and saves their reports and graphs in a timestamped report
+        directory.
+
+        :param main_cfg_path: path of the main config (YAML)
+        :param logging_cfg: logging config (dict)
+        :param report_dirpath: report directory to use instead of creating a
+                               new timestamped one, e.g. by the processes of
+                               `analysis_workers`
+        """
         self.main_cfg_path = main_cfg_path
         self.logging_cfg = logging_cfg
         sb = LoggingBoilerplate(
@@ -29,6 +49,21 @@ class JobDataAnalyzer:
             logging_cfg=logging_cfg)
         self.logger = sb.get_logger()
         self.main_cfg = self._load_main_cfg()
+        if report_dirpath is None:
+            report_dirpath = self._create_report_directory()
+        # Update the main config with the newly create saving directory
+        self.main_cfg.update({'saving_dirpath': report_dirpath})
+        self.types_of_analyses = self._get_analyses()
+        # TODO: implement db connection with SQLite
+        # Db connection to be used with SQLite
+        # self.conn = gu.connect_db("")
+        self.conn = None
+        self.db_session = self._get_db_session()
+        # In-memory snapshot of the db, loaded once (see `db_snapshot` in the
+        # main config)
+        self.db_snapshot = None
+
+    def _create_report_directory(self):
         # Create saving directory
         # Folder name will begin with the date+time
         try:
@@ -42,14 +77,18 @@ class JobDataAnalyzer:
             raise SystemExit
         else:
             self.logger.info("Directory '{}' created!".format(report_dirpath))
-        # Update the main config with the newly create saving directory
-        self.main_cfg.update({'saving_dirpath': report_dirpath})
-        self.types_of_analyses = self._get_analyses()
-        # TODO: implement db connection with SQLite
-        # Db connection to be used with SQLite
-        # self.conn = gu.connect_db("")
-        self.conn = None
-        self.db_session = self._get_db_session()
+            return report_dirpath
+
+    # Load the db snapshot if it is enabled and not already loaded, e.g. by a
+    # previous analysis
+    def _load_db_snapshot(self):
+        if not self.main_cfg.get('db_snapshot') or self.db_snapshot is not None:
+            return
+        self.logger.info("Loading the db snapshot ...")
+        start = time.perf_counter()
+        self.db_snapshot = DBSnapshot(self.db_session, logger=self.logger)
+        self.logger.info("db snapshot loaded in {:.1f} s".format(
+            time.perf_counter() - start))
 
     def _get_analyses(self):
         return [k for k, v in self.main_cfg.items()
@@ -76,26 +115,89 @@ class JobDataAnalyzer:
         self.logger.info("Database setup of {}".format(db_url['database']))
         engine = create_engine(URL(**db_url))
         Base.metadata.bind = engine
+        self._create_item_indexes(engine)
         # Setup database session
         DBSession = sessionmaker(bind=engine)
         db_session = DBSession()
         return db_session
 
+    # The counts of the items are done on covering indexes that databases
+    # created before these indexes were added don't have
+    def _create_item_indexes(self, engine):
+        try:
+            start = time.perf_counter()
+            created = create_item_indexes(engine)
+        except OperationalError as e:
+            # e.g. read-only database: the counts are still done, only slower
+            self.logger.exception(e)
+            self.logger.warning("The indexes of the items tables couldn't be "
+                                "created")
+        else:
+            if created:
+                self.logger.info("Indexes created in {:.1f} s: {}".format(
+                    time.perf_counter() - start, ", ".join(created)))
+
     def run_analysis(self):
+        self._load_db_snapshot()
+        n_workers = self.main_cfg.get('analysis_workers', 0)
+        if n_workers and len(self.types_of_analyses) > 1:
+            self.run_analyses_in_processes(n_workers)
+            return
+        for analysis_type in self.types_of_analyses:
+            self.run_analysis_of_type(analysis_type)
+
+    # Returns: float, the duration of the analysis (in seconds) or None if the
+    #          analysis was skipped
+    def run_analysis_of_type(self, analysis_type):
+        start = time.perf_counter()
+        try:
+            self.logger.info(
+                "Starting the '{}' analysis".format(analysis_type))
+            analyze_method = self.__getattribute__(
+                "_analyze_{}".format(analysis_type))
+            analyze_method(analysis_type)
+        except (AttributeError, FileNotFoundError) as e:
+            self.logger.exception(e)
+            self.logger.error(
+                "The '{}' analysis will be skipped".format(analysis_type))
+            return None
+        else:
+            duration = time.perf_counter() - start
+            self.logger.info("End of the '{}' analysis ({:.1f} s)".format(
+                analysis_type, duration))
+            return duration
+
+    # Run the analyses in a pool of processes since they are independent
+    # readers of the db. Each process has its own db session and saves its
+    # reports and graphs in the same report directory (their filenames are
+    # different for each analysis).
+    def run_analyses_in_processes(self, n_workers):
+        global _db_snapshot
+        _db_snapshot = self.db_snapshot
+        n_workers = min(n_workers, len(self.types_of_analyses))
+        self.logger.info("Running {} analyses with {} processes".format(
+            len(self.types_of_analyses), n_workers))
+        start = time.perf_counter()
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=n_workers) as executor:
+            futures = {
+                executor.submit(_run_analysis_in_process,
+                                self.main_cfg_path,
+                                self.logging_cfg,
+                                self.main_cfg['saving_dirpath'],
+                                analysis_type): analysis_type
+                for analysis_type in self.types_of_analyses}
+            durations = {}
+            for future in concurrent.futures.as_completed(futures):
+                analysis_type = futures[future]
+                durations[analysis_type] = future.result()
         for analysis_type in self.types_of_analyses:
-            try:
-                self.logger.info(
-                    "Starting the '{}' analysis".format(analysis_type))
-                analyze_method = self.__getattribute__(
-                    "_analyze_{}".format(analysis_type))
-                analyze_method(analysis_type)
-            except (AttributeError, FileNotFoundError) as e:
-                self.logger.exception(e)
-                self.logger.error(
-                    "The '{}' analysis will be skipped".format(analysis_type))
-            else:
-                self.logger.info(
-                    "End of the '{}' analysis".format(analysis_type))
+            duration = durations[analysis_type]
+            self.logger.info("'{}' analysis: {}".format(
+                analysis_type, 'skipped' if duration is None
+                else '{:.1f} s'.format(duration)))
+        self.logger.info("All the analyses done in {:.1f} s".format(
+            time.perf_counter() - start))
 
     def _analyze_companies(self, analysis_type):
         """
@@ -117,7 +219,8 @@ class JobDataAnalyzer:
                                 self.conn,
                                 self.db_session,
                                 self.main_cfg,
-                                self.logging_cfg)
+                                self.logging_cfg,
+                                self.db_snapshot)
         ia.run_analysis()
 
     def _analyze_job_benefits(self, analysis_type):
@@ -130,7 +233,8 @@ class JobDataAnalyzer:
                                   self.conn,
                                   self.db_session,
                                   self.main_cfg,
-                                  self.logging_cfg)
+                                  self.logging_cfg,
+                                  self.db_snapshot)
         jla.run_analysis()
 
     def _analyze_job_locations(self, analysis_type):
@@ -143,7 +247,8 @@ class JobDataAnalyzer:
                                    self.conn,
                                    self.db_session,
                                    self.main_cfg,
-                                   self.logging_cfg)
+                                   self.logging_cfg,
+                                   self.db_snapshot)
         jla.run_analysis()
 
     def _analyze_job_posts(self, analysis_type):
@@ -161,7 +266,8 @@ class JobDataAnalyzer:
                                   self.conn,
                                   self.db_session,
                                   self.main_cfg,
-                                  self.logging_cfg)
+                                  self.logging_cfg,
+                                  self.db_snapshot)
         jsa.run_analysis()
 
     def _analyze_roles(self,analysis_type):
@@ -174,7 +280,8 @@ class JobDataAnalyzer:
                            self.conn,
                            self.db_session,
                            self.main_cfg,
-                           self.logging_cfg)
+                           self.logging_cfg,
+                           self.db_snapshot)
         ra.run_analysis()
 
     def _analyze_skills(self, analysis_type):
@@ -188,8 +295,25 @@ class JobDataAnalyzer:
                             self.conn,
                             self.db_session,
                             self.main_cfg,
-                            self.logging_cfg)
+                            self.logging_cfg,
+                            self.db_snapshot)
         sa.run_analysis()
 
     def generate_report(self):
         raise NotImplementedError
+
+
+# Run an analysis in a process of `analysis_workers` with its own db session
+# Returns: float, the duration of the analysis (in seconds) or None if the
+#          analysis was skipped
+def _run_analysis_in_process(main_cfg_path, logging_cfg, report_dirpath,
+                             analysis_type):
+    job_data_analyzer = JobDataAnalyzer(main_cfg_path=main_cfg_path,
+                                        logging_cfg=logging_cfg,
+                                        report_dirpath=report_dirpath)
+    job_data_analyzer.db_snapshot = _db_snapshot
+    job_data_analyzer._load_db_snapshot()
+    try:
+        return job_data_analyzer.run_analysis_of_type(analysis_type)
+    finally:
+        job_data_analyzer.db_session.close()
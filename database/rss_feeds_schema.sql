@@ -5,7 +5,9 @@ create table feeds (
         feed_id             integer primary key not null,
 		name		        text not null,
 		title		        text,
-		updated		        datetime
+		updated		        datetime,
+		etag		        text,  -- HTTP headers of the last download, used for
+		modified	        text   -- conditional GETs (ETag and Last-Modified)
 );
 
 -- Entries
@@ -28,3 +30,12 @@ create table tags (
 		name				text not null,
 		primary key(job_post_id, name)
 );
+
+-- Scraping state
+-- Used by the scraper's incremental mode: a job post is scraped again only if
+-- the content of its webpage changed since `last_scraped`
+create table scraping_state (
+		job_post_id			integer primary key not null references entries(job_post_id),
+		last_scraped		datetime,
+		content_hash		text
+);
\ No newline at end of file
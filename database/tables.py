@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, CHAR, Column, Date, DateTime, ForeignKey, Integer, String, Text
+from sqlalchemy import Boolean, CHAR, Column, Date, DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -27,6 +27,45 @@ class AbstractTable:
             self.__setattr__(key, value)
 
 
+# Covering indexes of the counts of the items (industries, job benefits, roles
+# and skills) done in the db by the analyzers, see
+# `Analyzer._count_items_in_db()`. They are created along with the tables on
+# new databases and by `create_item_indexes()` on existing ones.
+ITEM_TABLES = ['industries', 'job_benefits', 'roles', 'skills']
+
+
+def _item_indexes(table_name):
+    return (Index('ix_{}_name_job_post_id'.format(table_name), 'name',
+                  'job_post_id'),
+            Index('ix_{}_job_post_id_name'.format(table_name), 'job_post_id',
+                  'name'))
+
+
+# Create the covering indexes of the items tables that are not already in the
+# database, e.g. databases created before the indexes were added. The items
+# tables not in the database are skipped.
+# Returns: list of the names of the indexes created
+def create_item_indexes(engine):
+    created = []
+    with engine.begin() as conn:
+        existing = {}
+        for type_, name in conn.execute(
+                "SELECT type, name FROM sqlite_master WHERE type IN "
+                "('table', 'index')"):
+            existing.setdefault(type_, set()).add(name)
+        for table_name in ITEM_TABLES:
+            if table_name not in existing.get('table', ()):
+                continue
+            for index in Base.metadata.tables[table_name].indexes:
+                if index.name in existing.get('index', ()):
+                    continue
+                conn.execute("CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(
+                    index.name, table_name,
+                    ", ".join(column.name for column in index.columns)))
+                created.append(index.name)
+    return created
+
+
 # IMPORTANT: `Company` must first be added to the db, then the `JobPost` can be
 # added. `JobPost` needs the `company_id` when being added to the db.
 # The relationship from `Company` to `JobPost` is one to many
@@ -98,6 +137,7 @@ class ExperienceLevel(Base, AbstractTable):
 
 class Industry(Base, AbstractTable):
     __tablename__ = 'industries'
+    __table_args__ = _item_indexes('industries')
     id = Column(Integer, primary_key=True)
     job_post_id = Column(Integer, ForeignKey('job_posts.id'))
     name = Column(String(250))  # name of industry
@@ -108,6 +148,7 @@ class Industry(Base, AbstractTable):
 
 class JobBenefit(Base, AbstractTable):
     __tablename__ = 'job_benefits'
+    __table_args__ = _item_indexes('job_benefits')
     id = Column(Integer, primary_key=True)
     job_post_id = Column(Integer, ForeignKey('job_posts.id'))
     name = Column(String(250))  # name of job benefit
@@ -144,6 +185,7 @@ class JobSalary(Base, AbstractTable):
 
 class Role(Base, AbstractTable):
     __tablename__ = 'roles'
+    __table_args__ = _item_indexes('roles')
     id = Column(Integer, primary_key=True)
     job_post_id = Column(Integer, ForeignKey('job_posts.id'))
     name = Column(String(250))  # name of role
@@ -154,6 +196,7 @@ class Role(Base, AbstractTable):
 
 class Skill(Base, AbstractTable):
     __tablename__ = 'skills'
+    __table_args__ = _item_indexes('skills')
     id = Column(Integer, primary_key=True)
     job_post_id = Column(Integer, ForeignKey('job_posts.id'))
     name = Column(String(250))  # name of skill
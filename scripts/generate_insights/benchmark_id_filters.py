@@ -0,0 +1,123 @@
+"""
+Benchmark of the filtering of the job posts on a set of job_post_ids, as done
+by `Analyzer._get_min_max_published_dates()` for each report: the ids pasted
+into an `IN (...)` expression vs the ids loaded into a temporary table joined
+with the job posts (see `data_analysis/analyzers/id_tables.py`).
+
+The benchmark runs on a synthetic `job_posts` table (created in a temporary
+directory) or on the `job_posts` table of an existing database (`-d`), for
+each number of ids given with `-k`. Both queries must return the same dates.
+
+Usage:
+    $ python benchmark_id_filters.py
+    $ python benchmark_id_filters.py -n 1000000 -k 1000 10000 100000
+    $ python benchmark_id_filters.py -d ~/databases/job_data.sqlite
+"""
+import argparse
+from datetime import date, timedelta
+import os
+import random
+import sqlite3
+import tempfile
+import time
+# Third-party modules
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+# Own modules
+from data_analysis.analyzers.id_tables import load_ids
+
+
+# Create the table `job_posts` (only the columns used by the benchmark) with
+# `n_job_posts` job posts published over two years
+def create_job_posts(db_filepath, n_job_posts):
+    start_date = date(2017, 1, 1)
+    conn = sqlite3.connect(db_filepath)
+    with conn:
+        conn.execute("CREATE TABLE job_posts (id INTEGER PRIMARY KEY, "
+                     "date_posted DATE)")
+        conn.executemany(
+            "INSERT INTO job_posts (id, date_posted) VALUES (?, ?)",
+            ((job_post_id,
+              str(start_date + timedelta(days=random.randrange(730))))
+             for job_post_id in range(1, n_job_posts + 1)))
+    conn.close()
+
+
+# Returns: tuple ((min_date, max_date), duration)
+def time_in_list(db_session, job_post_ids):
+    start = time.perf_counter()
+    sql = "SELECT date_posted FROM job_posts WHERE id in ({}) ORDER BY " \
+          "date_posted ASC".format(", ".join(str(i) for i in job_post_ids))
+    results = db_session.execute(sql).fetchall()
+    return (results[0][0], results[-1][0]), time.perf_counter() - start
+
+
+# Returns: tuple ((min_date, max_date), duration)
+def time_ids_table(db_session, job_post_ids):
+    start = time.perf_counter()
+    ids_table = load_ids(db_session, job_post_ids)
+    sql = "SELECT MIN(job_posts.date_posted), MAX(job_posts.date_posted), " \
+          "COUNT(*) - COUNT(job_posts.date_posted) FROM {} AS ids CROSS " \
+          "JOIN job_posts ON job_posts.id = ids.id".format(ids_table)
+    min_date, max_date, n_no_dates = db_session.execute(sql).first()
+    if n_no_dates:
+        min_date = None
+    return (min_date, max_date), time.perf_counter() - start
+
+
+def run_benchmark(db_filepath, numbers_of_ids, repeat):
+    engine = create_engine('sqlite:///{}'.format(db_filepath))
+    db_session = sessionmaker(bind=engine)()
+    all_ids = [job_post_id for job_post_id, in
+               db_session.execute("SELECT id FROM job_posts")]
+    print("{} job posts".format(len(all_ids)))
+    print("{:>8} {:>14} {:>14} {:>8}".format(
+        'ids', 'IN list (ms)', 'ids table (ms)', 'speedup'))
+    n_diffs = 0
+    for n_ids in numbers_of_ids:
+        job_post_ids = random.sample(all_ids, min(n_ids, len(all_ids)))
+        in_list_durations = []
+        ids_table_durations = []
+        for _ in range(repeat):
+            in_list_dates, duration = time_in_list(db_session, job_post_ids)
+            in_list_durations.append(duration)
+            ids_table_dates, duration = time_ids_table(db_session,
+                                                       job_post_ids)
+            ids_table_durations.append(duration)
+            n_diffs += int(in_list_dates != ids_table_dates)
+        in_list_duration = min(in_list_durations)
+        ids_table_duration = min(ids_table_durations)
+        print("{:>8} {:>14.2f} {:>14.2f} {:>7.1f}x".format(
+            len(job_post_ids), in_list_duration * 1000,
+            ids_table_duration * 1000, in_list_duration / ids_table_duration))
+    db_session.close()
+    if n_diffs:
+        print("{} queries returned different dates".format(n_diffs))
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark the filtering of the job posts on a set of "
+                    "job_post_ids: IN list vs temporary table.")
+    parser.add_argument("-d", "--db_filepath",
+                        help="Database with a `job_posts` table. By default, "
+                             "a synthetic table is created.")
+    parser.add_argument("-n", "--n_job_posts", type=int, default=500000,
+                        help="Number of job posts of the synthetic table")
+    parser.add_argument("-k", "--numbers_of_ids", type=int, nargs='+',
+                        default=[100, 1000, 10000, 100000],
+                        help="Numbers of job_post_ids to filter on")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="Number of runs of each query (the fastest is "
+                             "reported)")
+    args = parser.parse_args()
+    random.seed(0)
+    if args.db_filepath:
+        run_benchmark(os.path.expanduser(args.db_filepath),
+                      args.numbers_of_ids, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dirpath:
+            db_filepath = os.path.join(tmp_dirpath, 'job_data.sqlite')
+            create_job_posts(db_filepath, args.n_job_posts)
+            run_benchmark(db_filepath, args.numbers_of_ids, args.repeat)
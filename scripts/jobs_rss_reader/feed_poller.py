@@ -0,0 +1,131 @@
+import json
+import threading
+
+
+class FeedSchedule:
+    def __init__(self, feed_url, initial_interval, min_interval, max_interval,
+                 backoff_factor=1.5):
+        """
+        Adaptive polling schedule of a feed: the interval between two polls
+        follows how often the feed's `updated` value actually changes.
+
+        - If `updated` changed since the last poll, the interval moves halfway
+          to the time elapsed since the previous observed change (or is divided
+          by `backoff_factor` if it is the first observed change).
+        - If `updated` didn't change (or the feed wasn't returned, i.e. HTTP
+          304 or an error), the interval is multiplied by `backoff_factor`.
+
+        The interval is always kept within [`min_interval`, `max_interval`].
+
+        :param feed_url: URL of the feed
+        :param initial_interval: interval (in seconds) until the first change
+                                 is observed
+        :param min_interval: minimum interval (in seconds) between two polls
+        :param max_interval: maximum interval (in seconds) between two polls
+        :param backoff_factor: factor by which the interval grows when the feed
+                               didn't change
+        """
+        self.feed_url = feed_url
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.interval = self._clamp(initial_interval)
+        # Feed's `updated` value as of the last poll
+        self.last_updated = None
+        # Time (as given to `update()`) when a change was last observed
+        self.last_change_time = None
+        # Time of the next poll, 0 = poll right away
+        self.next_poll = 0
+
+    # `updated` is the feed's `updated` value from the poll done at `now`, None
+    # if the poll didn't return the feed (e.g. HTTP 304 or an error)
+    # Returns: bool, True if `updated` changed since the previous poll
+    def update(self, updated, now):
+        changed = False
+        if updated is None or updated == self.last_updated:
+            self.interval = self._clamp(self.interval * self.backoff_factor)
+        elif self.last_updated is None:
+            # First value seen: it is the baseline for the next polls (the
+            # time of its change is unknown)
+            self.last_updated = updated
+        else:
+            changed = True
+            if self.last_change_time is None:
+                self.interval = self._clamp(self.interval / self.backoff_factor)
+            else:
+                period = now - self.last_change_time
+                self.interval = self._clamp((self.interval + period) / 2)
+            self.last_updated = updated
+            self.last_change_time = now
+        self.next_poll = now + self.interval
+        return changed
+
+    def _clamp(self, interval):
+        return min(self.max_interval, max(self.min_interval, interval))
+
+
+class PollStats:
+    def __init__(self):
+        """
+        Counters of the polling daemon: number of polls (including the ones
+        answered with HTTP 304 and the failed ones), entries inserted per poll
+        and poll latency (download + processing, in seconds), overall and per
+        feed.
+        """
+        self.lock = threading.Lock()
+        self.total = self._new_counters()
+        self.feeds = {}
+
+    @staticmethod
+    def _new_counters():
+        return {'polls': 0,
+                'not_modified': 0,
+                'errors': 0,
+                'changed': 0,
+                'entries': 0,
+                'max_entries_per_poll': 0,
+                'latency_total': 0.0,
+                'latency_max': 0.0}
+
+    def record(self, feed_url, n_entries, latency, not_modified=False,
+               error=False, changed=False):
+        with self.lock:
+            for counters in [self.total,
+                             self.feeds.setdefault(feed_url,
+                                                   self._new_counters())]:
+                counters['polls'] += 1
+                counters['not_modified'] += int(not_modified)
+                counters['errors'] += int(error)
+                counters['changed'] += int(changed)
+                counters['entries'] += n_entries
+                counters['max_entries_per_poll'] = max(
+                    counters['max_entries_per_poll'], n_entries)
+                counters['latency_total'] += latency
+                counters['latency_max'] = max(counters['latency_max'], latency)
+
+    # Returns: dict with the counters along with the averages of entries per
+    #          poll and poll latency, overall ('total') and per feed ('feeds')
+    def to_dict(self):
+        def with_averages(counters):
+            d = dict(counters)
+            polls = d['polls'] or 1
+            d['entries_per_poll'] = d['entries'] / polls
+            d['latency_mean'] = d['latency_total'] / polls
+            return d
+
+        with self.lock:
+            return {'total': with_averages(self.total),
+                    'feeds': {feed_url: with_averages(counters)
+                              for feed_url, counters in self.feeds.items()}}
+
+    def summary(self):
+        d = self.to_dict()['total']
+        return ("polls={polls} (304={not_modified}, errors={errors}, "
+                "changed={changed}) | entries={entries} "
+                "({entries_per_poll:.1f}/poll, max={max_entries_per_poll}) | "
+                "latency mean={latency_mean:.3f}s "
+                "max={latency_max:.3f}s".format(**d))
+
+    def save(self, filepath):
+        with open(filepath, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
@@ -0,0 +1,106 @@
+"""
+Local HTTP server serving RSS feeds from a directory (e.g. fixture feeds saved
+from https://stackoverflow.com/jobs/feed) with support for conditional GETs:
+each feed is served with the ETag and Last-Modified headers and a request
+with a matching If-None-Match or If-Modified-Since header is answered with 304.
+
+Usage: add the served feeds' URLs (e.g. http://localhost:8001/feed.xml) to
+`rss_feeds` in the RSS reader's main config and run:
+    $ python local_feeds_server.py ~/data/dev-jobs-insights/feeds/
+"""
+import argparse
+import email.utils
+import functools
+import hashlib
+import io
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+
+
+class FeedsHandler(SimpleHTTPRequestHandler):
+    # Numbers of responses sent, keyed by HTTP status code
+    # e.g. {200: 3, 304: 1}
+    status_counts = {}
+    lock = threading.Lock()
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(HTTPStatus.NOT_FOUND, "Feed not found")
+            return None
+        with open(path, 'rb') as f:
+            content = f.read()
+        etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+        mtime = int(os.path.getmtime(path))
+        if self.is_not_modified(etag, mtime):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return None
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/rss+xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified",
+                         email.utils.formatdate(mtime, usegmt=True))
+        self.end_headers()
+        return io.BytesIO(content)
+
+    # If-None-Match takes precedence over If-Modified-Since (RFC 7232)
+    def is_not_modified(self, etag, mtime):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [t.strip() for t in if_none_match.split(",")]
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return mtime <= since.timestamp()
+        return False
+
+    def send_response(self, code, message=None):
+        with self.lock:
+            self.status_counts[code] = self.status_counts.get(code, 0) + 1
+        super().send_response(code, message)
+
+    def log_message(self, format, *args):
+        # Don't flood the console with one line per request
+        pass
+
+
+def start_server(dirpath, host='localhost', port=8001):
+    """
+    Start the server in a daemon thread and return it. Call `shutdown()` on
+    the returned server to stop it.
+
+    :return: ThreadingHTTPServer
+    """
+    handler = functools.partial(FeedsHandler,
+                                directory=os.path.expanduser(dirpath))
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Serve RSS feeds over HTTP with support for conditional "
+                    "GETs.")
+    parser.add_argument("dirpath",
+                        help="Directory of the RSS feeds")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("-p", "--port", type=int, default=8001)
+    args = parser.parse_args()
+    handler = functools.partial(FeedsHandler,
+                                directory=os.path.expanduser(args.dirpath))
+    with ThreadingHTTPServer((args.host, args.port), handler) as httpd:
+        print("Serving '{}' on http://{}:{}".format(
+            args.dirpath, args.host, args.port))
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
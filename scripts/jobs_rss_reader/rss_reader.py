@@ -1,7 +1,12 @@
 import argparse
+import concurrent.futures
+import heapq
 import os
+import signal
 import sqlite3
 import sys
+import threading
+import time
 # Third-party modules
 import ipdb
 import feedparser
@@ -9,6 +14,7 @@ import feedparser
 from entry import Entry
 from exc import *
 from feed import Feed
+from feed_poller import FeedSchedule, PollStats
 from utilities.genutils import connect_db, read_yaml_config
 from utilities.script_boilerplate import ScriptBoilerplate
 
@@ -21,23 +27,182 @@ class RSSReader:
         # `jobs_scraper`
         self.logger = logger
         self.autocommit = autocommit
+        # If True, the entries and tags of a feed are inserted in batches (with
+        # `executemany`) and committed once per feed instead of one at a time
+        self.batched = self.main_cfg.get('batched_ingestion', False)
         # Current feed's URL being parsed
         self.feed_url = None
         self.db_filepath = self.main_cfg['db_filepath']
         self.conn = None
 
+    # Create the db connection. The same connection is used for all the feeds
+    # read by this reader (e.g. all the polls of the daemon).
+    def connect(self):
+        if self.conn is None:
+            try:
+                self.conn = connect_db(self.db_filepath)
+            except sqlite3.Error as e:
+                raise sqlite3.Error(e)
+
     def read(self, feed_url):
-        # Create db connection
+        self.connect()
+        with self.conn:
+            self.create_feeds_http_columns()
+            http_headers = self.select_feed_http_headers((feed_url,))
+        # ==============
+        # Parse RSS feed
+        # ==============
+        feed_parser_dict = self.fetch_feed(feed_url, *(http_headers or ()))
+        self.write_feed(feed_url, feed_parser_dict)
+
+    # Concurrent version of `read()` for many feeds: the feeds are downloaded
+    # and parsed in parallel by a pool of `max_workers` threads while the
+    # calling thread, the only one using the database connection, processes
+    # each feed as soon as it is parsed
+    # Returns: list of the URLs of the feeds skipped because they are not in the
+    #          database
+    def read_all(self, feed_urls, max_workers):
+        self.connect()
+        with self.conn:
+            self.create_feeds_http_columns()
+            all_http_headers = {
+                feed_url: self.select_feed_http_headers((feed_url,))
+                for feed_url in feed_urls}
+        skipped_feeds = []
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers) as executor:
+            future_to_feed_url = {
+                executor.submit(self.fetch_feed, feed_url,
+                                *(all_http_headers[feed_url] or ())): feed_url
+                for feed_url in feed_urls}
+            for future in concurrent.futures.as_completed(future_to_feed_url):
+                feed_url = future_to_feed_url[future]
+                try:
+                    self.logger.info("Processing the feed '{}'".format(feed_url))
+                    self.write_feed(feed_url, future.result())
+                except FeedNotFoundError as e:
+                    self.logger.critical(e)
+                    self.logger.warning("The feed '{}' will be skipped".format(
+                        feed_url))
+                    skipped_feeds.append(feed_url)
+                else:
+                    self.logger.info("End of processing feed '{}'".format(
+                        feed_url))
+        return skipped_feeds
+
+    # Daemon mode: poll the feeds until `stop_event` is set, each feed on its
+    # own schedule (see `FeedSchedule`), using the same db connection for all
+    # the polls. The counters of the polls (entries per poll, poll latency) are
+    # logged every `stats_every` polls and saved in `stats_filepath` if given.
+    # Returns: PollStats
+    def run_daemon(self, feed_urls, daemon_cfg, stop_event=None):
+        if stop_event is None:
+            stop_event = threading.Event()
+        self.connect()
+        with self.conn:
+            self.create_feeds_http_columns()
+        stats = PollStats()
+        schedules = [FeedSchedule(feed_url,
+                                  daemon_cfg['initial_interval'],
+                                  daemon_cfg['min_interval'],
+                                  daemon_cfg['max_interval'],
+                                  daemon_cfg['backoff_factor'])
+                     for feed_url in feed_urls]
+        # Heap of tuples (next_poll, index of the feed's schedule)
+        queue = [(schedule.next_poll, i) for i, schedule in enumerate(schedules)]
+        heapq.heapify(queue)
+        self.logger.info("Polling {} feeds".format(len(schedules)))
         try:
-            self.conn = connect_db(self.db_filepath)
-        except sqlite3.Error as e:
-            raise sqlite3.Error(e)
+            while queue and not stop_event.is_set():
+                next_poll, i = heapq.heappop(queue)
+                schedule = schedules[i]
+                # Sleep until the next poll is due (or the daemon is stopped)
+                if stop_event.wait(max(0, next_poll - time.monotonic())):
+                    break
+                start = time.monotonic()
+                n_entries = 0
+                not_modified = error = changed = False
+                try:
+                    with self.conn:
+                        http_headers = self.select_feed_http_headers(
+                            (schedule.feed_url,))
+                    feed_parser_dict = self.fetch_feed(schedule.feed_url,
+                                                       *(http_headers or ()))
+                    n_entries = self.write_feed(schedule.feed_url,
+                                                feed_parser_dict)
+                    not_modified = feed_parser_dict.get('status') == 304
+                    error = feed_parser_dict.get('status', 200) >= 400
+                    updated = None
+                    if not not_modified and not error:
+                        updated = feed_parser_dict.feed.get('updated')
+                except (FeedNotFoundError, sqlite3.Error) as e:
+                    self.logger.exception(e)
+                    error = True
+                    updated = None
+                now = time.monotonic()
+                changed = schedule.update(updated, now)
+                stats.record(schedule.feed_url, n_entries, now - start,
+                             not_modified=not_modified, error=error,
+                             changed=changed)
+                self.logger.info(
+                    "Polled '{}': {} new entries in {:.3f} s. Next poll in "
+                    "{:.0f} s".format(schedule.feed_url, n_entries, now - start,
+                                      schedule.interval))
+                heapq.heappush(queue, (schedule.next_poll, i))
+                if stats.total['polls'] % daemon_cfg['stats_every'] == 0:
+                    self.log_poll_stats(stats, daemon_cfg.get('stats_filepath'))
+        except KeyboardInterrupt:
+            # Ctrl-C: stop the daemon like SIGTERM, i.e. the final poll stats
+            # are still logged and saved
+            stop_event.set()
+        self.logger.info("The daemon is stopped")
+        self.log_poll_stats(stats, daemon_cfg.get('stats_filepath'))
+        return stats
+
+    def log_poll_stats(self, stats, stats_filepath=None):
+        self.logger.info("Poll stats: {}".format(stats.summary()))
+        if stats_filepath:
+            try:
+                stats.save(os.path.expanduser(stats_filepath))
+            except OSError as e:
+                self.logger.exception(e)
+                self.logger.warning("The poll stats couldn't be saved in "
+                                    "'{}'".format(stats_filepath))
+
+    # Download and parse a feed. If the `etag` and/or `modified` (Last-Modified)
+    # from the previous download are given, a conditional GET is sent, i.e. the
+    # server answers with 304 (and no content) if the feed didn't change.
+    # IMPORTANT: this method is called by the threads of `read_all()`. Thus, it
+    # must not access the database.
+    # Returns: feedparser.FeedParserDict
+    def fetch_feed(self, feed_url, etag=None, modified=None):
+        self.logger.info("Fetching the feed '{}'".format(feed_url))
+        return feedparser.parse(feed_url, etag=etag, modified=modified)
+
+    # Returns: number of entries inserted
+    def write_feed(self, feed_url, feed_parser_dict):
         self.feed_url = feed_url
+        # In batched mode, the feed, its entries and tags, and its HTTP headers
+        # are committed once (when exiting the connection's context manager),
+        # i.e. the `commit()` of each INSERT/UPDATE is skipped
+        autocommit = self.autocommit
+        self.autocommit = autocommit or self.batched
+        try:
+            return self._write_feed(feed_url, feed_parser_dict)
+        finally:
+            self.autocommit = autocommit
+
+    def _write_feed(self, feed_url, feed_parser_dict):
         with self.conn:
-            # ==============
-            # Parse RSS feed
-            # ==============
-            feed_parser_dict = feedparser.parse(feed_url)
+            if feed_parser_dict.get('status') == 304:
+                self.logger.info("The feed '{}' didn't change since it was last "
+                                 "read (HTTP 304)".format(feed_url))
+                return 0
+            elif feed_parser_dict.get('status', 200) >= 400:
+                self.logger.error("The feed '{}' couldn't be downloaded (HTTP "
+                                  "{})".format(feed_url,
+                                               feed_parser_dict.status))
+                return 0
             # =============
             # Process feed
             # =============
@@ -45,7 +210,16 @@ class RSSReader:
             # ===============
             # Process entries
             # ===============
-            self.process_entries(feed_parser_dict.entries)
+            if self.batched:
+                n_entries = self.process_entries_batched(
+                    feed_parser_dict.entries)['entries_inserted']
+            else:
+                n_entries = self.process_entries(feed_parser_dict.entries)
+            # Save the feed's HTTP headers for the next conditional GET
+            self.update_feed_http_headers((feed_parser_dict.get('etag'),
+                                           feed_parser_dict.get('modified'),
+                                           feed_url))
+        return n_entries
 
     def process_feed(self, feed_dict):
         # Parse the feed dict
@@ -57,8 +231,13 @@ class RSSReader:
         else:
             self.logger.info(
                 "The feed '{}' is already in the database.".format(feed.name))
+            if feed_dict.get('updated_parsed'):
+                # Keep track of the feed's last update, e.g. for the daemon
+                self.update_feed((feed.updated, feed.name))
 
+    # Returns: number of entries inserted
     def process_entries(self, entries_list):
+        n_inserted = 0
         # `entries_list` is a list of dict (of entries)
         for i, entry_dict in enumerate(entries_list, start=1):
             try:
@@ -74,6 +253,83 @@ class RSSReader:
                 raise FeedNotFoundError(e)
             else:
                 self.logger.debug("Entry #{} processed!".format(i))
+                n_inserted += 1
+        return n_inserted
+
+    # Batched version of `process_entries()`: the entries and their tags are
+    # inserted with `INSERT OR IGNORE` and `executemany`, and committed once
+    # along with the feed (when `write_feed()` exits the connection's context
+    # manager). The duplicates
+    # are reported like in `process_entries()`: an entry already in the database
+    # (or already found in the feed) is skipped along with its tags, and a tag
+    # already found for the same entry is skipped.
+    # Returns: dict with the numbers of inserted and duplicate entries and tags
+    def process_entries_batched(self, entries_list):
+        entries = []
+        for i, entry_dict in enumerate(entries_list, start=1):
+            try:
+                self.logger.info("Processing entry #{}".format(i))
+                entries.append((i, Entry(self.feed_url, entry_dict,
+                                         self.logging_cfg)))
+            except KeyError as e:
+                self.logger.exception(e)
+                self.logger.warning("The entry #{} will be skipped".format(i))
+        counts = {'entries_inserted': 0, 'entries_duplicates': 0,
+                  'tags_inserted': 0, 'tags_duplicates': 0}
+        if not entries:
+            return counts
+        # All the entries of a feed have the same `feed_name`, i.e. the feed's
+        # URL. Thus, the feed is checked only once.
+        # NOTE: the `feed_name` is a very important attribute for the entries
+        # table because it is a foreign key that links both the feeds and
+        # entries tables
+        if self.select_feed((self.feed_url,)) is None:
+            raise FeedNotFoundError("The feed '{}' is not found in the "
+                                    "database.".format(self.feed_url))
+        seen_ids = self.select_entry_ids([entry.id for _, entry in entries])
+        entry_rows = []
+        tag_rows = []
+        for i, entry in entries:
+            if str(entry.id) in seen_ids:
+                self.logger.warning(
+                    "The entry with id='{}' is already in the database. The "
+                    "entry #{} will be skipped".format(entry.id, i))
+                counts['entries_duplicates'] += 1
+                continue
+            seen_ids.add(str(entry.id))
+            self.logger.info("The entry '{}' will be inserted in the "
+                             "database.".format(entry.title))
+            entry_rows.append((entry.id,
+                               entry.feed_name,
+                               entry.title,
+                               entry.author,
+                               entry.url,
+                               entry.location,
+                               entry.summary,
+                               entry.published))
+            entry_tags = set()
+            for tag in entry.tags:
+                if tag in entry_tags:
+                    self.logger.warning(
+                        "The tag '{}' is already in the database. The tag will "
+                        "be skipped.".format(tag))
+                    counts['tags_duplicates'] += 1
+                    continue
+                entry_tags.add(tag)
+                tag_rows.append((entry.id, tag))
+        n_entries = self.insert_entries(entry_rows)
+        n_tags = self.insert_tags(tag_rows)
+        # NOTE: rows ignored by `INSERT OR IGNORE` were already in the database
+        # (e.g. inserted by another process since `select_entry_ids()`)
+        counts['entries_inserted'] = n_entries
+        counts['entries_duplicates'] += len(entry_rows) - n_entries
+        counts['tags_inserted'] = n_tags
+        counts['tags_duplicates'] += len(tag_rows) - n_tags
+        self.logger.info(
+            "Entries: {entries_inserted} inserted, {entries_duplicates} "
+            "duplicates | Tags: {tags_inserted} inserted, {tags_duplicates} "
+            "duplicates".format(**counts))
+        return counts
 
     def process_entry(self, entry_dict):
         # Parse the given entry
@@ -125,6 +381,15 @@ class RSSReader:
         self.commit()
         return cur.lastrowid
 
+    # Returns: number of entries inserted, i.e. without the ignored duplicates
+    def insert_entries(self, entries):
+        sql = '''INSERT OR IGNORE INTO entries VALUES (?,?,?,?,?,?,?,?)'''
+        for entry in entries:
+            self.sanity_check_sql(entry, sql)
+        cur = self.conn.cursor()
+        cur.executemany(sql, entries)
+        return cur.rowcount if entries else 0
+
     def insert_feed(self, feed):
         sql = '''INSERT INTO feeds (name, title, updated) VALUES (?,?,?)'''
         self.sanity_check_sql(feed, sql)
@@ -141,6 +406,15 @@ class RSSReader:
         self.commit()
         return cur.lastrowid
 
+    # Returns: number of tags inserted, i.e. without the ignored duplicates
+    def insert_tags(self, tags):
+        sql = '''INSERT OR IGNORE INTO tags VALUES (?,?)'''
+        for tag in tags:
+            self.sanity_check_sql(tag, sql)
+        cur = self.conn.cursor()
+        cur.executemany(sql, tags)
+        return cur.rowcount if tags else 0
+
     def select_entry(self, entry):
         sql = '''SELECT * FROM entries WHERE job_post_id=?'''
         self.sanity_check_sql(entry, sql)
@@ -148,6 +422,21 @@ class RSSReader:
         cur.execute(sql, entry)
         return cur.fetchone()
 
+    # Returns: set of the given entries' ids that are already in the database
+    #          as strings, like the entries' ids from the RSS feeds
+    def select_entry_ids(self, entry_ids, chunk_size=500):
+        found_ids = set()
+        cur = self.conn.cursor()
+        # NOTE: the ids are selected by chunks because of SQLite's limit on the
+        # number of variables in a SQL expression
+        for i in range(0, len(entry_ids), chunk_size):
+            chunk = tuple(entry_ids[i:i + chunk_size])
+            sql = '''SELECT job_post_id FROM entries
+                     WHERE job_post_id IN ({})'''.format(",".join("?" * len(chunk)))
+            cur.execute(sql, chunk)
+            found_ids.update(str(row[0]) for row in cur.fetchall())
+        return found_ids
+
     def select_feed(self, feed):
         sql = '''SELECT * FROM feeds WHERE name=?'''
         self.sanity_check_sql(feed, sql)
@@ -162,6 +451,40 @@ class RSSReader:
         cur.execute(sql, tag)
         return cur.fetchone()
 
+    # Returns: tuple (etag, modified) or None if the feed is not in the database
+    def select_feed_http_headers(self, feed):
+        sql = '''SELECT etag, modified FROM feeds WHERE name=?'''
+        self.sanity_check_sql(feed, sql)
+        cur = self.conn.cursor()
+        cur.execute(sql, feed)
+        return cur.fetchone()
+
+    def update_feed_http_headers(self, feed):
+        sql = '''UPDATE feeds SET etag=?, modified=? WHERE name=?'''
+        self.sanity_check_sql(feed, sql)
+        cur = self.conn.cursor()
+        cur.execute(sql, feed)
+        self.commit()
+
+    def create_feeds_http_columns(self):
+        """
+        Adds the columns `etag` and `modified` to the `feeds` table if they are
+        not already in the database (e.g. databases created before the columns
+        were added to the schema)
+
+        :return: None
+        """
+        cur = self.conn.cursor()
+        cur.execute('''PRAGMA table_info(feeds)''')
+        columns = [row[1] for row in cur.fetchall()]
+        for column in ['etag', 'modified']:
+            if column not in columns:
+                self.logger.info("Adding the column '{}' to the feeds "
+                                 "table".format(column))
+                cur.execute('''ALTER TABLE feeds ADD COLUMN {} text'''.format(
+                    column))
+        self.commit()
+
     def update_feed(self, feed):
         sql = '''UPDATE feeds SET updated=? WHERE name=?'''
         self.sanity_check_sql(feed, sql)
@@ -208,15 +531,25 @@ if __name__ == '__main__':
             main_cfg=main_cfg,
             logging_cfg=sb.logging_cfg_dict,
             logger=logger)
-        for feed_url in rss_feeds:
-            try:
-                logger.info("Reading the feed '{}'".format(feed_url))
-                rss_reader.read(feed_url)
-            except FeedNotFoundError as e:
-                logger.critical(e)
-                logger.warning("The feed '{}' will be skipped".format(feed_url))
-            else:
-                logger.info("End of processing feed '{}'".format(feed_url))
+        if main_cfg['daemon']['enabled']:
+            # Long-running mode: the daemon is stopped with Ctrl-C or SIGTERM
+            stop_event = threading.Event()
+            signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+            rss_reader.run_daemon(rss_feeds, main_cfg['daemon'], stop_event)
+        elif main_cfg.get('fetch_workers'):
+            # The feeds are downloaded in parallel
+            rss_reader.read_all(rss_feeds, main_cfg['fetch_workers'])
+        else:
+            for feed_url in rss_feeds:
+                try:
+                    logger.info("Reading the feed '{}'".format(feed_url))
+                    rss_reader.read(feed_url)
+                except FeedNotFoundError as e:
+                    logger.critical(e)
+                    logger.warning("The feed '{}' will be skipped".format(
+                        feed_url))
+                else:
+                    logger.info("End of processing feed '{}'".format(feed_url))
     except (AssertionError, KeyboardInterrupt, OSError, sqlite3.Error) as e:
         logger.exception(e)
         logger.info("Program will exit")
@@ -0,0 +1,123 @@
+"""
+Micro-benchmark of the currency code lookup done for each salary of the job
+posts: the linear search into the currencies data (as previously done by
+`JobsScraper.get_currency_code()`) vs the index built at startup by
+`build_currency_codes_index()`.
+
+The corpus is a text file with one salary per line as found in the job posts,
+e.g. '€42k - 75k'. If no corpus is given, a sample of salaries is used.
+
+Usage:
+    $ python benchmark_currency_codes.py ~/data/dev-jobs-insights/currencies.json -c salaries.txt -r 5
+"""
+import argparse
+import os
+import re
+import time
+# Third-party modules
+from forex_python.converter import get_currency_name
+# Own modules
+from currency_codes import build_currency_codes_index, \
+    COUNTRY_CURRENCY_CODES, DEFAULT_CURRENCY_CODES
+from utilities.genutils import load_json
+
+
+SAMPLE_SALARIES = [
+    '€42k - 75k', '$100k - 130k', '£50k - 70k', 'C$80k - 100k',
+    'A$90k - 120k', 'kr 500k - 650k', 'SGD 60k - 79k', '₹1000k - 1500k',
+    'zł 120k - 180k', 'CHF 100k - 130k', 'R 300k - 500k', '€55k - 65k',
+    '$120k - 160k', '£35k - 45k', 'NOK 600k - 750k', '¥6000k - 8000k',
+]
+
+
+# Same rules as `build_currency_codes_index()` but applied for each salary
+# Returns: currency code, or a dict keyed by country (e.g. for 'R'), or None
+def linear_currency_code(currency_symbol, currencies_data):
+    if get_currency_name(currency_symbol):
+        return currency_symbol
+    results = [item for item in currencies_data
+               if item["symbol"] == currency_symbol]
+    if currency_symbol != "C$" and len(results) == 1:
+        return results[0]["cc"]
+    elif currency_symbol in DEFAULT_CURRENCY_CODES:
+        return DEFAULT_CURRENCY_CODES[currency_symbol]
+    return COUNTRY_CURRENCY_CODES.get(currency_symbol)
+
+
+def indexed_currency_code(currency_symbol, currency_codes):
+    try:
+        return currency_codes[currency_symbol]
+    except KeyError:
+        currency_code = \
+            currency_symbol if get_currency_name(currency_symbol) else None
+        currency_codes[currency_symbol] = currency_code
+        return currency_code
+
+
+# Same extraction as `JobsScraper.get_currency_symbol()`
+def get_currency_symbols(salaries):
+    symbols = []
+    for salary in salaries:
+        match = re.search(r"^(\D+)", salary)
+        if match:
+            symbols.append(match.group().strip())
+    return symbols
+
+
+def time_it(fn, repeat):
+    # Best of `repeat` runs
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Compare the linear search of the currency codes with the "
+                    "precomputed index.")
+    parser.add_argument("currencies_filepath",
+                        help="JSON file of the currencies data (list of dicts "
+                             "with the keys ['cc', 'symbol', 'name'])")
+    parser.add_argument("-c", "--corpus", default=None,
+                        help="Text file with one salary per line")
+    parser.add_argument("-n", "--number", type=int, default=100000,
+                        help="Number of lookups per run (the corpus is "
+                             "repeated as needed)")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="Number of runs, the best one is reported")
+    args = parser.parse_args()
+    currencies_data = load_json(os.path.expanduser(args.currencies_filepath))
+    if args.corpus:
+        with open(os.path.expanduser(args.corpus), encoding='utf-8') as f:
+            salaries = [line.strip() for line in f if line.strip()]
+    else:
+        salaries = SAMPLE_SALARIES
+    symbols = get_currency_symbols(salaries)
+    if not symbols:
+        raise SystemExit("No currency symbol found in the corpus")
+    symbols = (symbols * (args.number // len(symbols) + 1))[:args.number]
+    start = time.perf_counter()
+    currency_codes = build_currency_codes_index(currencies_data)
+    build_duration = time.perf_counter() - start
+    # Both lookups must agree before being timed
+    for symbol in set(symbols):
+        assert linear_currency_code(symbol, currencies_data) \
+            == indexed_currency_code(symbol, currency_codes), symbol
+    linear_duration = time_it(
+        lambda: [linear_currency_code(s, currencies_data) for s in symbols],
+        args.repeat)
+    indexed_duration = time_it(
+        lambda: [indexed_currency_code(s, currency_codes) for s in symbols],
+        args.repeat)
+    print("{} salaries, {} distinct currency symbols, {} lookups per "
+          "run".format(len(salaries), len(set(symbols)), len(symbols)))
+    print("index built in {:.2f} ms ({} entries)".format(
+        build_duration * 1000, len(currency_codes)))
+    for name, duration in [('linear', linear_duration),
+                           ('indexed', indexed_duration)]:
+        print("{:<8} {:12.0f} lookups/s  ({:.3f} s)".format(
+            name, len(symbols) / duration, duration))
+    print("speedup: {:.1f}x".format(linear_duration / indexed_duration))
@@ -0,0 +1,70 @@
+"""
+Offline benchmark of the scraper's fetch stage. The cached webpages are served
+by the local HTTP stand-in (see `local_http_server.py`) and fetched with
+`PageFetcher` for different numbers of threads.
+
+Usage:
+    $ python benchmark_fetching.py ~/data/dev-jobs-insights/cache/webpages/stackoverflow_job_posts/ -w 1 4 8 16 -d 0.01
+"""
+import argparse
+import glob
+import os
+import time
+# Third-party modules
+import requests
+# Own modules
+from local_http_server import start_server
+from page_fetcher import HostRateLimiter, PageFetcher
+
+
+def run_benchmark(job_post_ids, mirror_url, max_workers, delay):
+    req_session = requests.Session()
+    rate_limiter = HostRateLimiter(delay_between_requests=delay)
+
+    def load_page(job_post_id):
+        url = "{}/jobs/{}".format(mirror_url, job_post_id)
+        rate_limiter.wait(url)
+        req = req_session.get(url, timeout=5)
+        req.raise_for_status()
+        return req.text
+
+    fetcher = PageFetcher(load_page=load_page, max_workers=max_workers)
+    n_bytes = 0
+    start = time.perf_counter()
+    for _, future in fetcher.fetch(job_post_ids):
+        n_bytes += len(future.result())
+    return time.perf_counter() - start, n_bytes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Benchmark the fetch stage against a local HTTP server "
+                    "serving the cached webpages.")
+    parser.add_argument("dirpath", help="Directory of the cached webpages")
+    parser.add_argument("-w", "--workers", type=int, nargs='+',
+                        default=[1, 4, 8, 16],
+                        help="Numbers of threads to benchmark")
+    parser.add_argument("-d", "--delay", type=float, default=0,
+                        help="Delay between requests sent to the same host")
+    parser.add_argument("-n", "--number", type=int, default=None,
+                        help="Maximum number of webpages to fetch")
+    parser.add_argument("-p", "--port", type=int, default=8000)
+    args = parser.parse_args()
+    dirpath = os.path.expanduser(args.dirpath)
+    job_post_ids = sorted(
+        os.path.splitext(os.path.basename(f))[0]
+        for f in glob.glob(os.path.join(dirpath, "*.html")))[:args.number]
+    server = start_server(dirpath, port=args.port)
+    mirror_url = "http://localhost:{}".format(args.port)
+    print("{} webpages served from '{}'".format(len(job_post_ids), dirpath))
+    try:
+        for max_workers in args.workers:
+            duration, n_bytes = run_benchmark(
+                job_post_ids, mirror_url, max_workers, args.delay)
+            print("workers={:<3} {:8.2f} pages/s  {:8.2f} MB/s  "
+                  "({:.2f} s)".format(max_workers,
+                                      len(job_post_ids) / duration,
+                                      n_bytes / duration / 1e6,
+                                      duration))
+    finally:
+        server.shutdown()
@@ -0,0 +1,265 @@
+"""
+Offline replay benchmark of the scraper: a fixed corpus of cached webpages is
+replayed through the whole `JobsScraper` pipeline (`start_scraping()`) with
+networking disabled, and the throughput (job posts/s), the peak RSS and the
+time spent in each stage (see `StageTimer`) are reported and compared with a
+saved baseline.
+
+The fixture is a directory with:
+- 'entries.sqlite': the `entries` table restricted to the job posts of the
+  corpus
+- 'exchange_rates.sqlite': the exchange rates, used in offline mode
+- 'webpages/': the cached webpages ('<job_post_id>.html') of the corpus
+
+It is created once from the databases and the cached webpages of a main config
+with `--make_fixture`. Each run works on a copy of the fixture's databases and
+saves the sessions in a temporary directory.
+
+Usage:
+    $ python benchmark_scraping.py ~/data/dev-jobs-insights/benchmark_fixture --make_fixture -m main_cfg.yaml -n 2000
+    $ python benchmark_scraping.py ~/data/dev-jobs-insights/benchmark_fixture -m main_cfg.yaml --save_baseline
+    $ python benchmark_scraping.py ~/data/dev-jobs-insights/benchmark_fixture -m main_cfg.yaml
+"""
+import argparse
+import copy
+import json
+import logging
+import os
+import resource
+import shutil
+import sqlite3
+import tempfile
+import time
+# Own modules
+from jobs_scraper import JobsScraper
+from utilities.genutils import read_yaml_config
+
+
+ENTRIES_FILENAME = 'entries.sqlite'
+RATES_FILENAME = 'exchange_rates.sqlite'
+WEBPAGES_DIRNAME = 'webpages'
+BASELINE_FILENAME = 'baseline.json'
+# Port 1 (tcpmux) is closed on any usual host
+NO_NETWORK_URL = 'http://127.0.0.1:1'
+
+
+# Copy the entries whose webpages are cached, the exchange rates and the
+# cached webpages into the fixture directory
+# Returns: int, the number of job posts of the fixture
+def make_fixture(fixture_dirpath, main_cfg, number=None):
+    db_filepath = os.path.expanduser(main_cfg['db_filepath'])
+    rates_filepath = os.path.expanduser(
+        main_cfg['exchange_rates']['db_filepath'])
+    webpages_dirpath = os.path.expanduser(
+        main_cfg['data_paths']['cached_webpages'])
+    fixture_webpages_dirpath = os.path.join(fixture_dirpath, WEBPAGES_DIRNAME)
+    os.makedirs(fixture_webpages_dirpath, exist_ok=True)
+    src_conn = sqlite3.connect(db_filepath)
+    with src_conn:
+        job_post_ids = [
+            job_post_id for job_post_id, in src_conn.execute(
+                "SELECT job_post_id FROM entries ORDER BY job_post_id")
+            if os.path.isfile(os.path.join(webpages_dirpath,
+                                           "{}.html".format(job_post_id)))]
+        job_post_ids = job_post_ids[:number]
+        schema, = src_conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND "
+            "name = 'entries'").fetchone()
+        rows = src_conn.execute(
+            "SELECT * FROM entries WHERE job_post_id IN ({})".format(
+                ", ".join("?" * len(job_post_ids))), job_post_ids).fetchall()
+    src_conn.close()
+    entries_filepath = os.path.join(fixture_dirpath, ENTRIES_FILENAME)
+    if os.path.exists(entries_filepath):
+        os.remove(entries_filepath)
+    conn = sqlite3.connect(entries_filepath)
+    with conn:
+        conn.execute(schema)
+        if rows:
+            conn.executemany("INSERT INTO entries VALUES ({})".format(
+                ", ".join("?" * len(rows[0]))), rows)
+    conn.close()
+    if os.path.isfile(rates_filepath):
+        shutil.copyfile(rates_filepath,
+                        os.path.join(fixture_dirpath, RATES_FILENAME))
+    for job_post_id in job_post_ids:
+        filename = "{}.html".format(job_post_id)
+        shutil.copy2(os.path.join(webpages_dirpath, filename),
+                     os.path.join(fixture_webpages_dirpath, filename))
+    return len(job_post_ids)
+
+
+# Returns: dict, the main config `main_cfg` updated to replay the fixture from
+#          the working directory `work_dirpath`
+def get_replay_cfg(main_cfg, fixture_dirpath, work_dirpath, parse_workers):
+    cfg = copy.deepcopy(main_cfg)
+    cfg['db_filepath'] = os.path.join(work_dirpath, ENTRIES_FILENAME)
+    cfg['data_paths']['cached_webpages'] = os.path.join(fixture_dirpath,
+                                                        WEBPAGES_DIRNAME)
+    cfg['webpages_cache'] = {'backend': 'files'}
+    cfg['exchange_rates'].update(
+        db_filepath=os.path.join(work_dirpath, RATES_FILENAME),
+        offline=True)
+    cfg['saving_cfg']['scraped_job_data_dirpath'] = os.path.join(
+        work_dirpath, 'scraped_job_data')
+    cfg['incremental'] = False
+    cfg['checkpoint'] = {'interval': 0, 'resume': False}
+    cfg['profiling'] = {'enabled': True}
+    # Networking is disabled: the GET requests of the webpages not found in
+    # the corpus are sent to a closed local port and fail right away
+    cfg['mirror_url'] = NO_NETWORK_URL
+    cfg['http_transport'] = {'max_retries': 0, 'retry_queue': False}
+    cfg['delay_between_requests'] = 0
+    if parse_workers is not None:
+        cfg['parse_workers'] = parse_workers
+    return cfg
+
+
+# Returns: dict with the number of job posts, the duration of the run, the
+#          number of GET requests attempted and the summary of the stages
+def replay(main_cfg, logging_cfg, fixture_dirpath, parse_workers=None):
+    with tempfile.TemporaryDirectory() as work_dirpath:
+        for filename in [ENTRIES_FILENAME, RATES_FILENAME]:
+            filepath = os.path.join(fixture_dirpath, filename)
+            if os.path.isfile(filepath):
+                shutil.copyfile(filepath,
+                                os.path.join(work_dirpath, filename))
+        cfg = get_replay_cfg(main_cfg, fixture_dirpath, work_dirpath,
+                             parse_workers)
+        logger = logging.getLogger(__name__)
+        # The scraper logs every missing tag
+        logger.setLevel(logging.CRITICAL)
+        scraper = JobsScraper(main_cfg=cfg, logging_cfg=logging_cfg,
+                              logger=logger)
+        start = time.perf_counter()
+        scraper.start_scraping()
+        duration = time.perf_counter() - start
+        with sqlite3.connect(cfg['db_filepath']) as conn:
+            n_posts, = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        return {'n_posts': n_posts,
+                'duration': duration,
+                'n_requests': scraper.transport.stats.summary()['requests'],
+                'stages': scraper.timer.summary()}
+
+
+# Returns: float, the peak RSS (in MB) of this process and its children (e.g.
+#          the processes of `parse_workers`)
+def get_peak_rss():
+    # NOTE: `ru_maxrss` is in kilobytes on Linux
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+
+
+# Returns: list of str, the regressions of `results` compared with `baseline`
+def compare_with_baseline(results, baseline, tolerance):
+    regressions = []
+    print("\n{:<32} {:>12} {:>12} {:>8}".format('metric', 'baseline',
+                                                  'current', 'ratio'))
+    # NOTE: the stages are compared on their medians which, unlike their
+    # means, are not skewed by a few outliers (e.g. garbage collections)
+    metrics = [('posts_per_s', True), ('peak_rss_mb', False)]
+    metrics += [('stages.{}.p50'.format(name), False)
+                for name in results['stages']]
+    for metric, higher_is_better in metrics:
+        current = get_metric(results, metric)
+        base = get_metric(baseline, metric)
+        if current is None or base is None or not base:
+            continue
+        ratio = current / base
+        regressed = ratio < 1 - tolerance if higher_is_better \
+            else ratio > 1 + tolerance
+        print("{:<32} {:>12.4g} {:>12.4g} {:>7.2f}x{}".format(
+            metric.replace('stages.', '').replace('.p50', ' (p50)'), base,
+            current, ratio, "  REGRESSION" if regressed else ""))
+        if regressed:
+            regressions.append(metric)
+    return regressions
+
+
+def get_metric(results, metric):
+    value = results
+    for key in metric.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Replay a fixed corpus of cached webpages through the "
+                    "scraper offline and compare the throughput with a "
+                    "baseline.")
+    parser.add_argument("fixture_dirpath",
+                        help="Fixture directory (entries database, exchange "
+                             "rates and cached webpages)")
+    parser.add_argument("-m", "--main_cfg", default="main_cfg.yaml",
+                        help="Main config file of the scraper")
+    parser.add_argument("-l", "--logging_cfg", default="logging_cfg.yaml",
+                        help="Logging config file of the scraper")
+    parser.add_argument("--make_fixture", action="store_true",
+                        help="Create the fixture from the databases and the "
+                             "cached webpages of the main config")
+    parser.add_argument("-n", "--number", type=int, default=None,
+                        help="Maximum number of job posts in the fixture")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="Number of replays, the best one is reported")
+    parser.add_argument("-w", "--parse_workers", type=int, default=None,
+                        help="Number of parsing processes (default: as in the "
+                             "main config)")
+    parser.add_argument("-b", "--baseline", default=None,
+                        help="Baseline file (default: baseline.json in the "
+                             "fixture directory)")
+    parser.add_argument("--save_baseline", action="store_true",
+                        help="Save the results as the new baseline")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.1,
+                        help="Relative slowdown tolerated before reporting a "
+                             "regression")
+    args = parser.parse_args()
+    fixture_dirpath = os.path.expanduser(args.fixture_dirpath)
+    main_cfg = read_yaml_config(args.main_cfg)
+    if args.make_fixture:
+        n_posts = make_fixture(fixture_dirpath, main_cfg, args.number)
+        print("Fixture of {} job posts saved in '{}'".format(n_posts,
+                                                           fixture_dirpath))
+        raise SystemExit(0)
+    logging_cfg = read_yaml_config(args.logging_cfg)
+    runs = [replay(main_cfg, logging_cfg, fixture_dirpath, args.parse_workers)
+            for _ in range(args.repeat)]
+    best = min(runs, key=lambda run: run['duration'])
+    results = {'n_posts': best['n_posts'],
+               'posts_per_s': best['n_posts'] / best['duration'],
+               'peak_rss_mb': get_peak_rss(),
+               'stages': best['stages']}
+    print("{} job posts replayed: {:.1f} job posts/s (best of {}), peak RSS "
+          "{:.1f} MB".format(results['n_posts'], results['posts_per_s'],
+                             args.repeat, results['peak_rss_mb']))
+    if best['n_requests']:
+        print("WARNING: {} webpages were not found in the corpus (GET requests "
+              "attempted)".format(best['n_requests']))
+    print("{:<24} {:>8} {:>10} {:>9} {:>9} {:>9}".format(
+        'stage', 'count', 'total (s)', 'p50 (ms)', 'p95 (ms)', 'p99 (ms)'))
+    for name, stats in results['stages'].items():
+        print("{:<24} {:>8} {:>10.3f} {:>9.3f} {:>9.3f} {:>9.3f}".format(
+            name, stats['count'], stats['total'], stats['p50'] * 1000,
+            stats['p95'] * 1000, stats['p99'] * 1000))
+    baseline_filepath = os.path.expanduser(
+        args.baseline or os.path.join(fixture_dirpath, BASELINE_FILENAME))
+    if args.save_baseline:
+        with open(baseline_filepath, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print("Baseline saved in '{}'".format(baseline_filepath))
+    elif os.path.isfile(baseline_filepath):
+        with open(baseline_filepath, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('n_posts') != results['n_posts']:
+            print("WARNING: the baseline was saved with {} job "
+                  "posts".format(baseline.get('n_posts')))
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\n{} regressions (tolerance {:.0%})".format(
+                len(regressions), args.tolerance))
+            raise SystemExit(1)
+        print("\nNo regression (tolerance {:.0%})".format(args.tolerance))
+    else:
+        print("No baseline found in '{}'".format(baseline_filepath))
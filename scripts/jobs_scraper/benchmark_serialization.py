@@ -0,0 +1,91 @@
+"""
+Benchmark of the two file formats of the scraped job data (see
+`session_writer.py`): pickled scraping sessions vs JSON Lines records. The job
+data is loaded from existing chunk files (of any format) and then saved and
+loaded back in both formats.
+
+Usage:
+    $ python benchmark_serialization.py ~/data/dev-jobs-insights/scraped_job_data/20181002-035011-scraped_job_data/ -r 3
+"""
+import argparse
+import glob
+import logging
+import os
+import tempfile
+import time
+# Own modules
+from scraping_session import ScrapingSession
+from session_writer import FILE_EXTENSIONS, load_job_data, load_records, \
+    load_sessions, SessionWriter
+
+
+def time_it(fn, repeat):
+    # Best of `repeat` runs
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def run_benchmark(sessions, file_format, repeat):
+    logger = logging.getLogger(__name__)
+    with tempfile.TemporaryDirectory() as dirpath:
+        def write():
+            writer = SessionWriter(dirpath, split_size=len(sessions),
+                                   logger=logger, file_format=file_format)
+            for session in sessions:
+                writer.write(session.job_post_id, session)
+            writer.close()
+
+        write_duration = time_it(write, repeat)
+        filepath = glob.glob(os.path.join(
+            dirpath, "*.{}".format(FILE_EXTENSIONS[file_format])))[0]
+        results = [('write', write_duration)]
+        if file_format == 'jsonl':
+            results.append(('read records', time_it(
+                lambda: sum(1 for _ in load_records(filepath)), repeat)))
+            results.append(('read JobData', time_it(
+                lambda: sum(1 for _ in load_job_data(filepath)), repeat)))
+        else:
+            results.append(('read sessions', time_it(
+                lambda: sum(1 for _ in load_sessions(filepath)), repeat)))
+        return results, os.path.getsize(filepath)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Compare the pickle and JSON Lines formats of the scraped "
+                    "job data.")
+    parser.add_argument("dirpath",
+                        help="Directory of the scraped job data (*.pkl or "
+                             "*.jsonl chunk files)")
+    parser.add_argument("-n", "--number", type=int, default=None,
+                        help="Maximum number of job posts to use")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="Number of runs, the best one is reported")
+    args = parser.parse_args()
+    dirpath = os.path.expanduser(args.dirpath)
+    filepaths = sorted(glob.glob(os.path.join(dirpath, "*.jsonl"))
+                       + glob.glob(os.path.join(dirpath, "*.pkl")))
+    sessions = []
+    for filepath in filepaths:
+        for job_post_id, job_data in load_job_data(filepath):
+            sessions.append(ScrapingSession(job_post_id,
+                                            job_data.job_post.url,
+                                            job_data))
+            if len(sessions) == args.number:
+                break
+        if len(sessions) == args.number:
+            break
+    print("{} job posts loaded from '{}'".format(len(sessions), dirpath))
+    if not sessions:
+        raise SystemExit("No job data to benchmark")
+    for file_format in ['pickle', 'jsonl']:
+        results, size = run_benchmark(sessions, file_format, args.repeat)
+        for name, duration in results:
+            print("{:<7} {:<14} {:10.0f} job posts/s  ({:.3f} s)".format(
+                file_format, name, len(sessions) / duration, duration))
+        print("{:<7} {:<14} {:10.2f} MB".format(file_format, 'file size',
+                                                size / 1e6))
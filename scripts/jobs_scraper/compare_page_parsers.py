@@ -0,0 +1,164 @@
+"""
+Golden-file comparison of the page parsers (see `page_parser.py`) over the
+cached webpages: the job data extracted with the 'regions' parser, and with
+the linked data fast path (see `linked_data_fast_path` in the main config),
+must be equal to the job data extracted with the 'full' parser.
+
+The job data extracted with the 'full' parser is saved as JSON Lines records
+(see `JobData.to_records()`) in the golden file, if it doesn't exist yet (or
+with `--update`). Then, the job data extracted with the 'regions' parser and
+with the fast path are compared with the golden file, and the parsing
+durations of both parsers are reported.
+
+Only the entries of the RSS feeds database whose webpages are cached are
+used. No webpage is retrieved online.
+
+Usage:
+    $ python compare_page_parsers.py -m main_cfg.yaml -l logging_cfg.yaml -g ~/data/dev-jobs-insights/golden_job_data.jsonl -n 1000
+"""
+import argparse
+import json
+import logging
+import os
+import time
+# Own modules
+from jobs_scraper import JobsScraper
+from page_fetcher import completed_future
+from page_parser import parse_webpage
+from session_writer import dump_records, load_records
+from utilities.genutils import connect_db, read_yaml_config
+
+
+# Returns: list of the records of the job post as loaded back from JSON Lines,
+#          e.g. the dates are strings
+def normalize_records(records):
+    return [json.loads(line)
+            for line in dump_records(records).splitlines()]
+
+
+# Returns: tuple (job_data, duration) where `job_data` is a dict with the
+#          job_post_ids as keys and the normalized records as values, and
+#          `duration` is the total scraping time (in seconds)
+def scrape_entries(scraper, entries, page_parser, fast_path=False):
+    scraper.page_parser = page_parser
+    scraper.linked_data_fast_path = fast_path
+    job_data = {}
+    duration = 0
+    for entry in entries:
+        job_post_id, _, _, url, _, _ = entry
+        webpage = completed_future(scraper.load_cached_webpage, job_post_id,
+                                   url)
+        start = time.perf_counter()
+        scraper.scrape_job_post(entry, load_webpage=webpage.result)
+        duration += time.perf_counter() - start
+        job_data[job_post_id] = normalize_records(
+            scraper.session.data.to_records())
+        scraper.session = None
+    return job_data, duration
+
+
+# Returns: number of job posts whose job data is different from the golden
+#          job data (the differences are printed)
+def compare_with_golden(job_data, golden):
+    n_diffs = 0
+    for job_post_id, records in job_data.items():
+        if job_post_id not in golden:
+            print("job_post_id={}: not in the golden file".format(job_post_id))
+            n_diffs += 1
+        elif records != golden[job_post_id]:
+            n_diffs += 1
+            print("job_post_id={}: different job data".format(job_post_id))
+            for record in records:
+                if record not in golden[job_post_id]:
+                    print("    + {}".format(record))
+            for record in golden[job_post_id]:
+                if record not in records:
+                    print("    - {}".format(record))
+    return n_diffs
+
+
+# Returns: the best duration (in seconds) of `repeat` runs of parsing all the
+#          webpages
+def time_parsing(htmls, page_parser, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in htmls:
+            parse_webpage(html, page_parser)
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Compare the job data extracted with the 'regions' page "
+                    "parser with the golden job data extracted with the "
+                    "'full' page parser.")
+    parser.add_argument("-m", "--main_cfg", default="main_cfg.yaml",
+                        help="Main config file of the scraper")
+    parser.add_argument("-l", "--logging_cfg", default="logging_cfg.yaml",
+                        help="Logging config file of the scraper")
+    parser.add_argument("-g", "--golden", default="golden_job_data.jsonl",
+                        help="Golden file of the job data (JSON Lines)")
+    parser.add_argument("-u", "--update", action="store_true",
+                        help="Save the golden file again")
+    parser.add_argument("-n", "--number", type=int, default=None,
+                        help="Maximum number of cached webpages to use")
+    parser.add_argument("-r", "--repeat", type=int, default=3,
+                        help="Number of parsing runs, the best one is "
+                             "reported")
+    args = parser.parse_args()
+    logger = logging.getLogger(__name__)
+    # The scraper logs every missing tag
+    logger.setLevel(logging.CRITICAL)
+    scraper = JobsScraper(main_cfg=read_yaml_config(args.main_cfg),
+                          logging_cfg=read_yaml_config(args.logging_cfg),
+                          logger=logger)
+    scraper.conn = connect_db(scraper.db_filepath)
+    if scraper.webpage_cache is None:
+        raise SystemExit("The webpages cache is disabled")
+    entries = [entry for entry in scraper.select_entries()
+               if scraper.webpage_cache.contains(entry[0])]
+    entries = entries[:args.number]
+    if not entries:
+        raise SystemExit("No cached webpage found in '{}'".format(
+            scraper.webpage_cache.get_location('*')))
+    print("{} cached webpages".format(len(entries)))
+    golden_filepath = os.path.expanduser(args.golden)
+    if args.update or not os.path.isfile(golden_filepath):
+        golden, _ = scrape_entries(scraper, entries, 'full')
+        with open(golden_filepath, 'w', encoding='utf-8') as f:
+            for records in golden.values():
+                f.write(dump_records(records))
+        print("Golden file saved: {}".format(golden_filepath))
+    golden = dict(load_records(golden_filepath))
+    _, full_duration = scrape_entries(scraper, entries, 'full')
+    regions_job_data, regions_duration = scrape_entries(scraper, entries,
+                                                        'regions')
+    fast_path_job_data, fast_path_duration = scrape_entries(
+        scraper, entries, 'full', fast_path=True)
+    # Comparison with the golden file
+    n_diffs = 0
+    for name, job_data in [('regions parser', regions_job_data),
+                           ('linked data fast path', fast_path_job_data)]:
+        n = compare_with_golden(job_data, golden)
+        print("{}: {}/{} job posts with job data different from the golden "
+              "file".format(name, n, len(job_data)))
+        n_diffs += n
+    # Durations
+    htmls = [scraper.webpage_cache.load(entry[0])[0] for entry in entries]
+    parse_durations = {page_parser: time_parsing(htmls, page_parser,
+                                                 args.repeat)
+                       for page_parser in ['full', 'regions']}
+    for page_parser, scrape_duration in [('full', full_duration),
+                                         ('regions', regions_duration)]:
+        print("{:<8} parsing: {:8.1f} webpages/s | scraping: {:8.1f} job "
+              "posts/s".format(page_parser,
+                               len(htmls) / parse_durations[page_parser],
+                               len(entries) / scrape_duration))
+    print("fast path scraping: {:8.1f} job posts/s".format(
+        len(entries) / fast_path_duration))
+    print("parsing speedup: {:.1f}x".format(
+        parse_durations['full'] / parse_durations['regions']))
+    if n_diffs:
+        raise SystemExit(1)
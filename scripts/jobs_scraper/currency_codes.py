@@ -0,0 +1,76 @@
+import itertools
+# Third-party modules
+from forex_python.converter import get_currency_name
+
+
+# Currency symbols that are associated with many currency codes (or that are not
+# recognized by `forex_python`) and the currency code assumed for each of them
+# NOTE: C$ is used as a currency symbol for Canadian Dollar instead of $
+# However, C$ is already the official currency symbol for Nicaragua Cordoba
+# (NIO). Thus we will assume that C$ is related to the Canadian Dollar.
+# NOTE: in stackoverflow job posts, '$' alone refers to US$ but '$' can refer to
+# multiple currency codes such as ARS (Argentine peso), AUD, CAD. Thus, we will
+# make an assumption that '$' alone will refer to US$ since if it is in AUD or
+# CAD, the currency symbols 'A$' and 'C$' are usually used in job posts,
+# respectively.
+# NOTE: we assume £ is always associated with the British pound. However, it
+# could have been EGP, FKP, GIP, ...
+# NOTE: technically, 'kr' is a valid currency symbol for the Danish krone but
+# 'kr' is not recognized because `forex_python` uses 'Kr' as the currency symbol
+# for the Danish krone.
+DEFAULT_CURRENCY_CODES = {
+    '$': 'USD',  # United States dollar
+    'A$': 'AUD',  # Australian dollar
+    'C$': 'CAD',  # Canadian dollar
+    '£': 'GBP',  # British pound
+    'kr': 'DKK',  # Danish krone
+}
+# There are two possibilities of currency codes with the currency symbol 'R':
+# Russian Ruble (RUB) or South African rand (ZAR). The currency code is chosen
+# based on the job post's country.
+COUNTRY_CURRENCY_CODES = {
+    'R': {'ZA': 'ZAR', 'RU': 'RUB'},
+}
+
+
+def build_currency_codes_index(currencies_data):
+    """
+    Builds the index mapping each currency symbol found in `currencies_data`
+    (and each currency code, since some salaries are given with a currency code
+    instead of a symbol, e.g. 'SGD 60k - 79k') to its currency code, with the
+    disambiguation rules applied in advance:
+
+    - a currency code maps to itself
+    - a currency symbol associated with only one currency code maps to it
+    - any other currency symbol in `DEFAULT_CURRENCY_CODES` maps to the assumed
+      currency code
+    - any other currency symbol in `COUNTRY_CURRENCY_CODES` maps to the dict
+      of its currency codes keyed by country,
+      e.g. 'R' --> {'ZA': 'ZAR', 'RU': 'RUB'}
+    - any other currency symbol (i.e. associated with many currency codes)
+      maps to None
+
+    :param currencies_data: list of dicts with the keys ['cc', 'symbol',
+                            'name'] where 'cc' is short for currency code
+    :return: dict
+    """
+    # NOTE: there is no 1-to-1 mapping when going from currency symbol to
+    # currency code, e.g. the currency symbol £ is used for the currency codes
+    # EGP, FKP, GDP, GIP, LBP, and SHP
+    symbols = {}
+    for item in currencies_data:
+        symbols.setdefault(item['symbol'], []).append(item['cc'])
+    index = {}
+    for symbol, codes in symbols.items():
+        index[symbol] = codes[0] if len(codes) == 1 else None
+    # A currency symbol associated with only one currency code keeps it, except
+    # C$ (see `DEFAULT_CURRENCY_CODES`)
+    for symbol, code in itertools.chain(DEFAULT_CURRENCY_CODES.items(),
+                                        COUNTRY_CURRENCY_CODES.items()):
+        if index.get(symbol) is None or symbol == 'C$':
+            index[symbol] = code
+    # The currency codes take precedence over the currency symbols
+    for item in currencies_data:
+        if get_currency_name(item['cc']):
+            index[item['cc']] = item['cc']
+    return index
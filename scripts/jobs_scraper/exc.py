@@ -12,6 +12,11 @@ class EmptyTextError(Exception):
     """Raised when an HTML tag doesn't contain any text"""
 
 
+class HTTPRetryableStatusError(Exception):
+    """Raised when the server still returns a status code that is retried
+    (e.g. 429 or 503) once the retries of the request are exhausted."""
+
+
 class HTTP404Error(Exception):
     """Raised when the server returns a 404 status code because the page is
     not found."""
@@ -78,6 +83,12 @@ class WebPageNotFoundError(Exception):
     e.g. 404 error, or OSError."""
 
 
+class WebPageUnavailableError(WebPageNotFoundError):
+    """Raised when the webpage HTML could not be retrieved because of a
+    transient error, e.g. connection error or 429/5xx status code even after
+    the retries. The webpage can be retrieved again later."""
+
+
 class WebPageSavingError(Exception):
     """Raised when the webpage HTML couldn't be saved locally, e.g. the caching
     option is disabled."""
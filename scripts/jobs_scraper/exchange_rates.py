@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+import os
+import sqlite3
+# Third-party modules
+from forex_python.converter import CurrencyRates, get_rate, \
+    RatesNotAvailableError
+# Own modules
+from utilities.genutils import get_local_datetime
+
+
+class ExchangeRates:
+    def __init__(self, db_filepath, ttl, offline, logger):
+        """
+        Persistent store of the exchange rates used for converting the salaries.
+        The rates are saved in a SQLite table keyed by (base, dest, date) where
+        `date` is the day the rate applies to, along with the time the rate was
+        retrieved. Thus, the rates retrieved by a previous scraping run are used
+        as long as they are not older than `ttl`.
+
+        All the known rates are loaded in memory by `load()` and `prefetch()`
+        retrieves all the rates to a destination currency with a single request
+        so that no network call is done while the job posts are processed.
+
+        :param db_filepath: file path of the SQLite database of the rates
+        :param ttl: time to live (in seconds) of a rate. An older rate is
+                    retrieved again (unless `offline` is True).
+        :param offline: if True, no rate is retrieved online and the last known
+                        rate of a currency pair is used whatever its age
+        :param logger: logger
+        """
+        self.db_filepath = os.path.expanduser(db_filepath)
+        self.ttl = timedelta(seconds=ttl)
+        self.offline = offline
+        self.logger = logger
+        # `rates` has for keys the tuples (base, dest) and the values are the
+        # last known rates as tuples (rate, retrieved) where `retrieved` is the
+        # datetime the rate was retrieved
+        self.rates = {}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_filepath)
+        with conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS exchange_rates (
+                                base        text not null,
+                                dest        text not null,
+                                date        date not null,
+                                rate        real not null,
+                                retrieved   datetime not null,
+                                primary key(base, dest, date))''')
+        return conn
+
+    def load(self):
+        """
+        Loads the last known rate of each currency pair from the database
+
+        :return: None
+        """
+        conn = self._connect()
+        try:
+            # NOTE: the rows are ordered by date so that the last known rate of
+            # a currency pair overrides the older ones
+            cur = conn.execute('''SELECT base, dest, rate, retrieved
+                                  FROM exchange_rates
+                                  ORDER BY date, retrieved''')
+            for base, dest, rate, retrieved in cur:
+                self.rates[(base, dest)] = (
+                    rate, datetime.fromisoformat(retrieved))
+        finally:
+            conn.close()
+        self.logger.debug("{} exchange rates loaded from '{}'".format(
+            len(self.rates), self.db_filepath))
+
+    # Raises:
+    #   - RatesNotAvailableError by CurrencyRates.get_rates()
+    #   - requests.exceptions.ConnectionError by CurrencyRates.get_rates()
+    def prefetch(self, base_currencies, dest_currency):
+        """
+        Retrieves in one batch the rates from the given base currencies to the
+        destination currency that are missing or expired
+
+        :param base_currencies: list of currency codes, e.g. ['EUR', 'GBP']
+        :param dest_currency: currency code, e.g. 'USD'
+        :return: int, number of rates retrieved
+        """
+        missing = [base for base in set(base_currencies)
+                   if base != dest_currency
+                   and not self.is_fresh(base, dest_currency)]
+        if not missing or self.offline:
+            self.logger.info("{} exchange rates to {} are missing or expired. "
+                             "None will be retrieved{}".format(
+                              len(missing), dest_currency,
+                              " (offline mode)" if self.offline else ""))
+            return 0
+        # One request for all the rates: the returned rates are for converting
+        # 1 `dest_currency` into the other currencies, thus they are inverted
+        self.logger.info("Retrieving the exchange rates to {}".format(
+            dest_currency))
+        all_rates = CurrencyRates().get_rates(dest_currency)
+        retrieved = get_local_datetime()
+        rows = []
+        for base in missing:
+            if all_rates.get(base):
+                rows.append((base, dest_currency, 1 / all_rates[base],
+                             retrieved))
+            else:
+                self.logger.debug("No rate available for {}-->{}".format(
+                    base, dest_currency))
+        self.save(rows)
+        self.logger.info("{} exchange rates to {} retrieved".format(
+            len(rows), dest_currency))
+        return len(rows)
+
+    # Returns: bool, True if the rate is known and not older than `ttl`
+    def is_fresh(self, base, dest):
+        if (base, dest) not in self.rates:
+            return False
+        _, retrieved = self.rates[(base, dest)]
+        # NOTE: `retrieved` is compared with a datetime with the same timezone
+        # info (aware or naive)
+        now = get_local_datetime() if retrieved.tzinfo else datetime.now()
+        return now - retrieved <= self.ttl
+
+    # Returns: tuple (rate, retrieved) where `retrieved` is the datetime the
+    #          rate was retrieved
+    # Raises:
+    #   - RatesNotAvailableError by get_rate() or by itself in offline mode
+    #   - requests.exceptions.ConnectionError by get_rate()
+    def get_rate(self, base, dest):
+        if self.is_fresh(base, dest) \
+                or (self.offline and (base, dest) in self.rates):
+            return self.rates[(base, dest)]
+        elif self.offline:
+            raise RatesNotAvailableError(
+                "No known rate for {}-->{} (offline mode)".format(base, dest))
+        self.logger.debug("No fresh rate found for {}-->{}. It will be "
+                          "retrieved online.".format(base, dest))
+        rate = get_rate(base, dest)
+        retrieved = get_local_datetime()
+        self.save([(base, dest, rate, retrieved)])
+        return rate, retrieved
+
+    # `rows` is a list of tuples (base, dest, rate, retrieved)
+    def save(self, rows):
+        for base, dest, rate, retrieved in rows:
+            self.rates[(base, dest)] = (rate, retrieved)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    '''INSERT OR REPLACE INTO exchange_rates
+                       VALUES (?,?,?,?,?)''',
+                    [(base, dest, retrieved.date().isoformat(), rate,
+                      retrieved.isoformat())
+                     for base, dest, rate, retrieved in rows])
+        finally:
+            conn.close()
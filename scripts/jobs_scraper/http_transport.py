@@ -0,0 +1,153 @@
+import threading
+import time
+# Third-party modules
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# Status codes of the responses that are retried by default: too many requests
+# and server errors
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+
+# Returns: the q-th percentile (0 <= q <= 100) of the sorted `values` (nearest
+#          rank), or 0 if there are no values
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class FetchStats:
+    def __init__(self):
+        """
+        Thread-safe statistics of the GET requests sent by the scraper: latency
+        of each request (including its retries) and numbers of retries and
+        failures.
+        """
+        self.latencies = []
+        self.n_retries = 0
+        self.n_failures = 0
+        self.lock = threading.Lock()
+
+    def add(self, latency, n_retries=0, failed=False):
+        with self.lock:
+            self.latencies.append(latency)
+            self.n_retries += n_retries
+            self.n_failures += int(failed)
+
+    # Add the statistics gathered somewhere else, e.g. in another process
+    def merge(self, other):
+        with self.lock:
+            self.latencies.extend(other.latencies)
+            self.n_retries += other.n_retries
+            self.n_failures += other.n_failures
+
+    # Returns: FetchStats with the statistics gathered so far, which are then
+    #          reset
+    def drain(self):
+        drained = FetchStats()
+        with self.lock:
+            drained.latencies = self.latencies
+            drained.n_retries = self.n_retries
+            drained.n_failures = self.n_failures
+            self.latencies = []
+            self.n_retries = 0
+            self.n_failures = 0
+        return drained
+
+    # Returns: dict with the number of requests, retries and failures, and the
+    #          latencies (in seconds)
+    def summary(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return {'requests': len(latencies),
+                    'retries': self.n_retries,
+                    'failures': self.n_failures,
+                    'latency_mean': sum(latencies) / len(latencies)
+                    if latencies else 0,
+                    'latency_p50': percentile(latencies, 50),
+                    'latency_p95': percentile(latencies, 95),
+                    'latency_max': latencies[-1] if latencies else 0}
+
+    def log(self, logger):
+        summary = self.summary()
+        if not summary['requests']:
+            logger.info("No HTTP request sent")
+            return
+        logger.info(
+            "HTTP requests={requests} (retries={retries}, "
+            "failures={failures}) | latency: mean={latency_mean:.3f} s, "
+            "p50={latency_p50:.3f} s, p95={latency_p95:.3f} s, "
+            "max={latency_max:.3f} s".format(**summary))
+
+    # NOTE: the lock can't be pickled, e.g. when the statistics are sent back
+    # from the processes of `parse_workers`
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+
+class HttpTransport:
+    def __init__(self, pool_size=10, max_retries=3, backoff_factor=1,
+                 retry_statuses=None):
+        """
+        Transport layer of the scraper's GET requests: a `requests.Session`
+        whose adapter keeps a pool of connections per host (sized to the number
+        of threads sending requests) and retries the failed requests with an
+        exponential backoff (`backoff_factor` * 2^(retry - 1) seconds).
+
+        The connection errors, the read errors and the responses with a status
+        code in `retry_statuses` are retried. For 429 and 503, the
+        `Retry-After` header of the response is honored instead of the backoff.
+        Once the retries are exhausted, the last response is returned (or the
+        last exception raised), see `get()`.
+
+        :param pool_size: maximum number of connections kept open per host
+        :param max_retries: maximum number of retries per request
+        :param backoff_factor: base of the exponential backoff (in seconds)
+        :param retry_statuses: status codes to retry, `RETRY_STATUSES` by
+                               default
+        """
+        self.retry_statuses = RETRY_STATUSES if retry_statuses is None \
+            else retry_statuses
+        retry = Retry(total=max_retries,
+                      backoff_factor=backoff_factor,
+                      status_forcelist=self.retry_statuses,
+                      respect_retry_after_header=True,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stats = FetchStats()
+
+    # Returns: tuple (response, n_retries)
+    # Raises:
+    #   - requests.exceptions.RequestException (an OSError), e.g. once the
+    #     retries of a connection error are exhausted
+    def get(self, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, **kwargs)
+        except requests.exceptions.RequestException:
+            self.stats.add(time.perf_counter() - start, failed=True)
+            raise
+        # The retries done by urllib3 for this request
+        retries = getattr(response.raw, 'retries', None)
+        n_retries = len(retries.history) if retries else 0
+        self.stats.add(time.perf_counter() - start, n_retries,
+                       failed=response.status_code in self.retry_statuses)
+        return response, n_retries
+
+    def close(self):
+        self.session.close()
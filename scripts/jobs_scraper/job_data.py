@@ -1,3 +1,4 @@
+from datetime import date, datetime
 import functools
 import os
 # Third-party modules
@@ -10,6 +11,34 @@ from utilities.logging_boilerplate import LoggingBoilerplate
 from utilities.logging_wrapper import LoggingWrapper
 
 
+# Tables of the records returned by `JobData.to_records()`, keyed by their
+# tablenames. The order is the order in which the records of a job post are
+# saved: `Company` first, then `JobPost`, then the other tables.
+RECORD_TABLES = {table.__tablename__: table
+                 for table in (Company, JobPost, ExperienceLevel, Industry,
+                               JobBenefit, JobLocation, JobSalary, Role, Skill)}
+
+
+# Columns saved in the records, keyed by tablename. The primary keys and the
+# foreign keys are left out since they are either assigned by the database or
+# given by the records' 'job_post_id'.
+_RECORD_COLUMNS = {
+    tablename: [column.name for column in table.__table__.columns
+                if column.name not in ['id', 'company_id', 'job_post_id']]
+    for tablename, table in RECORD_TABLES.items()}
+
+
+# Columns that are saved as ISO 8601 strings in the records, keyed by tablename
+# e.g. {'job_posts': {'date_posted': date.fromisoformat, ...}, ...}
+_DATE_COLUMNS = {
+    tablename: {column.name: (datetime.fromisoformat
+                              if column.type.python_type is datetime
+                              else date.fromisoformat)
+                for column in table.__table__.columns
+                if column.type.python_type in (date, datetime)}
+    for tablename, table in RECORD_TABLES.items()}
+
+
 class DuplicateRecordError(Exception):
     """Raised when a duplicate record (i.e. table instance) is being added to a
     list of records."""
@@ -35,6 +64,9 @@ class JobData:
                 "`logger` must be of type `LoggingWrapper`"
             self.logger = logger
         self.job_post_id = job_post_id
+        self._init_tables()
+
+    def _init_tables(self):
         self.company = Company()
         self.job_post = JobPost()
         self.job_post.id = self.job_post_id
@@ -48,7 +80,7 @@ class JobData:
 
     def __getstate__(self):
         d = dict(self.__dict__)
-        del d['logger']
+        d.pop('logger', None)
         return d
 
     def __setstate__(self, d):
@@ -58,6 +90,83 @@ class JobData:
     def get_logging_info():
         return __name__, __file__, os.getcwd()
 
+    # Flat representation of the job data: one dict per table instance (aka
+    # record) with the keys 'table' (tablename) and 'job_post_id' along with the
+    # record's non-empty columns (see `_RECORD_COLUMNS`). The `id` of
+    # `job_posts` is given by 'job_post_id'. Dates and datetimes are converted
+    # to ISO 8601 strings so that the records can be dumped as JSON.
+    # Returns: list of dicts
+    def to_records(self):
+        records = []
+        for rec in [self.company, self.job_post] + self.experience_levels \
+                + self.industries + self.job_benefits + self.job_locations \
+                + self.job_salaries + self.roles + self.skills:
+            record = {'table': rec.__tablename__,
+                      'job_post_id': self.job_post_id}
+            # NOTE: the values are read from the instance's `__dict__` (where
+            # the values set are stored) instead of through the table's column
+            # attributes which are a lot slower to access
+            values = rec.__dict__
+            for column_name in _RECORD_COLUMNS[rec.__tablename__]:
+                value = values.get(column_name)
+                if value is None:
+                    continue
+                if isinstance(value, date):
+                    value = value.isoformat()
+                record[column_name] = value
+            records.append(record)
+        return records
+
+    # Convert a record as returned by `to_records()` into the column values of
+    # its table, i.e. the dates are parsed back and 'job_post_id' is set to the
+    # right column (`id` for `job_posts`, nothing for `companies`)
+    # Returns: dict
+    @staticmethod
+    def record_to_columns(record):
+        tablename = record['table']
+        date_columns = _DATE_COLUMNS[tablename]
+        columns = {}
+        for key, value in record.items():
+            if key == 'table':
+                continue
+            if key == 'job_post_id':
+                if tablename == 'companies':
+                    continue
+                elif tablename == 'job_posts':
+                    key = 'id'
+            elif key in date_columns and isinstance(value, str):
+                value = date_columns[key](value)
+            columns[key] = value
+        return columns
+
+    # Rebuild the job data from its records (see `to_records()`). As for an
+    # unpickled `JobData`, the records are not checked again and the logger is
+    # optional.
+    # Returns: JobData
+    @classmethod
+    def from_records(cls, job_post_id, records, logger=None):
+        job_data = cls.__new__(cls)
+        job_data.logger = logger
+        job_data.job_post_id = job_post_id
+        job_data._init_tables()
+        job_data.company.job_posts.append(job_data.job_post)
+        for record in records:
+            tablename = record['table']
+            columns = cls.record_to_columns(record)
+            if tablename == 'companies':
+                rec = job_data.company
+            elif tablename == 'job_posts':
+                rec = job_data.job_post
+            else:
+                rec = RECORD_TABLES[tablename]()
+                # The tablename is also the name of the list of records in
+                # `JobData` and of the job post's relationship
+                job_data.__getattribute__(tablename).append(rec)
+                job_data.job_post.__getattribute__(tablename).append(rec)
+            for key, value in columns.items():
+                rec.__setattr__(key, value)
+        return job_data
+
     def _check_kwargs_all_none(func):
         @functools.wraps(func)
         def wrapper_check_kwargs_all_none(self, *args, **kwargs):
@@ -1,43 +1,41 @@
 import argparse
+import concurrent.futures
 from datetime import date, datetime
+import hashlib
 import json
-import math
 import os
 import pathlib
+import pickle
 import re
 import sqlite3
 import sys
 import time
+import zlib
 # Third-party modules
-from bs4 import BeautifulSoup
-from forex_python.converter import get_currency_name, get_rate, \
-    RatesNotAvailableError
-from pycountry_convert import country_name_to_country_alpha2
+from forex_python.converter import get_currency_name, RatesNotAvailableError
 import requests
-import ipdb
 # Own modules
 from job_data import DuplicateRecordError, JobData, NoOfficeLocationFoundError
 import exc
+from currency_codes import build_currency_codes_index
+from exchange_rates import ExchangeRates
+from http_transport import HttpTransport
+from location_normalizer import LocationNormalizer
+from page_fetcher import bounded_map, completed_future, HostRateLimiter, \
+    PageFetcher
+from page_parser import extract_linked_data, parse_webpage
+from run_checkpoint import find_resumable_run, load_checkpoint, \
+    save_checkpoint
 from scraping_session import ScrapingSession
-from utilities.genutils import connect_db, dump_pickle, get_local_datetime, \
-    load_json, read_file, read_yaml_config, write_file
+from session_writer import SessionWriter
+from stage_timer import StageTimer
+from webpage_cache import open_webpage_cache
+from utilities.genutils import connect_db, get_local_datetime, load_json, \
+    read_yaml_config
 from utilities.logging_boilerplate import LoggingBoilerplate
 from utilities.script_boilerplate import ScriptBoilerplate
 
 
-# ref.: https://stackoverflow.com/a/50120316
-class recursionlimit:
-    def __init__(self, limit):
-        self.limit = limit
-        self.old_limit = sys.getrecursionlimit()
-
-    def __enter__(self):
-        sys.setrecursionlimit(self.limit)
-
-    def __exit__(self, type_, value, tb):
-        sys.setrecursionlimit(self.old_limit)
-
-
 class JobsScraper:
     def __init__(self, main_cfg, logging_cfg, logger):
         self.main_cfg = main_cfg
@@ -55,7 +53,32 @@ class JobsScraper:
         # Sessions initialization
         # =====================================================================
         self.session = None
-        self.all_sessions = []
+        # =====================================================================
+        # Incremental scraping
+        # =====================================================================
+        # If enabled, only the new entries and the job posts whose webpage's
+        # content changed since the last scraping are processed
+        self.incremental = main_cfg['incremental']
+        # `content_hashes` has for keys the `job_post_id`s already scraped and
+        # the values are the hashes of their webpages' contents, as saved in
+        # the `scraping_state` table
+        self.content_hashes = {}
+        # Number of job posts skipped because their webpages didn't change
+        self.n_unchanged = 0
+        # =====================================================================
+        # Parsing of the webpages
+        # =====================================================================
+        # 'full' or 'regions' (only the regions of the webpages with job data
+        # are parsed into BeautifulSoup trees), see `page_parser.py`
+        self.page_parser = main_cfg.get('page_parser', 'full')
+        # If enabled, the job posts whose JSON linked data (extracted from the
+        # raw HTML) has all the `required_fields` are parsed with the
+        # 'regions' parser whatever `page_parser` is, i.e. only the regions of
+        # their webpages with the job data not found in the linked data
+        fast_path_cfg = main_cfg.get('linked_data_fast_path', {})
+        self.linked_data_fast_path = fast_path_cfg.get('enabled', False)
+        self.linked_data_required_fields = fast_path_cfg.get(
+            'required_fields', [])
         # =====================================================================
         # Save all data paths from the main config
         # =====================================================================
@@ -68,12 +91,44 @@ class JobsScraper:
             main_cfg['data_paths']['currencies'])
         self.scraped_job_data_dirpath = os.path.expanduser(
             main_cfg['saving_cfg']['scraped_job_data_dirpath'])
+        # Cache of the webpages: one HTML file per job post in
+        # `cached_webpages_dirpath` or a SQLite database of the compressed
+        # webpages, see `webpage_cache.py`
+        self.webpage_cache = None
+        cache_cfg = main_cfg.get('webpages_cache', {'backend': 'files'})
+        if cache_cfg['backend'] != 'files' or self.cached_webpages_dirpath:
+            self.webpage_cache = open_webpage_cache(
+                backend=cache_cfg['backend'],
+                dirpath=self.cached_webpages_dirpath,
+                db_filepath=os.path.expanduser(
+                    cache_cfg.get('db_filepath', '')),
+                compression_level=cache_cfg.get('compression_level', 6))
         # =====================================================================
+        # Timing of the pipeline's stages (fetch, parse, processing of the
+        # <header>, ...), see `StageTimer`
+        self.timer = StageTimer(
+            enabled=self.main_cfg.get('profiling', {}).get('enabled', False))
         self.conn = None
-        # Establish a session to be used for the GET requests
-        self.req_session = requests.Session()
+        # Transport of the GET requests: pool of connections sized to the
+        # number of threads loading the webpages and retries with exponential
+        # backoff, see `HttpTransport`
+        transport_cfg = self.main_cfg.get('http_transport', {})
+        self.transport = HttpTransport(
+            pool_size=transport_cfg.get('pool_size') or
+            self.main_cfg['max_workers'],
+            max_retries=transport_cfg.get('max_retries', 3),
+            backoff_factor=transport_cfg.get('backoff_factor', 1),
+            retry_statuses=transport_cfg.get('retry_statuses'))
+        # If True, the job posts whose webpages couldn't be retrieved because
+        # of a transient error are scraped again at the end of the run
+        self.retry_queue = transport_cfg.get('retry_queue', True)
         self.headers = self.main_cfg['headers']
-        self.last_request_time = -sys.float_info.max
+        # The delay between requests is enforced for each host separately
+        self.rate_limiter = HostRateLimiter(
+            delay_between_requests=self.main_cfg['delay_between_requests'])
+        # If a mirror is given (e.g. the local server `local_http_server.py`
+        # serving the cached webpages), the GET requests are sent to it instead
+        self.mirror_url = self.main_cfg.get('mirror_url')
         # =====================================================================
         # Load JSON data
         # =====================================================================
@@ -81,23 +136,37 @@ class JobsScraper:
         # is a dict with the keys ['cc', 'symbol', 'name'] where 'cc' is short
         # for currency code
         self.currencies_data = load_json(self.currencies_filepath)
+        # Index mapping the currency symbols (and codes) to their currency
+        # codes, e.g. '€' --> 'EUR', see `build_currency_codes_index()`
+        self.currency_codes = build_currency_codes_index(self.currencies_data)
         # Load the dict of US states where the keys are the USPS 2-letter codes
         # for the U.S. state and the values are the names
         # e.g. 'AZ': 'Arizona'
         self.us_states = load_json(self.us_states_filepath)
+        # The location texts and the countries are normalized through a memo
+        # since the same locations are repeated in many job posts
+        self.location_normalizer = LocationNormalizer(
+            logger=self.logger,
+            us_states=self.us_states,
+            cache_size=self.main_cfg.get('location_cache_size', 4096))
         # =====================================================================
-        # Cache the rates that were already used for converting one currency to
-        # another. Hence, we won't have to send HTTP requests to get these rates
-        # if they are already cached
-        # `cached_rates` has for keys the name of the rates and the values are
-        # a tuple of the associated rates and the time (UTC) the rate was
-        # retrieved. The name of the rate (key) is built like this:
-        # {base_cur}_{dest_cur}
-        # e.g. {'EUR_USD': (1.1391, 1535166701.7913752),
-        #       'EUR_CAD': (1.4976,1535167046.6978931)}
-        self.cached_rates = {}
+        # Exchange rates used for converting the salaries to `dest_currency`.
+        # The rates are saved in a database so that they are reused by the next
+        # scraping runs (until they expire), see `ExchangeRates`
+        rates_cfg = main_cfg['exchange_rates']
+        self.exchange_rates = ExchangeRates(
+            db_filepath=rates_cfg['db_filepath'],
+            ttl=rates_cfg['ttl'],
+            offline=rates_cfg['offline'],
+            logger=self.logger)
+        try:
+            self.exchange_rates.load()
+        except sqlite3.Error as e:
+            self.logger.exception(e)
+            self.logger.warning("The saved exchange rates couldn't be loaded")
 
     def start_scraping(self):
+        run_start = time.perf_counter()
         # =====================================================================
         # Data retrieval from SQLite database
         # =====================================================================
@@ -124,188 +193,450 @@ class JobsScraper:
                         "will end!")
                 else:
                     self.logger.debug("{} rows retrieved".format(len(rows)))
+            # Get the hashes of the webpages already scraped
+            self.create_scraping_state_table()
+            if self.incremental:
+                self.content_hashes = dict(self.select_content_hashes())
+                self.logger.info(
+                    "Incremental scraping: {} job posts were already "
+                    "scraped".format(len(self.content_hashes)))
+        # =====================================================================
+        # Exchange rates prefetching
+        # =====================================================================
+        # All the rates that could be needed for converting the salaries are
+        # retrieved in one batch so that there is no network call for the
+        # rates while the job posts are processed
+        try:
+            self.exchange_rates.prefetch(
+                [item['cc'] for item in self.currencies_data],
+                self.main_cfg['dest_currency'])
+        except (RatesNotAvailableError, requests.exceptions.ConnectionError,
+                sqlite3.Error) as e:
+            self.logger.exception(e)
+            self.logger.warning("The exchange rates couldn't be prefetched. "
+                                "They will be retrieved when needed.")
+        # =====================================================================
+        # Directory creation for saving scraped job data
+        # =====================================================================
+        checkpoint_cfg = self.main_cfg.get('checkpoint', {})
+        checkpoint_interval = checkpoint_cfg.get('interval', 0)
+        checkpoint = None
+        scraped_job_data_dirpath = None
+        if checkpoint_cfg.get('resume'):
+            scraped_job_data_dirpath = find_resumable_run(
+                self.scraped_job_data_dirpath)
+            if scraped_job_data_dirpath:
+                checkpoint = load_checkpoint(scraped_job_data_dirpath)
+                self.logger.warning(
+                    "Resuming the run in '{}' from its last checkpoint: {} job "
+                    "posts already processed".format(
+                     scraped_job_data_dirpath,
+                     len(checkpoint['job_post_ids'])))
+            else:
+                self.logger.warning("No run to resume. A new run will start.")
+        if checkpoint is None:
+            # Folder name will begin with the date+time
+            timestamped = datetime.now().strftime('%Y%m%d-%H%M%S-{fname}')
+            # Create directory where the scraped job data will be saved
+            scraped_job_data_dirpath = os.path.join(
+                self.scraped_job_data_dirpath,
+                timestamped.format(fname='scraped_job_data'))
+            pathlib.Path(scraped_job_data_dirpath).mkdir(parents=True,
+                                                         exist_ok=True)
+            self.logger.warning("Directory for job data created: {}".format(
+                scraped_job_data_dirpath))
+            checkpoint = {'job_post_ids': [],
+                          'counters': {'n_skipped': 0,
+                                       'n_fast_path': 0,
+                                       'n_full_parse': 0},
+                          'n_rows': len(rows),
+                          'completed': False}
+        # Each session is saved as soon as it is finished, i.e. the sessions are
+        # not kept in memory
+        session_writer = SessionWriter(
+            dirpath=scraped_job_data_dirpath,
+            split_size=self.main_cfg['saving_cfg']['split_size'],
+            logger=self.logger,
+            file_format=self.main_cfg['saving_cfg'].get('file_format',
+                                                        'jsonl'))
+        if 'writer' in checkpoint:
+            # The sessions saved after the last checkpoint are discarded since
+            # their job posts are processed again
+            session_writer.restore(checkpoint['writer'])
+            processed_ids = set(checkpoint['job_post_ids'])
+            rows = [entry for entry in rows if entry[0] not in processed_ids]
         # =====================================================================
         # Processing data from SQLite database
         # =====================================================================
         # For each entry's URL, scrape more job data from the job post's webpage
-        n_skipped = 0
-        skipped = False
+        counters = checkpoint['counters']
+        saved = True
+        # Scraping state of the processed job posts, saved once their sessions
+        # are saved (at each checkpoint)
+        scraping_states = []
         self.logger.info("Total URLs to process: {}".format(len(rows)))
-        for count, (job_post_id, title, author, url, location, published) in \
-                enumerate(rows, start=1):
-            if False and job_post_id != 203827:
-                continue
+        for count, (entry, skipped, session) in \
+                enumerate(self.scrape_entries_with_retry_queue(rows), start=1):
+            job_post_id, _, _, url, _, _ = entry
+            self.logger.info("#{} Processed '{}'".format(count, url))
+            # Save the current session
             try:
-                # Initialize the current scraping session
-                self.session = ScrapingSession(
-                    job_post_id,
-                    url=url,
-                    data=JobData(job_post_id, self.job_data_logger))
-                self.logger.info("#{} Processing '{}'".format(count, url))
-                self.logger.info("Scraping session initialized for job_post_id "
-                                 "{}".format(job_post_id))
-
-                # TODO: remove, used for only saving webpages
-                # html = self.load_cached_webpage()
-                # continue
-
-                # Update the job post's URL
-                self.session.data.set_job_post(url=url)
-                # =============================================================
-                # Update with RSS feed's data
-                # =============================================================
-                # Update the job data with the already extracted data from the
-                # RSS feed
-                self.logger.info("Processing the RSS feed data")
-                self.process_rss_feed_data(author=author,
-                                           title=title,
-                                           published=published,
-                                           location=location)
-                # =============================================================
-                # Load cached webpage
-                # =============================================================
-                # Load the cached webpage or retrieve it online
-                self.logger.info("Loading cached webpage")
-                html = self.load_cached_webpage()
-                self.session.bs_obj = BeautifulSoup(html, 'lxml')
-                # =============================================================
-                # Job removal check
-                # =============================================================
-                # Before extracting any job data, check if the job post had
-                # been removed. IMPORTANT: we check this situation if there is
-                # no title in the job post.
-                pattern = "header.job-details--header > div.grid--cell > " \
-                          "h1.fs-headline1 > a"
-                try:
-                    self.logger.debug("Checking if job post is removed")
-                    _ = self.get_text_in_tag(pattern=pattern)
-                except exc.EmptyTextError as e:
-                    # TODO: create more specific error such as EmptyTitleError
-                    # IMPORTANT: the title tag is found but the text is empty,
-                    # a very unusual case! To be further investigated if it
-                    # happens.
-                    self.logger.exception(e)
-                    self.logger.critical("The title tag should not contain an "
-                                         "empty text. Unusual case!")
-                    skipped = True
-                    continue
-                except exc.TagNotFoundError as e:
-                    # No title tag found, thus it means that the job post was
-                    # removed
-                    self.logger.exception(e)
-                    self.logger.error("No title found in the job post")
-                    self.logger.warning("Job post removed!")
-                    self.session.data.set_job_post(job_post_removed=True)
-                    skipped = True
-                    continue
-                else:
-                    self.logger.debug("Job post NOT removed!")
-                # =============================================================
-                # Process job notice
-                # =============================================================
-                # Check if the job is accepting applications by extracting the
-                # message:
-                # "This job is no longer accepting applications."
-                # This notice is located in
-                # body > div.container > div#content > aside.s-notice
-                # NOTE: Usually when this notice is present in a job post, the
-                # JSON linked data is not found anymore within the html of the job
-                # post
+                with self.timer.stage('save_session'):
+                    session_writer.write(job_post_id, session)
+            except (OSError, TypeError, pickle.PicklingError) as e:
+                self.logger.exception(e)
+                self.logger.error("The session for job_post_id {} couldn't be "
+                                  "saved. Web scraping will end!".format(
+                                   job_post_id))
+                saved = False
+                break
+            checkpoint['job_post_ids'].append(job_post_id)
+            # Numbers of job posts that took the linked data fast path and of
+            # job posts whose webpages were parsed with `page_parser`, see
+            # `linked_data_fast_path`
+            if session.linked_data_fast_path:
+                counters['n_fast_path'] += 1
+            elif session.linked_data_fast_path is not None:
+                counters['n_full_parse'] += 1
+            if session.content_hash:
+                scraping_states.append(
+                    (job_post_id, get_local_datetime(), session.content_hash))
+            self.logger.info("Session ended")
+            if skipped:
+                self.logger.warning(
+                    "The current URL '{}' will be skipped".format(url))
+                counters['n_skipped'] += 1
+            if checkpoint_interval and count % checkpoint_interval == 0:
                 try:
-                    self.logger.debug("Processing job notice")
-                    self.process_notice()
-                except exc.EmptyTextError as e:
+                    with self.timer.stage('checkpoint'):
+                        self.save_checkpoint(scraped_job_data_dirpath,
+                                             checkpoint, session_writer,
+                                             scraping_states)
+                except (OSError, sqlite3.Error) as e:
                     self.logger.exception(e)
-                    self.logger.critical("The notice tag should not contain an "
-                                         "empty text. Unusual case!")
-                    skipped = True
-                    continue
-                # =============================================================
-                # Process JSON linked data
-                # =============================================================
-                # Process linked data from <script type="application/ld+json">
-                self.logger.info("Processing JSON linked data")
-                self.process_linked_data()
-                # =============================================================
-                # Process <header>
-                # =============================================================
-                # Process job data (e.g. salary, remote, location) from the <header>
-                self.logger.info("Processing the <header>")
-                self.process_header()
-                # =============================================================
-                # Process overview items
-                # =============================================================
-                # Process job data from the Overview section
-                self.logger.info("Processing the overview items")
-                self.process_overview_items()
-                self.logger.info("Finished Processing {}".format(url))
-                if False and count == 100:
+                    self.logger.error("The checkpoint couldn't be saved. Web "
+                                      "scraping will end!")
+                    saved = False
                     break
-            except exc.WebPageNotFoundError as e:
-                self.logger.exception(e)
-                self.logger.critical("The current URL '{}' will be "
-                                     "skipped.".format(url))
-                skipped = True
-            except (AttributeError, KeyError) as e:
-                self.logger.exception(e)
-                skipped = True
-            finally:
-                # Save the current session
-                self.all_sessions.append((job_post_id, self.session))
-                self.logger.info("Session ended")
-                if skipped:
-                    self.logger.warning(
-                        "The current URL '{}' will be skipped".format(url))
-                    n_skipped += 1
-                skipped = False
-        ipdb.set_trace()
+                scraping_states = []
+            if False and count == 100:
+                break
         self.session = None
+        try:
+            session_writer.close()
+        except OSError as e:
+            self.logger.exception(e)
+            self.logger.error("The last sessions data couldn't be saved")
+            saved = False
         # =====================================================================
-        # Directory creation for saving scraped job data
-        # =====================================================================
-        # Folder name will begin with the date+time
-        timestamped = datetime.now().strftime('%Y%m%d-%H%M%S-{fname}')
-        # Create directory where the scraped job data will be saved
-        scraped_job_data_dirpath = os.path.join(
-            self.scraped_job_data_dirpath,
-            timestamped.format(fname='scraped_job_data'))
-        pathlib.Path(scraped_job_data_dirpath).mkdir(parents=True, exist_ok=True)
-        self.logger.warning(
-            "Directory for job data created: {}".format(scraped_job_data_dirpath))
-        # =====================================================================
-        # Session saving as pickle files
+        # Scraping state saving
         # =====================================================================
-        # see https://stackoverflow.com/a/2135179 for `sys.setrecursionlimit`
-        split_size = self.main_cfg['saving_cfg']['split_size']
-        with recursionlimit(15000):
-            n_sessions = len(self.all_sessions)
-            n_groups = math.ceil(n_sessions / split_size)
-            start_index = 0
-            end_index = min(len(self.all_sessions), start_index + split_size)
-            for i in range(n_groups):
-                sessions = dict(self.all_sessions[start_index:end_index])
-                self.logger.info("Saving pickled sessions data, parts {}-{}, "
-                                 "{} job posts".format(
-                                  start_index, end_index-1, len(sessions)))
+        if saved:
+            self.logger.info("Saving the scraping state of {} job posts".format(
+                len(scraping_states)))
+            with self.conn:
+                self.update_scraping_state(scraping_states)
+            if checkpoint_interval:
+                # The run can't be resumed anymore
+                checkpoint['completed'] = True
+                checkpoint.pop('writer', None)
                 try:
-                    filename = 'all_sessions-{}-{}.pkl'.format(
-                        start_index, end_index-1)
-                    all_sessions_filepath = os.path.join(
-                        scraped_job_data_dirpath, filename)
-                    dump_pickle(all_sessions_filepath, sessions)
-                except (OSError, TypeError) as e:
+                    save_checkpoint(scraped_job_data_dirpath, checkpoint)
+                except OSError as e:
                     self.logger.exception(e)
-                    self.logger.error("Pickled sessions data {}-{} couldn't be "
-                                      "saved".format(start_index, end_index-1))
-                    break
-                else:
-                    self.logger.info(
-                        "Pickled sessions data, parts {}-{}, saved in {}".format
-                        (start_index, end_index, all_sessions_filepath))
-                    start_index = end_index
-                    end_index = min(len(self.all_sessions),
-                                    start_index + split_size)
-        self.logger.info("Skipped URLs={}/{}".format(n_skipped, len(rows)))
+                    self.logger.error("The last checkpoint couldn't be saved")
+        else:
+            self.logger.warning("The scraping state will not be updated since "
+                                "the sessions couldn't all be saved")
+        n_rows = checkpoint['n_rows']
+        if self.incremental:
+            self.logger.info("Unchanged job posts skipped={}/{}".format(
+                self.n_unchanged, n_rows))
+        self.logger.info("Skipped URLs={}/{}".format(counters['n_skipped'],
+                                                     n_rows))
+        self.transport.stats.log(self.logger)
+        self.logger.info("Job posts scraped with the linked data fast "
+                         "path={}, with the '{}' page parser={}".format(
+                          counters['n_fast_path'], self.page_parser,
+                          counters['n_full_parse']))
+        # NOTE: with `parse_workers`, the job posts are processed (and their
+        # locations normalized) in other processes, each one with its own memo.
+        # Their statistics are merged into the main process' memo statistics.
+        self.location_normalizer.log_cache_stats()
+        if self.webpage_cache:
+            self.webpage_cache.close()
+        if self.timer.enabled:
+            # NOTE: when resuming a run, only the resumed part is profiled
+            run_duration = time.perf_counter() - run_start
+            self.logger.info("Profile of the run's stages (in ms):\n{}".format(
+                self.timer.format_summary(run_duration)))
+            profile_filepath = os.path.join(scraped_job_data_dirpath,
+                                            'profile.json')
+            try:
+                self.timer.save_profile(profile_filepath, run_duration)
+            except OSError as e:
+                self.logger.exception(e)
+                self.logger.error("The profile couldn't be saved")
+            else:
+                self.logger.info("Profile saved in '{}'".format(
+                    profile_filepath))
+
+    # Flush the sessions saved since the last checkpoint to disk, save the
+    # scraping state of their job posts and then the checkpoint, i.e. the
+    # job_post_ids of all the job posts whose sessions are saved
+    # Raises:
+    #   - OSError
+    #   - sqlite3.Error
+    def save_checkpoint(self, run_dirpath, checkpoint, session_writer,
+                        scraping_states):
+        checkpoint['writer'] = session_writer.checkpoint()
+        with self.conn:
+            self.update_scraping_state(scraping_states)
+        save_checkpoint(run_dirpath, checkpoint)
+        self.logger.info("Checkpoint saved: {} job posts processed".format(
+            len(checkpoint['job_post_ids'])))
+
+    # Scrape the entries and, with `retry_queue`, scrape again at the end of the
+    # run the entries whose webpages couldn't be retrieved because of a
+    # transient error (e.g. connection error or 503 status code)
+    # Yields tuples (entry, skipped, session)
+    def scrape_entries_with_retry_queue(self, rows):
+        if self.main_cfg['parse_workers']:
+            scrape_entries = self.scrape_entries_in_processes
+        else:
+            scrape_entries = self.scrape_entries
+        retry_queue = []
+        for entry, skipped, session in scrape_entries(rows):
+            if self.retry_queue and session.webpage_unavailable:
+                self.logger.warning(
+                    "The URL '{}' will be retried at the end of the "
+                    "run".format(entry[3]))
+                retry_queue.append(entry)
+                continue
+            yield entry, skipped, session
+        if not retry_queue:
+            return
+        self.logger.info("Retrying {} URLs whose webpages couldn't be "
+                         "retrieved".format(len(retry_queue)))
+        n_recovered = 0
+        for entry, skipped, session in scrape_entries(retry_queue):
+            if not session.webpage_unavailable:
+                n_recovered += 1
+            yield entry, skipped, session
+        self.logger.info("Retried URLs recovered={}/{}".format(
+            n_recovered, len(retry_queue)))
+
+    # Scrape the entries in the main process: the webpages are loaded (from
+    # cache or online) by the fetch stage's threads and each job post is
+    # processed as soon as its webpage arrives
+    # Yields tuples (entry, skipped, session)
+    def scrape_entries(self, rows):
+        fetcher = PageFetcher(load_page=self.load_entry_webpage,
+                              max_workers=self.main_cfg['max_workers'],
+                              max_in_flight=self.main_cfg['max_in_flight'])
+        for entry, webpage in fetcher.fetch(rows):
+            job_post_id, _, _, url, _, _ = entry
+            if False and job_post_id != 203827:
+                continue
+            self.logger.info("Processing '{}'".format(url))
+            results = self.scrape_fetched_job_post(
+                entry, webpage, self.content_hashes.get(job_post_id))
+            if results is None:
+                self.n_unchanged += 1
+                continue
+            yield (entry,) + results
+
+    # Scrape the entries in a pool of processes, each one loading and parsing
+    # its own webpages. Useful when the webpages are already cached since the
+    # scraping is then CPU-bound.
+    # NOTE: the delay between requests is enforced in each process separately
+    # for the webpages that are not cached
+    # Yields tuples (entry, skipped, session)
+    def scrape_entries_in_processes(self, rows):
+        n_workers = self.main_cfg['parse_workers']
+        self.logger.info("Scraping with {} processes".format(n_workers))
+        # Each entry is sent along with the hash of its previously scraped
+        # webpage
+        items = ((entry, self.content_hashes.get(entry[0])) for entry in rows)
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_scraper_process,
+                initargs=(self.main_cfg, self.logging_cfg)) as executor:
+            for (entry, _), future in bounded_map(executor,
+                                                  _scrape_job_post_in_process,
+                                                  items,
+                                                  max_in_flight=4 * n_workers):
+                results, fetch_stats, timer, location_stats = future.result()
+                self.transport.stats.merge(fetch_stats)
+                self.timer.merge(timer)
+                self.location_normalizer.merge_cache_stats(location_stats)
+                if results is None:
+                    self.n_unchanged += 1
+                    continue
+                skipped, session = results
+                # The logger is not pickled with the job data
+                session.data.logger = self.job_data_logger
+                yield entry, skipped, session
+
+    # Scrape the job data of an entry whose webpage was loaded by the fetch
+    # stage. `webpage` is a future whose result is the tuple
+    # (html, cached_webpage_filepath, webpage_accessed).
+    # `known_hash` is the hash of the webpage's content when it was last
+    # scraped (None if never scraped)
+    # Returns: tuple (skipped, session) or None if the scraping is incremental
+    #          and the webpage didn't change since the last scraping
+    def scrape_fetched_job_post(self, entry, webpage, known_hash=None):
+        content_hash = None
+        if webpage.exception() is None:
+            with self.timer.stage('hash'):
+                content_hash = self.hash_webpage(webpage.result()[0])
+            if self.incremental and content_hash == known_hash:
+                self.logger.info(
+                    "The webpage of job_post_id {} didn't change since the "
+                    "last scraping. It will be skipped".format(entry[0]))
+                return None
+        skipped = self.scrape_job_post(entry, load_webpage=webpage.result)
+        self.session.content_hash = content_hash
+        return skipped, self.session
+
+    # Scrape the job data of a single entry from the `entries` table. The
+    # scraped job data is saved in `self.session`.
+    # `load_webpage` is a callable that returns the tuple
+    # (html, cached_webpage_filepath, webpage_accessed), e.g. the `result()` of
+    # a future from the fetch stage
+    # Returns: bool, True if the job post is skipped
+    def scrape_job_post(self, entry, load_webpage):
+        job_post_id, title, author, url, location, published = entry
+        try:
+            # Initialize the current scraping session
+            self.session = ScrapingSession(
+                job_post_id,
+                url=url,
+                data=JobData(job_post_id, self.job_data_logger))
+            self.logger.info("Scraping session initialized for job_post_id "
+                             "{}".format(job_post_id))
+            # Update the job post's URL
+            self.session.data.set_job_post(url=url)
+            # =================================================================
+            # Update with RSS feed's data
+            # =================================================================
+            # Update the job data with the already extracted data from the
+            # RSS feed
+            self.logger.info("Processing the RSS feed data")
+            self.process_rss_feed_data(author=author,
+                                       title=title,
+                                       published=published,
+                                       location=location)
+            # =================================================================
+            # Load cached webpage
+            # =================================================================
+            # Get the cached webpage or the one retrieved online by the fetch
+            # stage
+            self.logger.info("Loading cached webpage")
+            html, cached_webpage_filepath, webpage_accessed = load_webpage()
+            self.session.data.set_job_post(
+                cached_webpage_filepath=cached_webpage_filepath,
+                webpage_accessed=webpage_accessed)
+            # The linked data is extracted from the raw HTML, i.e. without
+            # parsing the webpage
+            with self.timer.stage('extract_linked_data'):
+                linked_data = extract_linked_data(html)
+            # Fast path: the linked data has all the required fields, thus only
+            # the regions of the webpage with the other job data (e.g. the
+            # <header> and the overview items) are parsed
+            # NOTE: usually, the job posts that are removed or not accepting
+            # applications anymore don't have linked data (see the job notice
+            # below), i.e. their webpages are parsed with `self.page_parser`
+            self.session.linked_data_fast_path = \
+                self.linked_data_fast_path and linked_data is not None and \
+                all(linked_data.get(field)
+                    for field in self.linked_data_required_fields)
+            page_parser = 'regions' if self.session.linked_data_fast_path \
+                else self.page_parser
+            with self.timer.stage('parse'):
+                self.session.bs_obj = parse_webpage(html, page_parser)
+            # =================================================================
+            # Job removal check
+            # =================================================================
+            # Before extracting any job data, check if the job post had
+            # been removed. IMPORTANT: we check this situation if there is
+            # no title in the job post.
+            pattern = "header.job-details--header > div.grid--cell > " \
+                      "h1.fs-headline1 > a"
+            try:
+                self.logger.debug("Checking if job post is removed")
+                _ = self.get_text_in_tag(pattern=pattern)
+            except exc.EmptyTextError as e:
+                # TODO: create more specific error such as EmptyTitleError
+                # IMPORTANT: the title tag is found but the text is empty,
+                # a very unusual case! To be further investigated if it
+                # happens.
+                self.logger.exception(e)
+                self.logger.critical("The title tag should not contain an "
+                                     "empty text. Unusual case!")
+                return True
+            except exc.TagNotFoundError as e:
+                # No title tag found, thus it means that the job post was
+                # removed
+                self.logger.exception(e)
+                self.logger.error("No title found in the job post")
+                self.logger.warning("Job post removed!")
+                self.session.data.set_job_post(job_post_removed=True)
+                return True
+            else:
+                self.logger.debug("Job post NOT removed!")
+            # =================================================================
+            # Process job notice
+            # =================================================================
+            # Check if the job is accepting applications by extracting the
+            # message:
+            # "This job is no longer accepting applications."
+            # This notice is located in
+            # body > div.container > div#content > aside.s-notice
+            # NOTE: Usually when this notice is present in a job post, the
+            # JSON linked data is not found anymore within the html of the job
+            # post
+            try:
+                self.logger.debug("Processing job notice")
+                self.process_notice()
+            except exc.EmptyTextError as e:
+                self.logger.exception(e)
+                self.logger.critical("The notice tag should not contain an "
+                                     "empty text. Unusual case!")
+                return True
+            # =================================================================
+            # Process JSON linked data
+            # =================================================================
+            # Process linked data from <script type="application/ld+json">
+            self.logger.info("Processing JSON linked data")
+            with self.timer.stage('process_linked_data'):
+                self.process_linked_data(linked_data)
+            # =================================================================
+            # Process <header>
+            # =================================================================
+            # Process job data (e.g. salary, remote, location) from the <header>
+            self.logger.info("Processing the <header>")
+            with self.timer.stage('process_header'):
+                self.process_header()
+            # =================================================================
+            # Process overview items
+            # =================================================================
+            # Process job data from the Overview section
+            self.logger.info("Processing the overview items")
+            with self.timer.stage('process_overview_items'):
+                self.process_overview_items()
+            self.logger.info("Finished Processing {}".format(url))
+        except exc.WebPageNotFoundError as e:
+            self.logger.exception(e)
+            self.logger.critical("The current URL '{}' will be "
+                                 "skipped.".format(url))
+            self.session.webpage_unavailable = isinstance(
+                e, exc.WebPageUnavailableError)
+            return True
+        except (AttributeError, KeyError) as e:
+            self.logger.exception(e)
+            return True
+        return False
 
     def process_rss_feed_data(self, author, title, location, published):
         # Company: author
@@ -338,7 +669,8 @@ class JobsScraper:
             try:
                 # Process the location
                 # We want to standardize the country (e.g. Finland --> FI)
-                location = self.process_location_text(location)
+                location = self.location_normalizer.process_location_text(
+                    location)
                 self.session.data.set_job_location(**location)
             except (KeyError, exc.InvalidLocationTextError) as e:
                 self.logger.exception(e)
@@ -498,7 +830,7 @@ class JobsScraper:
             text = self.get_text_in_tag(pattern)
             # Process the location text
             # We want to standardize the country (e.g. Finland --> FI)
-            location = self.process_location_text(text)
+            location = self.location_normalizer.process_location_text(text)
             self.session.data.set_job_location(**location)
             self.logger.debug("The location {} was saved.".format(location))
         except exc.TagNotFoundError as e:
@@ -608,17 +940,23 @@ class JobsScraper:
                 "Couldn't extract the other job data @ '{}'. The other job data "
                 "should be found in '{}'".format(url, pattern))
 
-    def process_linked_data(self):
+    # `linked_data` is the linked data already extracted from the raw HTML by
+    # `extract_linked_data()`. If None, it is searched in the BeautifulSoup
+    # object.
+    def process_linked_data(self, linked_data=None):
         # Get linked data from <script type="application/ld+json">:
         # On the webpage of a job post, important data about the job post
         # (e.g. job location or salary) can be found in
         # <script type="application/ld+json">
         # This linked data is a JSON object that stores important job info like
         # employmentType, experienceRequirements, jobLocation
-        script_tag \
-            = self.session.bs_obj.find(attrs={'type': 'application/ld+json'})
+        if linked_data is None:
+            script_tag = self.session.bs_obj.find(
+                attrs={'type': 'application/ld+json'})
+            if script_tag:
+                linked_data = json.loads(script_tag.get_text())
         url = self.session.url
-        if script_tag:
+        if linked_data is not None:
             """
             The linked data found in <script type="application/ld+json"> is a 
             json object with the following keys:
@@ -627,7 +965,6 @@ class JobsScraper:
             'industry', 'jobBenefits', 'hiringOrganization', 'baseSalary', 
             'jobLocation'
             """
-            linked_data = json.loads(script_tag.get_text())
             # Extract data for populating the `job_posts` table
             date_posted = self.str_to_date(linked_data.get('datePosted'))
             valid_through = self.str_to_date(linked_data.get('validThrough'))
@@ -712,9 +1049,10 @@ class JobsScraper:
             # Convert the minimum and maximum salaries to
             # `dest_currency` (e.g. USD)
             try:
-                results = self.convert_min_and_max_salaries(min_salary,
-                                                            max_salary,
-                                                            currency)
+                with self.timer.stage('currency_conversion'):
+                    results = self.convert_min_and_max_salaries(min_salary,
+                                                                max_salary,
+                                                                currency)
             except exc.CurrencyRateError as e:
                 self.logger.exception(e)
             except (exc.NoneBaseCurrencyError, exc.NoneSalaryError,
@@ -733,72 +1071,6 @@ class JobsScraper:
             self.logger.info("The page @ '{}' doesn't contain any "
                              "`<script type='application/ld+json'>`".format(url))
 
-    def process_location_text(self, text):
-        updated_values = {}
-        # The text where you find the location looks like this:
-        # '\n|\r\nNo office location                    '
-        # strip() removes the first newline and the right whitespaces.
-        # Then split('\n')[-1] extracts the location string. And the replace()
-        # will remove any spaces after the commas.
-        # e.g. 'Toronto, ON, Canada' --> 'Toronto,ON,Canada'
-        text = text.strip().split('|')[-1].strip().replace(', ', ',')
-        # Based on the number of commas, we can know if the text:
-        # - refers only to a country --> No comma, e.g. Canada
-        # - refers to a city and Country --> One commas, e.g. 'Bellevue, WA'
-        # - refers a city, region (state, province), country --> Two commas,
-        #       e.g. Toronto, ON, Canada
-        # - can't be decoded --> Zero and 3+ commas
-        if text.count(',') == 0:
-            self.logger.warning("No commas found in location text '{}'. We will "
-                                "assume that the location text '{}' refers to a "
-                                "country.".format(text, text))
-            # Save country, no more information can be extracted
-            updated_values['country'] = text
-        elif text.count(',') == 1:
-            # One comma in location text
-            # Example 1: 'Bellevue, WA'
-            # Example 2: 'Helsinki, Finland'
-            self.logger.debug(
-                "Found 1 comma in the location text '{}'".format(text))
-            # Save city and country
-            updated_values = dict(zip(['city', 'country'], text.split(',')))
-            # Do further processing on the country since it might refer in fact
-            # to a U.S. state, e.g. 'Bellevue, WA'. For U.S. jobs, the job
-            # posts don't specify the country as it is the case for job posts
-            # for other countries.
-            if self.is_a_us_state(updated_values['country']):
-                self.logger.debug("The location text '{}' refers to a place in the "
-                                  "US".format(text))
-                # Fix the location information: the country refers actually to
-                # a U.S. state, and save 'US' as the country
-                updated_values['region'] = updated_values['country']
-                updated_values['country'] = 'US'
-                # NOTE: No need to standardize the country name (like we do in
-                # the other cases) because it is already standard
-                return updated_values
-        elif text.count(',') == 2:
-            # Two commas in location text
-            # e.g. Toronto, ON, Canada
-            self.logger.debug(
-                "Found 2 commas in the location text '{}'".format(text))
-            updated_values = dict(zip(['city', 'region', 'country'],
-                                      text.split(',')))
-        else:
-            # Incorrect number of commas in location text. Thus we can't extract
-            # the location from the text. I haven't encounter this case yet, but
-            # we never know.
-            raise exc.InvalidLocationTextError(
-                "Invalid location text '{}'. Incorrect number of "
-                "commas.".format(text))
-        # Standardize the country, e.g. Finland -> FI
-        try:
-            std_country = self.standardize_country(updated_values['country'])
-        except KeyError as e:
-            raise KeyError(e)
-        else:
-            updated_values['country'] = std_country
-            return updated_values
-
     def process_notice(self):
         pattern = "body > div.container > div#content > aside.s-notice"
         try:
@@ -1052,9 +1324,10 @@ class JobsScraper:
             # Convert the min and max salaries to `dest_currency` (e.g. USD)
             # `results` is a `dict` of keys 'currency', 'min_salary',
             # 'max_salary', 'conversion_time'
-            results = self.convert_min_and_max_salaries(min_salary,
-                                                        max_salary,
-                                                        currency_code)
+            with self.timer.stage('currency_conversion'):
+                results = self.convert_min_and_max_salaries(min_salary,
+                                                            max_salary,
+                                                            currency_code)
         except exc.InvalidCountryError as e:
             # raised by `get_currency_code()`
             raise exc.InvalidCountryError(e)
@@ -1233,39 +1506,27 @@ class JobsScraper:
 
     # Returns: tuple, integer of converted amount and datetime of conversion time
     # Raises:
-    #   - NoneBaseCurrencyError by itself
-    #   - RatesNotAvailableError by get_rate()
-    #   - requests.exceptions.ConnectionError by get_rate()
+    #   - RatesNotAvailableError by ExchangeRates.get_rate()
+    #   - requests.exceptions.ConnectionError by ExchangeRates.get_rate()
     # Convert an amount from a base currency (e.g. EUR) to a destination currency (e.g. USD)
     # NOTE: `base_currency` and `dest_currency` are currency codes, e.g. USD, EUR, CAD
     def convert_currency(self, amount, base_currency, dest_currency):
-        # Get the rate from cache if it is available
-        rate_key = '{}_{}'.format(base_currency, dest_currency)
-        rate_used = self.cached_rates.get(rate_key, {}).get('rate')
-        conversion_time = self.cached_rates.get(rate_key, {}).get('conversion_time')
-        if rate_used is None:
-            # Rate not available from cache
-            self.logger.debug("No cache rate found for {}-->{}".format(
-                               base_currency, dest_currency))
-            # Get the rate online and cache it
-            try:
-                rate_used = get_rate(base_currency, dest_currency)
-                conversion_time = get_local_datetime()
-            except RatesNotAvailableError as e:
-                raise RatesNotAvailableError(e)
-            except requests.exceptions.ConnectionError as e:
-                raise requests.exceptions.ConnectionError(e)
-            else:
-                # Cache the rate
-                self.logger.debug("The rate {} is cached for {}-->{}".format(
-                                   rate_used, base_currency, dest_currency))
-                self.cached_rates[rate_key] = {
-                    'rate': rate_used,
-                    'conversion_time': conversion_time}
-        else:
-            # Rate available from cache
-            self.logger.debug("The cached rate {} is used for {}-->{}".format(
-                               rate_used, base_currency, dest_currency))
+        # Get the rate from the exchange rates store: it is retrieved online
+        # only if it is not already known (e.g. prefetched) or if it expired
+        try:
+            rate_used, conversion_time = self.exchange_rates.get_rate(
+                base_currency, dest_currency)
+        except RatesNotAvailableError as e:
+            raise RatesNotAvailableError(e)
+        except requests.exceptions.ConnectionError as e:
+            raise requests.exceptions.ConnectionError(e)
+        except sqlite3.Error as e:
+            # The rate couldn't be saved. However, it is still kept in memory.
+            self.logger.exception(e)
+            rate_used, conversion_time = self.exchange_rates.rates[
+                (base_currency, dest_currency)]
+        self.logger.debug("The rate {} is used for {}-->{}".format(
+                           rate_used, base_currency, dest_currency))
         # Convert the base currency to the desired currency using the
         # retrieved rate
         converted_amount = int(round(rate_used * amount))
@@ -1281,85 +1542,44 @@ class JobsScraper:
     #   - NoCurrencyCodeError by itself
     #   - InvalidCountryError by itself
     def get_currency_code(self, currency_symbol):
-        # First check if the currency symbol is not a currency code already
-        if get_currency_name(currency_symbol):
-            self.logger.debug(
-                "The currency symbol '{}' is actually a currency code.")
-            return currency_symbol
-        # NOTE: there is no 1-to-1 mapping when going from currency symbol
-        # to currency code
-        # e.g. the currency symbol £ is used for the currency codes EGP, FKP,
-        # GDP, GIP, LBP, and SHP
-        # Search into the `currencies_data` list for all the currencies that have
-        # the given `currency_symbol`. Each item in `currencies_data` is a dict
-        # with the keys ['cc', 'symbol', 'name'].
-        results = [item for item in self.currencies_data
-                   if item["symbol"] == currency_symbol]
-        # NOTE: C$ is used as a currency symbol for Canadian Dollar instead of $
-        # However, C$ is already the official currency symbol for
-        # Nicaragua Cordoba (NIO)
-        # Thus we will assume that C$ is related to the Canadian Dollar.
-        # NOTE: in stackoverflow job posts, '$' alone refers to US$ but '$' can
-        # refer to multiple currency codes such as ARS (Argentine peso), AUD, CAD.
-        # Thus, we will make an assumption that '$' alone will refer to US$ since
-        # if it is in AUD or CAD, the currency symbols 'A$' and 'C$' are usually
-        # used in job posts, respectively.
-        if currency_symbol != "C$" and len(results) == 1:
-            self.logger.debug("Found only one currency code {} associated with the "
-                              "given currency symbol {}".format(
-                                results[0]["cc"], currency_symbol))
-            return results[0]["cc"]
-        else:
-            # Two possible cases
-            # 1. Too many currency codes associated with the given currency symbol
-            # 2. It is not a valid currency symbol
-            if currency_symbol == "$":
-                # United States dollar
-                currency_code = "USD"
-            elif currency_symbol == "A$":
-                # Australian dollar
-                currency_code = "AUD"
-            elif currency_symbol == "C$":
-                # Canadian dollar
-                currency_code = "CAD"
-            elif currency_symbol == "£":
-                # We assume £ is always associated with the British pound
-                # However, it could have been EGP, FKP, GIP, ...
-                currency_code = "GBP"
-            elif currency_symbol == "kr":  # Danish krone
-                # Technically, 'kr' is a valid currency symbol for the Danish
-                # krone 'kr' is not recognized because `forex_python` uses 'Kr'
-                # as the currency symbol for the Danish krone.
-                currency_code = "DKK"
-            elif currency_symbol == "R":
-                # There are two possibilities of currency codes with the
-                # currency symbol 'R':
-                # Russian Ruble (RUB) or South African rand (ZAR)
-                # Check the current job post's country to determine which of
-                # the two currency codes to choose from
-                # TODO: test this part where the currency is Ruble (Russia)
-                ipdb.set_trace()
-                country = None
-                if self.session.data.job_locations:
-                    country = self.session.data.job_locations[0].country
-                if country is None:
-                    raise exc.NoCurrencyCodeError(
-                        "Could not get a currency code from '{}'".format(
-                            currency_symbol))
-                elif country == 'ZA':
-                    currency_code = 'ZAR'
-                elif country == 'RU':
-                    currency_code = "RUB"
-                else:
-                    raise exc.InvalidCountryError(
-                        "The country '{}' is invalid and a currency code could "
-                        "not be decided for the currency symbol 'R'".format(
-                            country))
-            else:
+        # NOTE: the disambiguation rules are applied in advance when building
+        # `currency_codes`, see `build_currency_codes_index()`
+        try:
+            currency_code = self.currency_codes[currency_symbol]
+        except KeyError:
+            # Not a currency symbol found in `currencies_data`. Check if it is
+            # not a currency code already (only known by `forex_python`) and
+            # remember the result for the next salaries
+            currency_code = \
+                currency_symbol if get_currency_name(currency_symbol) else None
+            self.currency_codes[currency_symbol] = currency_code
+        if isinstance(currency_code, dict):
+            # The currency code depends on the job post's country,
+            # e.g. the currency symbol 'R' is used for the Russian Ruble (RUB)
+            # and the South African rand (ZAR)
+            # TODO: test this part where the currency is Ruble (Russia)
+            country = None
+            if self.session.data.job_locations:
+                country = self.session.data.job_locations[0].country
+            if country is None:
                 raise exc.NoCurrencyCodeError(
                     "Could not get a currency code from '{}'".format(
                         currency_symbol))
-            return currency_code
+            elif country not in currency_code:
+                raise exc.InvalidCountryError(
+                    "The country '{}' is invalid and a currency code could "
+                    "not be decided for the currency symbol '{}'".format(
+                        country, currency_symbol))
+            currency_code = currency_code[country]
+        elif currency_code is None:
+            # Two possible cases
+            # 1. Too many currency codes associated with the given currency
+            #    symbol
+            # 2. It is not a valid currency symbol
+            raise exc.NoCurrencyCodeError(
+                "Could not get a currency code from '{}'".format(
+                    currency_symbol))
+        return currency_code
 
     # Get currency symbol located at the BEGINNING of the string `text`
     # e.g. '€42k - 75k'
@@ -1419,68 +1639,69 @@ class JobsScraper:
         return min_salary, max_salary
 
     def get_webpage(self, url):
-        current_delay = time.time() - self.last_request_time
-        diff_between_delays = \
-            current_delay - self.main_cfg['delay_between_requests']
-        if diff_between_delays < 0:
-            self.logger.debug("Waiting {} seconds before sending next HTTP "
-                             "request...".format(abs(diff_between_delays)))
-            time.sleep(abs(diff_between_delays))
-            self.logger.debug("Time is up! HTTP request will be sent.")
+        # Wait for the delay between requests to the same host to expire
+        waited = self.rate_limiter.wait(url)
+        if waited:
+            self.logger.debug("Waited {} seconds before sending the HTTP "
+                              "request to '{}'".format(waited, url))
         try:
             self.logger.debug("Sending HTTP request ...")
-            req = self.req_session.get(url, headers=self.headers,
-                                       timeout=self.main_cfg['http_get_timeout'])
+            with self.timer.stage('http_get'):
+                req, n_retries = self.transport.get(
+                    url, headers=self.headers,
+                    timeout=self.main_cfg['http_get_timeout'])
             html = req.text
         except OSError as e:
             raise OSError(e)
         else:
+            if n_retries:
+                self.logger.warning("The HTTP request to '{}' was retried {} "
+                                    "times".format(url, n_retries))
             if req.status_code == 404:
-                raise exc.PageNotFoundError(
+                raise exc.HTTP404Error(
                     "404 - PAGE NOT FOUND. The URL '{}' returned a 404 status "
                     "code.".format(url))
-        self.last_request_time = time.time()
+            if req.status_code in self.transport.retry_statuses:
+                raise exc.HTTPRetryableStatusError(
+                    "The URL '{}' still returned a {} status code after {} "
+                    "retries.".format(url, req.status_code, n_retries))
         self.logger.debug("Webpage retrieved!")
         return html
 
-    def is_a_us_state(self, name):
-        if self.us_states.get(name):
-            # `name` is a U.S. state
-            return True
-        else:
-            # `name` is not a U.S. state
-            return False
+    @staticmethod
+    # Returns: str, SHA-1 hexdigest of the webpage's HTML
+    def hash_webpage(html):
+        return hashlib.sha1(html.encode('utf-8')).hexdigest()
 
     # Load the cached webpage HTML if the webpage is found locally. If it isn't
     # found locally, then we will try to retrieve it with a GET request
-    def load_cached_webpage(self):
+    # IMPORTANT: this method is called by the fetch stage's threads. Thus, it
+    # must not access `self.session`.
+    # Returns: tuple (html, cached_webpage_filepath, webpage_accessed)
+    # Raises:
+    #   - WebPageNotFoundError by itself
+    def load_cached_webpage(self, job_post_id, url):
         html = ""
-        # File path where the webpage (only HTML) will be saved
-        cached_webpage_filepath = os.path.join(
-            self.cached_webpages_dirpath,
-            "{}.html".format(self.session.job_post_id))
-        url = self.session.url
+        cached_webpage_filepath = None
         # =====================================================================
         # 1st try: load the HTML page from cache
         # =====================================================================
-        if self.cached_webpages_dirpath:
+        if self.webpage_cache:
             try:
-                self.logger.debug("Reading the HTML file '{}' from cache".format(
-                    cached_webpage_filepath))
-                html = read_file(cached_webpage_filepath)
-            except OSError as e:
+                self.logger.debug("Reading the webpage '{}' from cache".format(
+                    self.webpage_cache.get_location(job_post_id)))
+                cached_webpage = self.webpage_cache.load(job_post_id)
+            except (OSError, sqlite3.Error, zlib.error) as e:
                 self.logger.exception(e)
             else:
-                self.logger.debug(
-                    "The cached webpage HTML is loaded from '{}'".format(
-                        cached_webpage_filepath))
-                # Get the webpage's datetime modified as the datetime the
-                # webpage was originally accessed
-                self.session.data.set_job_post(
-                    cached_webpage_filepath=cached_webpage_filepath,
-                    webpage_accessed=datetime.fromtimestamp(
-                        os.path.getmtime(cached_webpage_filepath)))
-                return html
+                if cached_webpage:
+                    # `cached_webpage` is a tuple (html,
+                    # cached_webpage_filepath, webpage_accessed)
+                    self.logger.debug(
+                        "The cached webpage HTML is loaded from '{}'".format(
+                            cached_webpage[1]))
+                    return cached_webpage
+                self.logger.debug("The webpage is not cached")
         else:
             self.logger.warning("The caching option is disabled")
 
@@ -1488,17 +1709,26 @@ class JobsScraper:
         # =====================================================================
         # 2nd try: get the webpage HTML with an HTTP request
         # =====================================================================
+        if self.mirror_url:
+            url = "{}/jobs/{}".format(self.mirror_url.rstrip('/'), job_post_id)
+            self.logger.debug("The webpage will be retrieved from the mirror "
+                              "@ '{}'".format(url))
         webpage_accessed = None
         try:
             html = self.get_webpage(url)
             # Get the datetime the webpage was retrieved (though not 100%
             # accurate)
             webpage_accessed = get_local_datetime()
-            if self.cached_webpages_dirpath:
-                self.save_webpage_locally(url, cached_webpage_filepath, html)
-        except (OSError, exc.HTTP404Error) as e:
+            if self.webpage_cache:
+                cached_webpage_filepath = self.save_webpage_locally(
+                    url, job_post_id, html, webpage_accessed)
+        except exc.HTTP404Error as e:
             # from `get_webpage()`
             raise exc.WebPageNotFoundError(e)
+        except (OSError, exc.HTTPRetryableStatusError) as e:
+            # from `get_webpage()`: transient error, the webpage can be
+            # retrieved again later (see `retry_queue`)
+            raise exc.WebPageUnavailableError(e)
         except exc.WebPageSavingError as e:
             # from `save_webpage_locally()`
             # IMPORTANT: even if the webpage couldn't be saved locally, the
@@ -1510,20 +1740,53 @@ class JobsScraper:
         else:
             self.logger.info("The webpage was saved in '{}'. URL is "
                              "'{}'".format(cached_webpage_filepath, url))
-        self.session.data.set_job_post(
-            cached_webpage_filepath=cached_webpage_filepath,
-            webpage_accessed=webpage_accessed)
-        return html
+        return html, cached_webpage_filepath, webpage_accessed
 
-    def save_webpage_locally(self, url, filepath, html):
+    # Load the webpage of an entry from the `entries` table. Used by the fetch
+    # stage.
+    def load_entry_webpage(self, entry):
+        job_post_id, _, _, url, _, _ = entry
+        with self.timer.stage('fetch'):
+            return self.load_cached_webpage(job_post_id, url)
+
+    # Returns: str, the location of the saved webpage (e.g. file path)
+    # Raises:
+    #   - WebPageSavingError by itself
+    def save_webpage_locally(self, url, job_post_id, html, webpage_accessed):
         try:
-            self.logger.debug("Saving webpage to '{}'".format(filepath))
-            write_file(filepath, html)
-        except OSError as e:
+            self.logger.debug("Saving webpage to '{}'".format(
+                self.webpage_cache.get_location(job_post_id)))
+            location = self.webpage_cache.save(job_post_id, html,
+                                               webpage_accessed)
+        except (OSError, sqlite3.Error) as e:
             raise exc.WebPageSavingError("the webpage @ '{}' will not be "
                                          "saved locally.".format(url))
         else:
             self.logger.debug("Webpage saved!")
+            return location
+
+    def create_scraping_state_table(self):
+        """
+        Creates the `scraping_state` table if it is not already in the database
+        (e.g. databases created before the table was added to the schema)
+
+        :return: None
+        """
+        sql = "CREATE TABLE IF NOT EXISTS scraping_state (" \
+              "job_post_id integer primary key not null references " \
+              "entries(job_post_id), last_scraped datetime, content_hash text)"
+        self.conn.execute(sql)
+
+    def select_content_hashes(self):
+        """
+        Returns all (job_post_id, content_hash) from the `scraping_state` table
+
+        :return:
+        """
+        sql = "SELECT job_post_id, content_hash FROM scraping_state"
+        cur = self.conn.cursor()
+        cur.execute(sql)
+        return cur.fetchall()
 
     def select_entries(self):
         """
@@ -1538,59 +1801,16 @@ class JobsScraper:
         cur.execute(sql)
         return cur.fetchall()
 
-    def standardize_country(self, country):
-        # TODO: automate this part here by using a translator service
-        # Converts a country name to the alpha2 code
-        invalid_country_log_msg = "The country '{}' is not a valid country. " \
-                                  "Instead, '{}' will be used as the " \
-                                  "alpha2 code."
-        # Return already the alpha2 code for those countries not recognized by
-        # `pycountry_convert`
-        if country == 'UK':
-            # UK' is not recognized by `pycountry_convert` as a valid
-            # country. 'United Kingdom' associated with the 'GB' alpha2 code are
-            # used instead
-            self.logger.debug(invalid_country_log_msg.format(country, 'GB'))
-            return 'GB'
-        elif country == 'Deutschland':
-            # 'Deutschland' (German for Germany) is not recognized by
-            # `pycountry_convert` as a valid country. 'Germany' associated with
-            # the 'DE' alpha2 code are used instead
-            self.logger.debug(invalid_country_log_msg.format(country, 'DE'))
-            return 'DE'
-        elif country == 'Österreich':
-            # 'Österreich' (German for Austria) is not recognized by
-            # `pycountry_convert` as a valid country. 'Austria' associated with
-            # the 'AT' alpha2 code are used instead
-            self.logger.debug(invalid_country_log_msg.format(country, 'AT'))
-            return 'AT'
-        elif country == 'Vereinigtes Königreich':
-            # 'Vereinigtes Königreich' (German for United Kingdom) is not
-            # recognized by `pycountry_convert` as a valid country.
-            # 'United Kingdom' associated with the 'GB' alpha2 code are used
-            # instead
-            self.logger.debug(invalid_country_log_msg.format(country, 'GB'))
-            return 'GB'
-        elif country == 'Schweiz':
-            # 'Schweiz' (German for Switzerland) is not recognized by
-            # `pycountry_convert` as a valid country. 'Switzerland' associated
-            # with the 'CH' alpha2 code are used instead
-            self.logger.debug(invalid_country_log_msg.format(country, 'CH'))
-            return 'CH'
-        elif country == 'Spanien':
-            # 'Spanien' (German for Spain) is not recognized by
-            # `pycountry_convert` as a valid country. 'Spain' associated with the
-            # 'ES' alpha2 code are used instead
-            self.logger.debug(invalid_country_log_msg.format(country, 'ES'))
-            return 'ES'
-        try:
-            alpha2 = country_name_to_country_alpha2(country)
-        except KeyError as e:
-            raise KeyError(e)
-        else:
-            self.logger.debug("The country '{}' will be updated to the standard "
-                              "name '{}'.".format(country, alpha2))
-            return alpha2
+    def update_scraping_state(self, scraping_states):
+        """
+        Inserts or replaces the (job_post_id, last_scraped, content_hash) in the
+        `scraping_state` table
+
+        :return: None
+        """
+        sql = "INSERT OR REPLACE INTO scraping_state (job_post_id, " \
+              "last_scraped, content_hash) VALUES (?, ?, ?)"
+        self.conn.executemany(sql, scraping_states)
 
     @staticmethod
     def str_to_date(str_date):
@@ -1626,6 +1846,42 @@ class JobsScraper:
             return items_list
 
 
+# Scraper used by each process of the pool, see `scrape_entries_in_processes()`
+_process_scraper = None
+
+
+def _init_scraper_process(main_cfg, logging_cfg):
+    global _process_scraper
+    lb = LoggingBoilerplate(__name__,
+                            __file__,
+                            os.getcwd(),
+                            logging_cfg)
+    _process_scraper = JobsScraper(main_cfg=main_cfg,
+                                   logging_cfg=logging_cfg,
+                                   logger=lb.get_logger())
+
+
+# `item` is a tuple (entry, known_hash), see `scrape_fetched_job_post()`
+# Returns: tuple (results, fetch_stats, timer, location_stats) where `results`
+#          is the tuple (skipped, session) whose session's BeautifulSoup object
+#          is dropped since it is not needed anymore by the main process, or
+#          None if the webpage didn't change since the last scraping.
+#          `fetch_stats` are the statistics of the GET requests sent for the
+#          entry, `timer` has the durations of its stages and `location_stats`
+#          are the hits and misses of the process' location memos for the entry.
+def _scrape_job_post_in_process(item):
+    entry, known_hash = item
+    webpage = completed_future(_process_scraper.load_entry_webpage, entry)
+    results = _process_scraper.scrape_fetched_job_post(entry, webpage,
+                                                       known_hash)
+    _process_scraper.session = None
+    if results is not None:
+        results[1].bs_obj = None
+    return results, _process_scraper.transport.stats.drain(), \
+        _process_scraper.timer.drain(), \
+        _process_scraper.location_normalizer.drain_cache_stats()
+
+
 if __name__ == '__main__':
     sb = ScriptBoilerplate(
         module_name=__name__,
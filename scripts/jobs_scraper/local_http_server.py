@@ -0,0 +1,62 @@
+"""
+Local HTTP stand-in for stackoverflow.com/jobs that serves the cached webpages
+(i.e. the `<job_post_id>.html` files). Any path of the form
+`/jobs/<job_post_id>[/...]` is answered with the file `<job_post_id>.html`.
+
+Usage: set `mirror_url: http://localhost:8000` in the scraper's main config and
+run:
+    $ python local_http_server.py ~/data/dev-jobs-insights/cache/webpages/stackoverflow_job_posts/
+"""
+import argparse
+import functools
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import os
+import re
+import threading
+
+
+class CachedWebpagesHandler(SimpleHTTPRequestHandler):
+    job_post_regex = re.compile(r"^/jobs/(\d+)")
+
+    def translate_path(self, path):
+        match = self.job_post_regex.match(path)
+        if match:
+            path = "/{}.html".format(match.group(1))
+        return super().translate_path(path)
+
+    def log_message(self, format, *args):
+        # Don't flood the console with one line per request
+        pass
+
+
+def start_server(dirpath, host='localhost', port=8000):
+    """
+    Start the server in a daemon thread and return it. Call `shutdown()` on
+    the returned server to stop it.
+
+    :return: ThreadingHTTPServer
+    """
+    handler = functools.partial(CachedWebpagesHandler,
+                                directory=os.path.expanduser(dirpath))
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Serve the cached webpages of job posts over HTTP.")
+    parser.add_argument("dirpath",
+                        help="Directory of the cached webpages")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("-p", "--port", type=int, default=8000)
+    args = parser.parse_args()
+    handler = functools.partial(CachedWebpagesHandler,
+                                directory=os.path.expanduser(args.dirpath))
+    with ThreadingHTTPServer((args.host, args.port), handler) as httpd:
+        print("Serving '{}' on http://{}:{}".format(
+            args.dirpath, args.host, args.port))
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
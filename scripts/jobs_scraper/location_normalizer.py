@@ -0,0 +1,243 @@
+import functools
+# Third-party modules
+from pycountry_convert import country_name_to_country_alpha2
+# Own modules
+import exc
+
+
+# Alpha2 codes of the country names not recognized by `pycountry_convert`
+# TODO: automate this part here by using a translator service
+COUNTRY_ALPHA2_CODES = {
+    # 'UK' is not recognized as a valid country. 'United Kingdom' associated
+    # with the 'GB' alpha2 code are used instead
+    'UK': 'GB',
+    # German for Germany
+    'Deutschland': 'DE',
+    # German for Austria
+    'Österreich': 'AT',
+    # German for United Kingdom
+    'Vereinigtes Königreich': 'GB',
+    # German for Switzerland
+    'Schweiz': 'CH',
+    # German for Spain
+    'Spanien': 'ES',
+}
+
+
+class LocationNormalizer:
+    def __init__(self, logger, us_states=None, cache_size=4096):
+        """
+        Normalization of the locations found in the job posts (location texts
+        and country names) with a bounded LRU memo: thousands of job posts
+        repeat the same few hundred locations, so each distinct location is
+        only normalized once (as long as it stays in the memo).
+
+        The failures (KeyError for an unknown country and
+        InvalidLocationTextError) are memoized too and raised again for each
+        call.
+
+        NOTE: the messages logged while normalizing a location are only logged
+        the first time the location is normalized
+
+        :param logger: logger
+        :param us_states: dict of the U.S. states where the keys are the USPS
+                          2-letter codes and the values are the names,
+                          e.g. 'AZ': 'Arizona'. Only needed by
+                          `process_location_text()`.
+        :param cache_size: maximum number of locations memoized per method. If
+                           None, the memo is unbounded.
+        """
+        self.logger = logger
+        self.us_states = us_states if us_states is not None else {}
+        self._memo_standardize_country = functools.lru_cache(
+            maxsize=cache_size)(self._catch(self._standardize_country))
+        self._memo_process_location_text = functools.lru_cache(
+            maxsize=cache_size)(self._catch(self._process_location_text))
+        # Hits and misses of each memo already returned by
+        # `drain_cache_stats()`
+        self._drained = {name: {'hits': 0, 'misses': 0}
+                         for name, _ in self._memos()}
+        # Statistics of the memos of other processes, see `merge_cache_stats()`
+        self._merged = {name: {'hits': 0, 'misses': 0, 'size': 0}
+                        for name, _ in self._memos()}
+
+    # Returns: str, the alpha2 code of the country, e.g. Finland --> FI
+    # Raises:
+    #   - KeyError if the country is not recognized
+    def standardize_country(self, country):
+        return self._get_memoized(self._memo_standardize_country, country)
+
+    # Returns: dict with the keys 'country' (alpha2 code) and optionally
+    #          'city' and 'region', e.g.
+    #          'Toronto, ON, Canada' --> {'city': 'Toronto', 'region': 'ON',
+    #                                     'country': 'CA'}
+    # Raises:
+    #   - KeyError by `standardize_country()`
+    #   - InvalidLocationTextError if the location text can't be decoded
+    def process_location_text(self, text):
+        # NOTE: a copy is returned since the memoized dict is shared by all the
+        # calls with the same text
+        return dict(self._get_memoized(self._memo_process_location_text, text))
+
+    def is_a_us_state(self, name):
+        if self.us_states.get(name):
+            # `name` is a U.S. state
+            return True
+        else:
+            # `name` is not a U.S. state
+            return False
+
+    # Returns: dict with the hits, misses, size and hit rate of the memo of
+    #          each method, including the statistics merged from the memos of
+    #          other processes (their size being the size of the largest memo)
+    def cache_stats(self):
+        stats = {}
+        for name, memo in self._memos():
+            info = memo.cache_info()
+            merged = self._merged[name]
+            hits = info.hits + merged['hits']
+            misses = info.misses + merged['misses']
+            n_calls = hits + misses
+            stats[name] = {'hits': hits,
+                           'misses': misses,
+                           'size': max(info.currsize, merged['size']),
+                           'max_size': info.maxsize,
+                           'hit_rate': hits / n_calls if n_calls else 0.0}
+        return stats
+
+    # Returns: dict with the hits and misses of the memo of each method since
+    #          the last call (along with the memo's current size), e.g. to be
+    #          sent by a worker process to the main process
+    def drain_cache_stats(self):
+        drained = {}
+        for name, memo in self._memos():
+            info = memo.cache_info()
+            last = self._drained[name]
+            drained[name] = {'hits': info.hits - last['hits'],
+                             'misses': info.misses - last['misses'],
+                             'size': info.currsize}
+            last['hits'] = info.hits
+            last['misses'] = info.misses
+        return drained
+
+    # Add the statistics returned by `drain_cache_stats()` of another process
+    # to the ones reported by `cache_stats()`
+    def merge_cache_stats(self, other_stats):
+        for name, other in other_stats.items():
+            merged = self._merged[name]
+            merged['hits'] += other['hits']
+            merged['misses'] += other['misses']
+            merged['size'] = max(merged['size'], other['size'])
+
+    # NOTE: the memos that were never used are not logged, e.g. the memo of
+    # `process_location_text()` when loading the job data
+    def log_cache_stats(self):
+        for name, stats in self.cache_stats().items():
+            if not stats['hits'] + stats['misses']:
+                continue
+            self.logger.info(
+                "Location memo `{}`: hit rate={:.1%} ({} hits, {} misses, "
+                "{}/{} entries)".format(
+                 name, stats['hit_rate'], stats['hits'], stats['misses'],
+                 stats['size'], stats['max_size']))
+
+    def _memos(self):
+        return [('standardize_country', self._memo_standardize_country),
+                ('process_location_text', self._memo_process_location_text)]
+
+    # The memoized function returns a tuple (value, error) so that the
+    # failures are memoized too
+    @staticmethod
+    def _catch(fn):
+        def wrapper(arg):
+            try:
+                return fn(arg), None
+            except (KeyError, exc.InvalidLocationTextError) as e:
+                return None, e
+        return wrapper
+
+    @staticmethod
+    def _get_memoized(memo, arg):
+        value, error = memo(arg)
+        if error is not None:
+            # NOTE: a new exception is raised each time so that the memoized
+            # one doesn't accumulate the tracebacks
+            raise type(error)(*error.args)
+        return value
+
+    def _standardize_country(self, country):
+        # Converts a country name to the alpha2 code
+        # Return already the alpha2 code for those countries not recognized by
+        # `pycountry_convert`
+        if country in COUNTRY_ALPHA2_CODES:
+            alpha2 = COUNTRY_ALPHA2_CODES[country]
+            self.logger.debug(
+                "The country '{}' is not a valid country. Instead, '{}' will "
+                "be used as the alpha2 code.".format(country, alpha2))
+            return alpha2
+        alpha2 = country_name_to_country_alpha2(country)
+        self.logger.debug("The country '{}' will be updated to the standard "
+                          "name '{}'.".format(country, alpha2))
+        return alpha2
+
+    def _process_location_text(self, text):
+        updated_values = {}
+        # The text where you find the location looks like this:
+        # '\n|\r\nNo office location                    '
+        # strip() removes the first newline and the right whitespaces.
+        # Then split('\n')[-1] extracts the location string. And the replace()
+        # will remove any spaces after the commas.
+        # e.g. 'Toronto, ON, Canada' --> 'Toronto,ON,Canada'
+        text = text.strip().split('|')[-1].strip().replace(', ', ',')
+        # Based on the number of commas, we can know if the text:
+        # - refers only to a country --> No comma, e.g. Canada
+        # - refers to a city and Country --> One commas, e.g. 'Bellevue, WA'
+        # - refers a city, region (state, province), country --> Two commas,
+        #       e.g. Toronto, ON, Canada
+        # - can't be decoded --> Zero and 3+ commas
+        if text.count(',') == 0:
+            self.logger.warning("No commas found in location text '{}'. We will "
+                                "assume that the location text '{}' refers to a "
+                                "country.".format(text, text))
+            # Save country, no more information can be extracted
+            updated_values['country'] = text
+        elif text.count(',') == 1:
+            # One comma in location text
+            # Example 1: 'Bellevue, WA'
+            # Example 2: 'Helsinki, Finland'
+            self.logger.debug(
+                "Found 1 comma in the location text '{}'".format(text))
+            # Save city and country
+            updated_values = dict(zip(['city', 'country'], text.split(',')))
+            # Do further processing on the country since it might refer in fact
+            # to a U.S. state, e.g. 'Bellevue, WA'. For U.S. jobs, the job
+            # posts don't specify the country as it is the case for job posts
+            # for other countries.
+            if self.is_a_us_state(updated_values['country']):
+                self.logger.debug("The location text '{}' refers to a place in the "
+                                  "US".format(text))
+                # Fix the location information: the country refers actually to
+                # a U.S. state, and save 'US' as the country
+                updated_values['region'] = updated_values['country']
+                updated_values['country'] = 'US'
+                # NOTE: No need to standardize the country name (like we do in
+                # the other cases) because it is already standard
+                return updated_values
+        elif text.count(',') == 2:
+            # Two commas in location text
+            # e.g. Toronto, ON, Canada
+            self.logger.debug(
+                "Found 2 commas in the location text '{}'".format(text))
+            updated_values = dict(zip(['city', 'region', 'country'],
+                                      text.split(',')))
+        else:
+            # Incorrect number of commas in location text. Thus we can't extract
+            # the location from the text. I haven't encounter this case yet, but
+            # we never know.
+            raise exc.InvalidLocationTextError(
+                "Invalid location text '{}'. Incorrect number of "
+                "commas.".format(text))
+        # Standardize the country, e.g. Finland -> FI
+        updated_values['country'] = self.standardize_country(
+            updated_values['country'])
+        return updated_values
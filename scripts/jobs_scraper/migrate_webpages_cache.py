@@ -0,0 +1,135 @@
+"""
+Migration of the 'files' webpages cache (one '<job_post_id>.html' file per job
+post) into the 'sqlite' webpages cache (see `webpage_cache.py`).
+
+The webpages already in the SQLite database are skipped, thus the migration
+can be interrupted and run again. The datetime modified of each HTML file is
+saved as the datetime the webpage was accessed, as done when the webpage is
+loaded from the 'files' cache.
+
+With `--check N`, N random webpages are then read from both caches: their
+contents must be equal and the read rates of both caches are reported.
+
+Usage:
+    $ python migrate_webpages_cache.py ~/data/dev-jobs-insights/cache/webpages/stackoverflow_job_posts/ ~/data/dev-jobs-insights/cache/webpages/stackoverflow_job_posts.sqlite --check 1000
+"""
+import argparse
+from datetime import datetime
+import os
+import random
+import re
+import time
+# Own modules
+from utilities.genutils import read_file
+from webpage_cache import FilesWebpageCache, SqliteWebpageCache
+
+
+_HTML_FILENAME_REGEX = re.compile(r"^(\d+)\.html$")
+
+
+# Yields tuples (job_post_id, filepath) of the HTML files in `dirpath`
+def scan_html_files(dirpath):
+    # NOTE: `os.scandir()` doesn't stat each file, unlike `os.listdir()` +
+    # `os.path.isfile()`
+    with os.scandir(dirpath) as it:
+        for dir_entry in it:
+            match = _HTML_FILENAME_REGEX.match(dir_entry.name)
+            if match and dir_entry.is_file():
+                yield int(match.group(1)), dir_entry.path
+
+
+# Returns: tuple (n_webpages, n_contents, n_bytes) where `n_bytes` is the total
+#          size of the migrated HTML files
+def migrate(files_paths, sqlite_cache, batch_size):
+    n_webpages = n_contents = n_bytes = 0
+    batch = []
+    for job_post_id, filepath in files_paths:
+        batch.append((job_post_id, read_file(filepath),
+                      datetime.fromtimestamp(os.path.getmtime(filepath))))
+        n_bytes += os.path.getsize(filepath)
+        if len(batch) == batch_size:
+            n_contents += sqlite_cache.save_many(batch)
+            n_webpages += len(batch)
+            batch = []
+            print("{} webpages migrated".format(n_webpages))
+    if batch:
+        n_contents += sqlite_cache.save_many(batch)
+        n_webpages += len(batch)
+    return n_webpages, n_contents, n_bytes
+
+
+# Returns: the read rate (in webpages/s) of the cache
+def time_reads(cache, job_post_ids):
+    start = time.perf_counter()
+    for job_post_id in job_post_ids:
+        cache.load(job_post_id)
+    return len(job_post_ids) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Migrate the HTML files of the webpages cache into a "
+                    "SQLite database of compressed webpages.")
+    parser.add_argument("dirpath",
+                        help="Directory of the cached webpages (HTML files)")
+    parser.add_argument("db_filepath",
+                        help="SQLite database of the compressed webpages "
+                             "(created if it doesn't exist)")
+    parser.add_argument("-l", "--compression_level", type=int, default=6,
+                        help="zlib compression level, from 1 (fastest) to 9 "
+                             "(smallest)")
+    parser.add_argument("-b", "--batch_size", type=int, default=1000,
+                        help="Number of webpages saved per transaction")
+    parser.add_argument("--check", type=int, default=0, metavar="N",
+                        help="Compare N random webpages read from both caches "
+                             "and report the read rates")
+    args = parser.parse_args()
+    dirpath = os.path.expanduser(args.dirpath)
+    db_filepath = os.path.expanduser(args.db_filepath)
+    files_cache = FilesWebpageCache(dirpath)
+    sqlite_cache = SqliteWebpageCache(db_filepath, args.compression_level)
+    # =========================================================================
+    # Migration
+    # =========================================================================
+    start = time.perf_counter()
+    migrated_ids = sqlite_cache.get_job_post_ids()
+    files_paths = list(scan_html_files(dirpath))
+    new_paths = [(job_post_id, filepath)
+                 for job_post_id, filepath in files_paths
+                 if job_post_id not in migrated_ids]
+    print("{} HTML files found, {} already migrated".format(
+        len(files_paths), len(files_paths) - len(new_paths)))
+    n_webpages, n_contents, n_bytes = migrate(new_paths, sqlite_cache,
+                                              args.batch_size)
+    duration = time.perf_counter() - start
+    # NOTE: closing the connections checkpoints the write-ahead log into the
+    # database file
+    sqlite_cache.close()
+    db_size = os.path.getsize(db_filepath)
+    print("{} webpages migrated ({} distinct contents) in {:.1f} s".format(
+        n_webpages, n_contents, duration))
+    if n_bytes:
+        print("HTML files: {:.1f} MB | SQLite database: {:.1f} MB | "
+              "ratio: {:.1f}x".format(n_bytes / 1e6, db_size / 1e6,
+                                      n_bytes / db_size))
+    # =========================================================================
+    # Check
+    # =========================================================================
+    if args.check and files_paths:
+        job_post_ids = random.sample([job_post_id
+                                      for job_post_id, _ in files_paths],
+                                     min(args.check, len(files_paths)))
+        n_diffs = 0
+        for job_post_id in job_post_ids:
+            html = sqlite_cache.load(job_post_id)
+            if html is None or html[0] != files_cache.load(job_post_id)[0]:
+                n_diffs += 1
+                print("job_post_id={}: different webpages".format(job_post_id))
+        print("{}/{} webpages different between both caches".format(
+            n_diffs, len(job_post_ids)))
+        for name, cache in [('files', files_cache), ('sqlite', sqlite_cache)]:
+            print("{:<8} random reads: {:8.1f} webpages/s".format(
+                name, time_reads(cache, job_post_ids)))
+        sqlite_cache.close()
+        if n_diffs:
+            raise SystemExit(1)
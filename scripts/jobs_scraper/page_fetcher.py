@@ -0,0 +1,135 @@
+import concurrent.futures
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=1):
+        """
+        Token bucket used to throttle the GET requests sent to a single host.
+
+        :param rate: number of tokens added per second
+        :param capacity: maximum number of tokens that can be accumulated, i.e.
+                         the size of the allowed burst of requests
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Returns: float, the number of seconds the caller waited for a token
+    def consume(self):
+        waited = 0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class HostRateLimiter:
+    def __init__(self, delay_between_requests, burst=1):
+        """
+        Per-host rate limiter: each host gets its own `TokenBucket` so that
+        requests sent to different hosts don't wait after each other.
+
+        :param delay_between_requests: minimum delay (in seconds) between two
+                                       requests sent to the same host
+        :param burst: number of requests that can be sent back-to-back to the
+                      same host
+        """
+        self.delay_between_requests = delay_between_requests
+        self.burst = burst
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        if not self.delay_between_requests:
+            return 0
+        host = urlparse(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(rate=1 / self.delay_between_requests,
+                                     capacity=self.burst)
+                self.buckets[host] = bucket
+        return bucket.consume()
+
+
+class PageFetcher:
+    def __init__(self, load_page, max_workers, max_in_flight=None):
+        """
+        Fetch stage of the scraper: webpages are loaded (from cache or with a
+        GET request) by a pool of threads while the results are consumed (i.e.
+        parsed) by the calling thread as soon as they arrive.
+
+        :param load_page: callable that receives an item (e.g. a row from the
+                          `entries` table) and returns its webpage
+        :param max_workers: number of threads loading the webpages
+        :param max_in_flight: maximum number of webpages being loaded or waiting
+                              to be consumed. It bounds the memory used by the
+                              fetched webpages if the consumer is slower than
+                              the fetching threads.
+        """
+        self.load_page = load_page
+        self.max_workers = max(1, max_workers)
+        if max_in_flight is None:
+            max_in_flight = 2 * self.max_workers
+        self.max_in_flight = max(self.max_workers, max_in_flight)
+
+    # Yields tuples (item, future) in order of completion. `future.result()`
+    # returns the webpage or re-raises the exception raised while loading it.
+    def fetch(self, items):
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers) as executor:
+            yield from bounded_map(executor, self.load_page, items,
+                                   self.max_in_flight)
+
+
+# Call `fn(*args)` right away and return its result (or the exception raised)
+# wrapped in a future, i.e. the same interface as the results of the fetch stage
+def completed_future(fn, *args):
+    future = concurrent.futures.Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+# Submit `fn(item)` for each item to the `executor` while keeping at most
+# `max_in_flight` items submitted and not yet consumed.
+# Yields tuples (item, future) in order of completion.
+def bounded_map(executor, fn, items, max_in_flight):
+    items = iter(items)
+    in_flight = {}
+
+    def submit_next():
+        try:
+            item = next(items)
+        except StopIteration:
+            return False
+        in_flight[executor.submit(fn, item)] = item
+        return True
+
+    while len(in_flight) < max_in_flight and submit_next():
+        pass
+    while in_flight:
+        done, _ = concurrent.futures.wait(
+            in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            item = in_flight.pop(future)
+            # Refill the pipeline before handing over the result so that the
+            # workers keep busy while it is being consumed
+            submit_next()
+            yield item, future
@@ -0,0 +1,134 @@
+"""
+Parsers of the job posts' webpages into the BeautifulSoup object used by the
+scraper to extract the job data.
+
+- 'full': the whole webpage is parsed into a BeautifulSoup tree
+- 'regions': the webpage is parsed with lxml only (a lot faster than building
+  a BeautifulSoup tree) and the BeautifulSoup tree is built only from the
+  regions of the webpage where the job data is extracted: the <header>, the
+  "About this job" items and the technologies of the overview, the high
+  response rate, the notice and the JSON linked data. The other parts of the
+  webpage (e.g. the job description) are dropped.
+
+The scraper's CSS selectors match the same tags in both trees, thus the same
+job data is extracted (see `compare_page_parsers.py`).
+
+The JSON linked data can also be extracted straight from the raw HTML, without
+parsing the webpage, see `extract_linked_data()`.
+"""
+import json
+import re
+# Third-party modules
+from bs4 import BeautifulSoup
+import lxml.etree
+import lxml.html
+
+
+PAGE_PARSERS = ['full', 'regions']
+# <script type="application/ld+json"> and its content. As for the HTML parsers,
+# the script ends at the first '</script'.
+_LINKED_DATA_REGEX = re.compile(
+    r"""<script\b[^>]*\btype\s*=\s*["']?application/ld\+json["']?[^>]*>"""
+    r"(.*?)</script", re.IGNORECASE | re.DOTALL)
+
+
+def _has_class(class_name):
+    return "contains(concat(' ', normalize-space(@class), ' '), ' {} ')".format(
+        class_name)
+
+
+# Regions of the webpage where the job data is extracted by the scraper's
+# selectors that don't depend on their ancestors, e.g.
+# 'header.job-details--header > div.grid--cell > h1.fs-headline1 > a'
+# NOTE: the regions are returned in document order
+_REGIONS_XPATH = lxml.etree.XPath(" | ".join([
+    "//header[{}]".format(_has_class('job-details--header')),
+    "//*[{}]".format(_has_class('-high-response')),
+    "//*[@type='application/ld+json']"]))
+# Items of the overview selected with
+# '#overview-items > .mb32 > .job-details--about > .grid--cell6 > .mb8' and
+# '#overview-items > .mb32 > div > a.job-link'. The other parts of the overview
+# (e.g. the job description) are dropped and the items are put back within the
+# same ancestors.
+_ABOUT_XPATH = lxml.etree.XPath(
+    "//*[@id='overview-items']/*[{}]/*[{}]".format(
+        _has_class('mb32'), _has_class('job-details--about')))
+_ABOUT_ANCESTORS = '<div id="overview-items"><div class="mb32">{}</div></div>'
+_JOB_LINKS_XPATH = lxml.etree.XPath(
+    "//*[@id='overview-items']/*[{}]/div/a[{}]".format(
+        _has_class('mb32'), _has_class('job-link')))
+_JOB_LINKS_ANCESTORS = ('<div id="overview-items"><div class="mb32"><div>{}'
+                        '</div></div></div>')
+# The notice is selected with 'body > div.container > div#content >
+# aside.s-notice'. Thus, it is put back within the same ancestors.
+_NOTICES_XPATH = lxml.etree.XPath(
+    "/html/body/div[{}]/div[@id='content']/aside[{}]".format(
+        _has_class('container'), _has_class('s-notice')))
+_NOTICES_ANCESTORS = ('<div class="container"><div id="content">{}</div>'
+                      '</div>')
+
+
+# Scan the raw HTML for the first <script type="application/ld+json"> and load
+# its JSON content, e.g. to process the linked data without parsing the webpage
+# Returns: dict of the linked data or None if the webpage has no linked data
+#          or if it is not valid JSON
+def extract_linked_data(html):
+    match = _LINKED_DATA_REGEX.search(html)
+    if match is None:
+        return None
+    try:
+        linked_data = json.loads(match.group(1))
+    except ValueError:
+        return None
+    return linked_data if isinstance(linked_data, dict) else None
+
+
+# Returns: BeautifulSoup object of the webpage `html` parsed with the given
+#          `parser`, one of `PAGE_PARSERS`
+def parse_webpage(html, parser='full'):
+    if parser == 'full':
+        return BeautifulSoup(html, 'lxml')
+    elif parser == 'regions':
+        return parse_webpage_regions(html)
+    raise ValueError("Invalid page parser '{}'. It must be one of {}".format(
+        parser, PAGE_PARSERS))
+
+
+# Returns: BeautifulSoup object of the regions of the webpage `html`
+def parse_webpage_regions(html):
+    try:
+        root = lxml.html.document_fromstring(html)
+    except (lxml.etree.ParserError, ValueError):
+        # e.g. empty webpage
+        return BeautifulSoup(html, 'lxml')
+    regions = _get_outermost(_REGIONS_XPATH(root))
+    abouts = _get_outermost(_ABOUT_XPATH(root))
+    job_links = _JOB_LINKS_XPATH(root)
+    notices = _NOTICES_XPATH(root)
+    return BeautifulSoup(
+        "<html><body>{}{}{}{}</body></html>".format(
+            _NOTICES_ANCESTORS.format(_to_string(notices)),
+            _to_string(regions),
+            _ABOUT_ANCESTORS.format(_to_string(abouts)),
+            _JOB_LINKS_ANCESTORS.format(_to_string(job_links))),
+        'lxml')
+
+
+# `elements` is a list of elements in document order
+# Returns: list of the elements that are not within another one of the
+#          elements, e.g. the high response rate within the <header> is already
+#          kept along with the <header>
+def _get_outermost(elements):
+    outermost = []
+    kept = set()
+    for element in elements:
+        if not any(ancestor in kept for ancestor in element.iterancestors()):
+            kept.add(element)
+            outermost.append(element)
+    return outermost
+
+
+def _to_string(elements):
+    return "".join(lxml.html.tostring(element, encoding='unicode',
+                                      with_tail=False)
+                   for element in elements)
@@ -0,0 +1,65 @@
+"""
+Checkpoints of the scraping runs so that a run that crashed or was interrupted
+can be resumed instead of started over.
+
+A checkpoint is saved in the run's directory (where its sessions are saved) as
+'checkpoint.json' with:
+- 'job_post_ids': the job_post_ids of the job posts whose sessions were saved
+- 'writer': the state of the `SessionWriter` (see `SessionWriter.checkpoint()`)
+- 'counters': the counters reported at the end of the run, e.g. 'n_skipped'
+- 'n_rows': the total number of entries of the run
+- 'completed': True once the run is finished
+"""
+import json
+import os
+import re
+
+
+CHECKPOINT_FILENAME = 'checkpoint.json'
+# The runs' directories are named '%Y%m%d-%H%M%S-scraped_job_data'
+_RUN_DIRNAME_REGEX = re.compile(r"^\d{8}-\d{6}-scraped_job_data$")
+
+
+# Save the checkpoint atomically, i.e. a crash while saving it leaves the
+# previous checkpoint as it was
+# Raises:
+#   - OSError
+def save_checkpoint(run_dirpath, checkpoint):
+    filepath = os.path.join(run_dirpath, CHECKPOINT_FILENAME)
+    tmp_filepath = filepath + '.tmp'
+    with open(tmp_filepath, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_filepath, filepath)
+
+
+# Returns: dict, the checkpoint of the run or None if there is none
+# Raises:
+#   - OSError and ValueError if the checkpoint can't be read
+def load_checkpoint(run_dirpath):
+    filepath = os.path.join(run_dirpath, CHECKPOINT_FILENAME)
+    if not os.path.isfile(filepath):
+        return None
+    with open(filepath, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Returns: str, the directory of the last run if it can be resumed (i.e. it has
+#          a checkpoint and it didn't complete), else None
+def find_resumable_run(scraped_job_data_dirpath):
+    if not os.path.isdir(scraped_job_data_dirpath):
+        return None
+    run_dirnames = sorted(dirname
+                          for dirname in os.listdir(scraped_job_data_dirpath)
+                          if _RUN_DIRNAME_REGEX.match(dirname))
+    if not run_dirnames:
+        return None
+    run_dirpath = os.path.join(scraped_job_data_dirpath, run_dirnames[-1])
+    try:
+        checkpoint = load_checkpoint(run_dirpath)
+    except (OSError, ValueError):
+        return None
+    if checkpoint is None or checkpoint['completed']:
+        return None
+    return run_dirpath
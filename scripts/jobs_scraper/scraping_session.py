@@ -4,6 +4,16 @@ class ScrapingSession:
         self.url = url
         self.data = data
         self.bs_obj = None
+        # Hash of the webpage's content, see `JobsScraper.hash_webpage()`
+        self.content_hash = None
+        # True if the job post took the linked data fast path (i.e. only the
+        # regions of the webpage were parsed), False if the webpage was parsed
+        # with the configured page parser and None if the webpage couldn't be
+        # loaded
+        self.linked_data_fast_path = None
+        # True if the webpage couldn't be retrieved because of a transient
+        # error, i.e. the job post can be scraped again later
+        self.webpage_unavailable = False
 
     def reset(self):
         for k, v in self.__dict__.items():
@@ -0,0 +1,193 @@
+import itertools
+import json
+import os
+import pickle
+import re
+# Own modules
+from job_data import JobData
+
+
+# Extensions of the chunk files, keyed by file format
+FILE_EXTENSIONS = {'jsonl': 'jsonl', 'pickle': 'pkl'}
+# NOTE: the same encoder is used for all the records instead of `json.dumps()`
+# which sets up a new encoder at each call
+_json_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+class SessionWriter:
+    def __init__(self, dirpath, split_size, logger, file_format='jsonl'):
+        """
+        Streaming writer of the scraping sessions: each session is saved as
+        soon as it is finished so that the scraper doesn't need to keep all the
+        sessions in memory.
+
+        The sessions are saved in chunk files of at most `split_size` sessions.
+        A chunk file is named 'all_sessions-{start}-{end}.{ext}' once it is
+        complete. While being written, it is named
+        'all_sessions-{start}.{ext}.part'.
+
+        Two file formats are supported:
+        - 'jsonl': JSON Lines, one line per record of the job data as returned
+          by `JobData.to_records()`. The records of a job post are saved
+          consecutively.
+        - 'pickle': a stream of pickled tuples (job_post_id, session)
+
+        :param dirpath: directory where the chunk files are saved
+        :param split_size: maximum number of sessions per chunk file
+        :param logger: logger
+        :param file_format: 'jsonl' or 'pickle'
+        """
+        assert file_format in FILE_EXTENSIONS, \
+            "`file_format` must be one of {}".format(list(FILE_EXTENSIONS))
+        self.dirpath = dirpath
+        self.split_size = split_size
+        self.logger = logger
+        self.file_format = file_format
+        self.extension = FILE_EXTENSIONS[file_format]
+        self.file = None
+        self.filepath = None
+        # Index of the first session saved in the current chunk file
+        self.start_index = 0
+        # Total number of sessions saved
+        self.n_sessions = 0
+        # Names of the chunk files: group 1 is the index of the first session
+        # and group 2 is None if the chunk is not complete
+        self._chunk_filename_regex = re.compile(
+            r"^all_sessions-(\d+)(-\d+)?\.{}(\.part)?$".format(
+                re.escape(self.extension)))
+
+    # Raises:
+    #   - OSError and pickle.PicklingError by pickle.dump()
+    #   - OSError and TypeError by json.dumps()
+    def write(self, job_post_id, session):
+        if self.file is None:
+            self._open_chunk()
+        if self.file_format == 'jsonl':
+            self.file.write(dump_records(session.data.to_records()))
+        else:
+            # The BeautifulSoup object is not needed anymore once the job post
+            # is processed and it is by far the biggest (and deepest) object of
+            # the session
+            session.bs_obj = None
+            pickle.dump((job_post_id, session), self.file,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        self.n_sessions += 1
+        if self.n_sessions - self.start_index == self.split_size:
+            self._close_chunk()
+
+    def close(self):
+        if self.file is not None:
+            self._close_chunk()
+
+    # Flush the sessions written so far to disk
+    # Returns: dict, the state of the writer to be given to `restore()`
+    # Raises:
+    #   - OSError
+    def checkpoint(self):
+        part_size = 0
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            part_size = os.path.getsize(self.filepath)
+        return {'n_sessions': self.n_sessions,
+                'start_index': self.start_index,
+                'part_size': part_size}
+
+    # Restore the writer (and its chunk files) as it was when `checkpoint()`
+    # returned `state`, i.e. the sessions written after the checkpoint are
+    # discarded. The next sessions are appended to the current chunk file.
+    # Raises:
+    #   - OSError
+    def restore(self, state):
+        self.n_sessions = state['n_sessions']
+        self.start_index = state['start_index']
+        part_filepath = self._get_part_filepath()
+        for filename in sorted(os.listdir(self.dirpath)):
+            match = self._chunk_filename_regex.match(filename)
+            if not match or int(match.group(1)) < self.start_index:
+                continue
+            filepath = os.path.join(self.dirpath, filename)
+            if int(match.group(1)) == self.start_index and match.group(2):
+                # The current chunk was completed after the checkpoint
+                os.replace(filepath, part_filepath)
+            elif filepath != part_filepath:
+                # Chunk started after the checkpoint
+                os.remove(filepath)
+        if state['part_size']:
+            with open(part_filepath, 'r+b') as f:
+                f.truncate(state['part_size'])
+            self._open_chunk(append=True)
+        elif os.path.exists(part_filepath):
+            os.remove(part_filepath)
+        self.logger.info("Sessions writer restored: {} sessions already "
+                         "saved".format(self.n_sessions))
+
+    def _get_part_filepath(self):
+        return os.path.join(
+            self.dirpath,
+            'all_sessions-{}.{}.part'.format(self.start_index, self.extension))
+
+    def _open_chunk(self, append=False):
+        self.filepath = self._get_part_filepath()
+        mode = 'a' if append else 'w'
+        if self.file_format == 'jsonl':
+            self.file = open(self.filepath, mode, encoding='utf-8')
+        else:
+            self.file = open(self.filepath, mode + 'b')
+
+    def _close_chunk(self):
+        self.file.close()
+        end_index = self.n_sessions - 1
+        filepath = os.path.join(
+            self.dirpath,
+            'all_sessions-{}-{}.{}'.format(self.start_index, end_index,
+                                           self.extension))
+        os.replace(self.filepath, filepath)
+        self.logger.info("Sessions data, parts {}-{}, saved in "
+                         "{}".format(self.start_index, end_index, filepath))
+        self.file = None
+        self.filepath = None
+        self.start_index = self.n_sessions
+
+
+# Returns: str, the records as JSON Lines
+def dump_records(records):
+    return "".join(_json_encoder.encode(record) + "\n" for record in records)
+
+
+# Returns: generator of tuples (job_post_id, session)
+# Both formats of pickle files are supported: a stream of pickled tuples
+# (job_post_id, session) as saved by `SessionWriter` and the older format where
+# the whole chunk is a pickled dict {job_post_id: session}
+def load_sessions(filepath):
+    with open(filepath, 'rb') as f:
+        while True:
+            try:
+                data = pickle.load(f)
+            except EOFError:
+                break
+            if isinstance(data, dict):
+                yield from data.items()
+            else:
+                yield data
+
+
+# Returns: generator of tuples (job_post_id, records) where `records` is the
+# list of records of a job post as saved in a JSON Lines chunk file
+def load_records(filepath):
+    with open(filepath, encoding='utf-8') as f:
+        records = map(json.loads, f)
+        for job_post_id, job_post_records in itertools.groupby(
+                records, key=lambda record: record['job_post_id']):
+            yield job_post_id, list(job_post_records)
+
+
+# Returns: generator of tuples (job_post_id, job_data) from a chunk file of any
+# format (based on its extension)
+def load_job_data(filepath, logger=None):
+    if filepath.endswith('.jsonl'):
+        for job_post_id, records in load_records(filepath):
+            yield job_post_id, JobData.from_records(job_post_id, records, logger)
+    else:
+        for job_post_id, session in load_sessions(filepath):
+            yield job_post_id, session.data
@@ -0,0 +1,141 @@
+import json
+import threading
+import time
+# Own modules
+from http_transport import percentile
+
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+# Shared by all the stages when the timer is disabled, i.e. nothing is
+# allocated nor timed
+_NULL_STAGE = _NullStage()
+
+
+class StageTimer:
+    def __init__(self, enabled=False):
+        """
+        Timing of the stages of the scraper's pipeline (e.g. fetch, parse,
+        processing of the <header>), used as a context manager around each
+        stage:
+
+            with timer.stage('parse'):
+                ...
+
+        The duration of each call is kept so that the percentiles of each stage
+        can be reported. If the timer is disabled, `stage()` returns a shared
+        no-op context manager.
+
+        NOTE: the stages can be timed from several threads (e.g. the fetch
+        stage) and some stages are nested (e.g. the currency conversion is done
+        while processing the <header>). Thus, the totals of the stages don't
+        add up to the duration of the run.
+
+        :param enabled: if False, nothing is timed
+        """
+        self.enabled = enabled
+        self.durations = {}
+        self.lock = threading.Lock()
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def add(self, name, duration):
+        with self.lock:
+            self.durations.setdefault(name, []).append(duration)
+
+    # Add the durations timed somewhere else, e.g. in another process
+    def merge(self, other):
+        with self.lock:
+            for name, durations in other.durations.items():
+                self.durations.setdefault(name, []).extend(durations)
+
+    # Returns: StageTimer with the durations timed so far, which are then reset
+    def drain(self):
+        drained = StageTimer(self.enabled)
+        with self.lock:
+            drained.durations = self.durations
+            self.durations = {}
+        return drained
+
+    # Returns: dict with the stages' names as keys and dicts with their count,
+    #          total, mean, p50, p95, p99 and max durations (in seconds) as
+    #          values. The stages are sorted by decreasing total duration.
+    def summary(self):
+        with self.lock:
+            stages = {name: sorted(durations)
+                      for name, durations in self.durations.items()}
+        summary = {}
+        for name, durations in sorted(stages.items(),
+                                      key=lambda item: -sum(item[1])):
+            total = sum(durations)
+            summary[name] = {'count': len(durations),
+                             'total': total,
+                             'mean': total / len(durations),
+                             'p50': percentile(durations, 50),
+                             'p95': percentile(durations, 95),
+                             'p99': percentile(durations, 99),
+                             'max': durations[-1]}
+        return summary
+
+    # Returns: str, the summary as a table with the durations in milliseconds
+    #          (the totals in seconds)
+    def format_summary(self, run_duration=None):
+        lines = ["{:<24} {:>8} {:>10} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+            'stage', 'count', 'total (s)', 'mean', 'p50', 'p95', 'p99', 'max')]
+        for name, stats in self.summary().items():
+            lines.append(
+                "{:<24} {:>8} {:>10.3f} {:>9.3f} {:>9.3f} {:>9.3f} {:>9.3f} "
+                "{:>9.3f}".format(name, stats['count'], stats['total'],
+                                  *(stats[key] * 1000
+                                    for key in ['mean', 'p50', 'p95', 'p99',
+                                                'max'])))
+        if run_duration is not None:
+            lines.append("run duration: {:.3f} s".format(run_duration))
+        return "\n".join(lines)
+
+    # Save the summary as JSON (durations in seconds)
+    # Raises:
+    #   - OSError
+    def save_profile(self, filepath, run_duration=None):
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump({'run_duration': run_duration,
+                       'stages': self.summary()}, f, indent=2)
+
+    # NOTE: the lock can't be pickled, e.g. when the durations are sent back
+    # from the processes of `parse_workers`
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
@@ -0,0 +1,192 @@
+from datetime import datetime
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+# Own modules
+from utilities.genutils import read_file, write_file
+
+
+WEBPAGE_CACHE_BACKENDS = ['files', 'sqlite']
+
+
+class FilesWebpageCache:
+    def __init__(self, dirpath):
+        """
+        Cache of the job posts' webpages where each webpage (only HTML) is
+        saved in its own file '<job_post_id>.html'.
+
+        :param dirpath: directory of the HTML files
+        """
+        self.dirpath = dirpath
+
+    def get_location(self, job_post_id):
+        return os.path.join(self.dirpath, "{}.html".format(job_post_id))
+
+    def contains(self, job_post_id):
+        return os.path.isfile(self.get_location(job_post_id))
+
+    # Returns: tuple (html, cached_webpage_filepath, webpage_accessed) or None
+    #          if the webpage is not cached
+    # Raises:
+    #   - OSError by read_file()
+    def load(self, job_post_id):
+        filepath = self.get_location(job_post_id)
+        if not os.path.isfile(filepath):
+            return None
+        html = read_file(filepath)
+        # Get the webpage's datetime modified as the datetime the webpage was
+        # originally accessed
+        webpage_accessed = datetime.fromtimestamp(os.path.getmtime(filepath))
+        return html, filepath, webpage_accessed
+
+    # Returns: str, the file path of the saved webpage
+    # Raises:
+    #   - OSError by write_file()
+    def save(self, job_post_id, html, webpage_accessed=None):
+        filepath = self.get_location(job_post_id)
+        write_file(filepath, html)
+        return filepath
+
+    def close(self):
+        pass
+
+
+class SqliteWebpageCache:
+    def __init__(self, db_filepath, compression_level=6):
+        """
+        Cache of the job posts' webpages packed in a single SQLite database
+        instead of one HTML file per job post (i.e. no millions of small files
+        to scan).
+
+        The webpages are content-addressed: the `contents` table has the
+        zlib-compressed HTML of each distinct webpage keyed by its SHA-1 hash
+        and the `webpages` table maps each job_post_id to the hash of its
+        webpage along with the datetime the webpage was accessed. A webpage is
+        read with a single lookup on the primary keys.
+
+        NOTE: the cache is used by the fetch stage's threads. Thus, each thread
+        gets its own connection to the database.
+
+        :param db_filepath: file path of the SQLite database
+        :param compression_level: zlib compression level, from 1 (fastest) to
+                                  9 (smallest)
+        """
+        self.db_filepath = db_filepath
+        self.compression_level = compression_level
+        self._local = threading.local()
+        self._conns = []
+        self._lock = threading.Lock()
+        self._create_tables()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # NOTE: `timeout` is how long a connection waits for another one
+            # (e.g. of another thread) to release its lock on the database.
+            # Each connection is only used by its thread but they are all
+            # closed by the thread calling `close()`.
+            conn = sqlite3.connect(self.db_filepath, timeout=30,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def _create_tables(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS contents (
+                                content_hash    text primary key not null,
+                                html            blob not null)''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS webpages (
+                                job_post_id     integer primary key not null,
+                                content_hash    text not null
+                                    references contents(content_hash),
+                                accessed        datetime)''')
+
+    def get_location(self, job_post_id):
+        return "{}#{}".format(self.db_filepath, job_post_id)
+
+    def contains(self, job_post_id):
+        cur = self._connect().execute(
+            "SELECT 1 FROM webpages WHERE job_post_id = ?", (job_post_id,))
+        return cur.fetchone() is not None
+
+    # Returns: set of the job_post_ids whose webpages are cached
+    def get_job_post_ids(self):
+        cur = self._connect().execute("SELECT job_post_id FROM webpages")
+        return set(row[0] for row in cur)
+
+    # Returns: tuple (html, cached_webpage_filepath, webpage_accessed) or None
+    #          if the webpage is not cached. `cached_webpage_filepath` is of
+    #          the form '<db_filepath>#<job_post_id>'.
+    # Raises:
+    #   - sqlite3.Error
+    #   - zlib.error if the compressed HTML is corrupted
+    def load(self, job_post_id):
+        cur = self._connect().execute(
+            '''SELECT contents.html, webpages.accessed
+               FROM webpages JOIN contents USING (content_hash)
+               WHERE webpages.job_post_id = ?''', (job_post_id,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        html = zlib.decompress(row[0]).decode('utf-8')
+        webpage_accessed = datetime.fromisoformat(row[1]) if row[1] else None
+        return html, self.get_location(job_post_id), webpage_accessed
+
+    # Returns: str, the location of the saved webpage, see `load()`
+    # Raises:
+    #   - sqlite3.Error
+    def save(self, job_post_id, html, webpage_accessed=None):
+        self.save_many([(job_post_id, html, webpage_accessed)])
+        return self.get_location(job_post_id)
+
+    # Save many webpages in a single transaction
+    # `webpages` is a list of tuples (job_post_id, html, webpage_accessed)
+    # Returns: int, number of new distinct webpages' contents saved
+    # Raises:
+    #   - sqlite3.Error
+    def save_many(self, webpages):
+        contents = {}
+        rows = []
+        for job_post_id, html, webpage_accessed in webpages:
+            data = html.encode('utf-8')
+            content_hash = hashlib.sha1(data).hexdigest()
+            if content_hash not in contents:
+                contents[content_hash] = zlib.compress(
+                    data, self.compression_level)
+            rows.append((job_post_id, content_hash,
+                         webpage_accessed.isoformat()
+                         if webpage_accessed else None))
+        conn = self._connect()
+        with conn:
+            cur = conn.executemany(
+                "INSERT OR IGNORE INTO contents VALUES (?, ?)",
+                list(contents.items()))
+            n_contents = cur.rowcount
+            conn.executemany("INSERT OR REPLACE INTO webpages VALUES (?, ?, ?)",
+                             rows)
+        return n_contents
+
+    def close(self):
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+        self._local = threading.local()
+
+
+# Returns: the webpage cache of the given backend, one of
+#          `WEBPAGE_CACHE_BACKENDS`
+def open_webpage_cache(backend, dirpath=None, db_filepath=None,
+                       compression_level=6):
+    if backend == 'files':
+        return FilesWebpageCache(dirpath)
+    elif backend == 'sqlite':
+        return SqliteWebpageCache(db_filepath, compression_level)
+    raise ValueError("Invalid webpage cache backend '{}'. It must be one of "
+                     "{}".format(backend, WEBPAGE_CACHE_BACKENDS))
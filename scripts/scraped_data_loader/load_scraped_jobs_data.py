@@ -1,7 +1,10 @@
 import argparse
+import concurrent.futures
+import functools
 import glob
 import os
 import sys
+import time
 # Third-party modules
 import ipdb
 from sqlalchemy import create_engine
@@ -9,8 +12,13 @@ from sqlalchemy.engine.url import URL
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
 # Own modules
+from job_data import JobData, RECORD_TABLES
+from location_normalizer import LocationNormalizer
+from page_fetcher import bounded_map, completed_future
+from session_writer import load_job_data, load_records
 from tables import Base
-from utilities.genutils import load_pickle, read_yaml_config
+from utilities.genutils import read_yaml_config
+from utilities.logging_boilerplate import LoggingBoilerplate
 from utilities.script_boilerplate import ScriptBoilerplate
 
 
@@ -162,12 +170,309 @@ def cleanup_job_locations(job_locations):
         return job_locations
 
 
+def cleanup_job_data(job_data, data_cleanup_options):
+    if data_cleanup_options['industries']:
+        logger.debug("Clean up of industries")
+        job_data.industries = cleanup_industries(job_data.industries)
+        job_data.job_post.industries = job_data.industries
+        logger.debug(
+            "Industries to be added: {}".format(
+             [i.__str__() for i in job_data.industries]))
+    if data_cleanup_options['job_locations']:
+        logger.debug("Clean up of job locations")
+        # IMPORTANT: if I only update `job_data.job_locations`, the cleanup job
+        # locations are not reflected in the database. I need to also update
+        # `job_data.job_post.job_locations`.
+        job_data.job_locations = cleanup_job_locations(job_data.job_locations)
+        job_data.job_post.job_locations = job_data.job_locations
+        logger.debug(
+            "Job locations to be added: {}".format(
+             [l.__str__() for l in job_data.job_locations]))
+        if len(job_data.job_locations) > 1:
+            logger.warning(
+                "[MoreThanOneLocationWarning] There are {} locations".format(
+                 len(job_data.job_locations)))
+
+
+# Standardize the country of a job location with the memoized normalizer
+# shared with the scraper, e.g. 'Deutschland' --> 'DE'. The countries that
+# can't be standardized (e.g. the ones already saved as alpha2 codes or
+# 'No office location') are left as they are.
+def standardize_country(location_normalizer, country):
+    if country is None:
+        return country
+    try:
+        return location_normalizer.standardize_country(country)
+    except KeyError:
+        return country
+
+
+# SQLite pragmas set for the duration of the bulk load
+# NOTE: with `synchronous=NORMAL` in WAL mode, a power loss can lose the last
+# transactions but can't corrupt the database
+BULK_LOAD_PRAGMAS = {'journal_mode': 'WAL', 'synchronous': 'NORMAL'}
+
+
+# Values used for the columns missing from a record (its empty columns), keyed
+# by tablename. The columns with a default (e.g. `job_post_removed`) get the
+# same value as when they are inserted through the ORM.
+# NOTE: all the rows inserted in the same `executemany` must have the same
+# columns
+_COLUMN_DEFAULTS = {
+    tablename: {column.name: column.default.arg
+                if column.default is not None else None
+                for column in table.__table__.columns
+                if not column.primary_key or tablename == 'job_posts'}
+    for tablename, table in RECORD_TABLES.items()}
+
+# Non-nullable columns (except the primary keys), keyed by tablename
+_NOT_NULL_COLUMNS = {
+    tablename: [column.name for column in table.__table__.columns
+                if not column.nullable and not column.primary_key]
+    for tablename, table in RECORD_TABLES.items()}
+
+
+# Returns: generator of tuples (job_post_id, records) from a chunk file of any
+# format, see `JobData.to_records()`
+def load_job_post_records(filepath, data_cleanup_options):
+    if filepath.endswith('.jsonl') \
+            and not data_cleanup_options['industries'] \
+            and not data_cleanup_options['job_locations']:
+        # Fast path: the records are inserted as they are read
+        yield from load_records(filepath)
+    else:
+        # The data cleanup works on the table instances
+        for job_post_id, job_data in load_job_data(filepath):
+            cleanup_job_data(job_data, data_cleanup_options)
+            yield job_post_id, job_data.to_records()
+
+
+# Convert the records of a job post into rows ready to be inserted, grouped by
+# tablename
+# Returns: dict
+def get_job_post_rows(records):
+    rows = {}
+    for record in records:
+        tablename = record['table']
+        row = dict(_COLUMN_DEFAULTS[tablename])
+        row.update(JobData.record_to_columns(record))
+        rows.setdefault(tablename, []).append(row)
+    return rows
+
+
+# The company's `id` is assigned by the writer (instead of by the database) so
+# that the job post can reference it
+def set_company_id(rows, company_id):
+    for row in rows.get('companies', []):
+        row['id'] = company_id
+    for row in rows.get('job_posts', []):
+        row['company_id'] = company_id
+
+
+# Check the NOT NULL constraints of the rows before they are inserted so that a
+# single job post doesn't fail a whole batch
+# Raises:
+#   - ValueError if a non-nullable column is empty
+def check_not_null(rows):
+    for tablename, table_rows in rows.items():
+        for column_name in _NOT_NULL_COLUMNS[tablename]:
+            for row in table_rows:
+                if row[column_name] is None:
+                    raise ValueError(
+                        "NOT NULL constraint failed: {}.{}".format(
+                         tablename, column_name))
+
+
+# Insert the rows of a batch of job posts in a single transaction, with one
+# `executemany` per table
+def insert_rows(conn, batch_rows):
+    with conn.begin():
+        # IMPORTANT: the tables are inserted in the order of `RECORD_TABLES`,
+        # i.e. `companies` first, then `job_posts` and then the other tables
+        for tablename, table in RECORD_TABLES.items():
+            table_rows = [row for rows in batch_rows
+                          for row in rows.get(tablename, [])]
+            if table_rows:
+                conn.execute(table.__table__.insert(), table_rows)
+
+
+def flush_batch(conn, batch):
+    try:
+        insert_rows(conn, [rows for _, rows in batch])
+    except IntegrityError as e:
+        # The whole batch is rolled back. Thus, the job posts are inserted one
+        # at a time to only skip the faulty ones.
+        logger.exception(e)
+        logger.warning("The batch of {} job posts will be inserted one job post "
+                       "at a time".format(len(batch)))
+        n_inserted = 0
+        for job_post_id, rows in batch:
+            try:
+                insert_rows(conn, [rows])
+            except IntegrityError as e:
+                logger.exception(e)
+                logger.error("The job data for job_post_id={} couldn't be "
+                             "added".format(job_post_id))
+            else:
+                n_inserted += 1
+        return n_inserted
+    else:
+        return len(batch)
+
+
+def get_sqlite_pragmas(conn, pragmas):
+    return {name: conn.execute("PRAGMA {}".format(name)).scalar()
+            for name in pragmas}
+
+
+def set_sqlite_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute("PRAGMA {}={}".format(name, value))
+        logger.debug("PRAGMA {}={}".format(name, value))
+
+
+# Decode stage of the bulk load: a chunk file is loaded, cleaned up and
+# converted into rows ready to be inserted. It is run by the decoding processes.
+# Returns: list of tuples (job_post_id, rows, error) where `error` is the
+#          message of the NOT NULL constraint failed by the rows, or None
+def decode_chunk(filepath, data_cleanup_options):
+    job_posts = []
+    for job_post_id, records in load_job_post_records(filepath,
+                                                      data_cleanup_options):
+        rows = get_job_post_rows(records)
+        try:
+            check_not_null(rows)
+        except ValueError as e:
+            job_posts.append((job_post_id, rows, str(e)))
+        else:
+            job_posts.append((job_post_id, rows, None))
+    return job_posts
+
+
+# Yields tuples (filepath, future) where `future.result()` returns the decoded
+# chunk (see `decode_chunk()`) or re-raises the exception raised while
+# decoding it. If `decode_workers` is not 0, the chunks are decoded in parallel
+# by a pool of processes with at most `max_chunks_in_flight` decoded chunks
+# waiting for the writer (backpressure), and they are yielded in order of
+# completion.
+def decode_chunks(filepaths, data_cleanup_options, decode_workers,
+                  max_chunks_in_flight, logging_cfg):
+    decode = functools.partial(decode_chunk,
+                               data_cleanup_options=data_cleanup_options)
+    if decode_workers:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=decode_workers,
+                initializer=_init_decode_process,
+                initargs=(logging_cfg,)) as executor:
+            yield from bounded_map(
+                executor, decode, filepaths,
+                max_in_flight=max(decode_workers, max_chunks_in_flight))
+    else:
+        for filepath in filepaths:
+            yield filepath, completed_future(decode, filepath)
+
+
+# Bulk load of the scraped job data: the job posts are inserted in batches of
+# `batch_size` job posts with SQLAlchemy Core (one `executemany` per table),
+# each batch in its own transaction. Compared to adding the job posts one at a
+# time through the ORM, there is no ORM overhead and a lot less transactions.
+# The chunk files are decoded by `decode_chunks()` while the calling process is
+# the only writer to the database.
+# If `location_normalizer` is given, the countries of the job locations are
+# standardized by the writer (instead of by the decoding processes) so that
+# all the job posts share the same memo.
+def bulk_load(engine, job_data_filepaths, data_cleanup_options, batch_size,
+              decode_workers=0, max_chunks_in_flight=0, logging_cfg=None,
+              location_normalizer=None):
+    start = time.perf_counter()
+    n_inserted = 0
+    n_skipped = 0
+    n_failed_chunks = 0
+    with engine.connect() as conn:
+        is_sqlite = engine.dialect.name == 'sqlite'
+        if is_sqlite:
+            old_pragmas = get_sqlite_pragmas(conn, BULK_LOAD_PRAGMAS)
+            set_sqlite_pragmas(conn, BULK_LOAD_PRAGMAS)
+        try:
+            # Job posts already in the database, they are skipped as the ORM
+            # would fail to add them (UNIQUE constraint)
+            job_post_ids = set(
+                row[0] for row in conn.execute("SELECT id FROM job_posts"))
+            company_id = conn.execute(
+                "SELECT MAX(id) FROM companies").scalar() or 0
+            batch = []
+            decoded_chunks = decode_chunks(
+                job_data_filepaths, data_cleanup_options, decode_workers,
+                max_chunks_in_flight, logging_cfg)
+            for i, (filepath, future) in enumerate(decoded_chunks, start=1):
+                try:
+                    job_posts = future.result()
+                except Exception as e:
+                    # e.g. OSError, ValueError (JSON), pickle.UnpicklingError
+                    logger.exception(e)
+                    logger.error("Scraped job data from '{}' could not be "
+                                 "loaded. It will be skipped.".format(
+                                  os.path.basename(filepath)))
+                    n_failed_chunks += 1
+                    continue
+                logger.info("#{} Loaded the job data file '{}'".format(
+                    i, os.path.basename(filepath)))
+                for job_post_id, rows, error in job_posts:
+                    if job_post_id in job_post_ids:
+                        logger.warning(
+                            "The job post with job_post_id={} is already in "
+                            "the database. It will be skipped.".format(
+                             job_post_id))
+                        n_skipped += 1
+                        continue
+                    if error:
+                        logger.error("The job data for job_post_id={} will be "
+                                     "skipped: {}".format(job_post_id, error))
+                        n_skipped += 1
+                        continue
+                    if location_normalizer:
+                        for row in rows.get('job_locations', []):
+                            row['country'] = standardize_country(
+                                location_normalizer, row['country'])
+                    company_id += 1
+                    set_company_id(rows, company_id)
+                    job_post_ids.add(job_post_id)
+                    batch.append((job_post_id, rows))
+                    if len(batch) == batch_size:
+                        n_inserted += flush_batch(conn, batch)
+                        logger.info("{} job posts inserted".format(n_inserted))
+                        batch = []
+            if batch:
+                n_inserted += flush_batch(conn, batch)
+        finally:
+            if is_sqlite:
+                set_sqlite_pragmas(conn, old_pragmas)
+    duration = time.perf_counter() - start
+    logger.info("Bulk load: {} job posts inserted and {} skipped in {:.2f} s "
+                "({:.0f} job posts/s)".format(
+                 n_inserted, n_skipped, duration,
+                 n_inserted / duration if duration else 0))
+    if n_failed_chunks:
+        logger.warning("{} job data files could not be loaded".format(
+            n_failed_chunks))
+
+
+def _init_decode_process(logging_cfg):
+    global logger
+    lb = LoggingBoilerplate(__name__,
+                            __file__,
+                            os.getcwd(),
+                            logging_cfg)
+    logger = lb.get_logger()
+
+
 def main():
     sb = ScriptBoilerplate(
         module_name=__name__,
         module_file=__file__,
         cwd=os.getcwd(),
-        parser_desc="Load scraped job data from pickle files into a database.",
+        parser_desc="Load scraped job data from JSON Lines or pickle files "
+                    "into a database.",
         parser_formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     sb.parse_args()
     global logger
@@ -199,64 +504,56 @@ def main():
     DBSession = sessionmaker(bind=engine)
     db_session = DBSession()
 
-    # Load the scraped job data as pickle files
-    logger.info("Loading the scraped job data as pickle files")
+    # Load the scraped job data as JSON Lines or pickle files
+    logger.info("Loading the scraped job data as JSON Lines or pickle files")
     data_dirpath = os.path.expanduser(main_cfg['scraped_job_data_dirpath'])
-    list_job_data_filepaths = glob.glob(os.path.join(data_dirpath, "*.pkl"))
-    logger.info("There are {} pickle files in '../{}/'".format(
+    list_job_data_filepaths = sorted(
+        glob.glob(os.path.join(data_dirpath, "*.jsonl"))
+        + glob.glob(os.path.join(data_dirpath, "*.pkl")))
+    logger.info("There are {} job data files in '../{}/'".format(
         len(list_job_data_filepaths), os.path.basename(data_dirpath)))
+    location_normalizer = None
+    if main_cfg['data_cleanup_options'].get('countries'):
+        location_normalizer = LocationNormalizer(
+            logger=logger,
+            cache_size=main_cfg.get('location_cache_size', 4096))
+    if main_cfg.get('bulk_load'):
+        logger.info("Bulk load of the scraped job data into the database")
+        bulk_load(engine, list_job_data_filepaths,
+                  main_cfg['data_cleanup_options'],
+                  main_cfg['batch_size'],
+                  decode_workers=main_cfg['decode_workers'],
+                  max_chunks_in_flight=main_cfg['max_chunks_in_flight'],
+                  logging_cfg=sb.logging_cfg_dict,
+                  location_normalizer=location_normalizer)
+        if location_normalizer:
+            location_normalizer.log_cache_stats()
+        return
     for i, job_data_filepath in enumerate(list_job_data_filepaths, start=1):
-        try:
-            logger.info("#{} Loading the pickle file '{}'".format(
-                i, os.path.basename(job_data_filepath)))
-            scraped_job_data = load_pickle(job_data_filepath)
-        except FileNotFoundError as e:
-            logger.exception(e)
+        # The job data is streamed from the file, i.e. it is not all loaded in
+        # memory at once
+        logger.info("#{} Loading the job data file '{}'".format(
+            i, os.path.basename(job_data_filepath)))
+        if not os.path.isfile(job_data_filepath):
             logger.error("Scraped job data from '{}' could not be loaded. "
                          "Program will exit.".format(
                           os.path.basename(job_data_filepath)))
             sys.exit(1)
-        else:
-            logger.info("Finished loading the scraped job data from '{}'".format(
-                        job_data_filepath))
+        scraped_job_data = load_job_data(job_data_filepath)
         # Load the scraped job data into the database
         logger.info("Loading the scraped job data '{}' into the database".format(
                     os.path.basename(job_data_filepath)))
-        for j, (job_post_id, scraping_session) in \
-                enumerate(scraped_job_data.items(), start=1):
+        for j, (job_post_id, job_data) in \
+                enumerate(scraped_job_data, start=1):
             try:
                 logger.info("#{} Adding job data for job_post_id={}".format(
                             j, job_post_id))
-                if main_cfg['data_cleanup_options']['job_locations']:
-                    logger.debug("Clean up of industries")
-                    scraping_session.data.industries = cleanup_industries(
-                        scraping_session.data.industries)
-                    scraping_session.data.job_post.industries = \
-                        scraping_session.data.industries
-                    logger.debug(
-                        "Industries to be added: {}".format(
-                         [i.__str__() for i in
-                          scraping_session.data.industries]))
-                if main_cfg['data_cleanup_options']['job_locations']:
-                    logger.debug("Clean up of job locations")
-                    # IMPORTANT: if I only update
-                    # `scraping_session.data.job_locations`, the cleanup job
-                    # locations are not reflected in the database. I need to also
-                    # update `scraping_session.data.job_post.job_locations`.
-                    scraping_session.data.job_locations = cleanup_job_locations(
-                        scraping_session.data.job_locations)
-                    scraping_session.data.job_post.job_locations = \
-                        scraping_session.data.job_locations
-                    logger.debug(
-                        "Job locations to be added: {}".format(
-                         [l.__str__() for l in
-                          scraping_session.data.job_locations]))
-                    if len(scraping_session.data.job_locations) > 1:
-                        logger.warning(
-                            "[MoreThanOneLocationWarning] There are {} "
-                            "locations".format(
-                             len(scraping_session.data.job_locations)))
-                db_session.add(scraping_session.data.company)
+                cleanup_job_data(job_data, main_cfg['data_cleanup_options'])
+                if location_normalizer:
+                    for loc in job_data.job_locations:
+                        loc.country = standardize_country(location_normalizer,
+                                                          loc.country)
+                db_session.add(job_data.company)
                 db_session.commit()
             except IntegrityError as e:
                 # Possible cause #1: UNIQUE constraint failed
@@ -269,6 +566,8 @@ def main():
             else:
                 logger.debug("Successfully added job data for "
                              "job_post_id={}".format(job_post_id))
+    if location_normalizer:
+        location_normalizer.log_cache_stats()
 
 
 if __name__ == '__main__':